@@ -1,36 +1,29 @@
 """Chat API endpoints"""
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
+from app.config import settings
 from app.models.chat import ChatSession, CreateChatRequest, SendMessageRequest, ChatMessage
 from app.models.content import GeneratedContent
 from app.services.gemini_client import GeminiClient
 from app.services.prompt_builder import PromptBuilder
 from app.services.context_retriever import ContextRetriever
 from app.services.google_drive import GoogleDriveService
+from app.services.drive_pool import drive_service_pool
+from app.services.drive_quota import DriveUsage, drive_limiter
+from app.services.passages import select_passages, tokenize
 from app.utils.auth import GoogleAuthHandler
+from app.services.chat_cache import chat_cache
+from app.services.chat_repository import ChatVersionConflict
+from app.services.executor import drive_executor, gemini_executor
 from datetime import datetime
-from typing import Optional, Dict
-import json
-import os
+from typing import AsyncIterator, List, Optional, Dict
 from uuid import uuid4
+import asyncio
+import json
+import threading
 
 router = APIRouter()
 
-# Local storage file for chat sessions
-LOCAL_STORAGE_FILE = "chat_storage.json"
-
-# Helper function to read from local storage
-def read_local_storage() -> Dict:
-    if not os.path.exists(LOCAL_STORAGE_FILE):
-        return {"chats": {}}
-    with open(LOCAL_STORAGE_FILE, "r") as file:
-        return json.load(file)
-
-# Helper function to write to local storage
-def write_local_storage(data: Dict):
-    with open(LOCAL_STORAGE_FILE, "w") as file:
-        json.dump(data, file, indent=2, default=str)
-
 
 async def get_drive_service() -> Optional[GoogleDriveService]:
     """Get Google Drive service if credentials available"""
@@ -44,6 +37,61 @@ async def get_gemini_client() -> GeminiClient:
     return GeminiClient()
 
 
+def collect_context_files(content_type: str, request: SendMessageRequest) -> List[Dict]:
+    """Gather Drive context for a turn: the selected summary first, then retrieved files"""
+    context_files = []
+    try:
+        from app.api.routes.drive import get_oauth_credentials
+        creds = get_oauth_credentials()
+        if not creds:
+            print("Chat context: Drive not connected (no OAuth credentials)")
+        else:
+            drive_service = drive_service_pool.get(creds)
+            # Priority context: user-selected event summary file (e.g. from prompt builder)
+            if getattr(request, "context_file_id", None):
+                content = drive_service.get_file_content(request.context_file_id)
+                if content:
+                    summary = {
+                        "name": "Selected event summary",
+                        "folder": "Drive",
+                        "content": content,
+                        "relevance_score": 100.0,
+                        "modified_time": None,
+                    }
+                    # Keep short summaries whole; otherwise send the parts that match the request
+                    if len(content) > 8000:
+                        passages = select_passages(
+                            tokenize(request.message), content, max_passages=8, max_chars=8000
+                        )
+                        summary["content"] = "\n...\n".join(passages)
+                        summary["passages"] = passages
+                    context_files.append(summary)
+            # The summary counts against the same context budget as retrieved files
+            remaining = settings.context_token_budget * 4 - sum(len(c["content"]) for c in context_files)
+            context_retriever = ContextRetriever(drive_service)
+            retrieved = context_retriever.get_relevant_files(
+                content_type=content_type,
+                user_query=request.message,
+                max_files=10,
+                max_chars=remaining
+            ) if remaining > 0 else []
+            seen_names = {c.get("name") for c in context_files}
+            for c in retrieved:
+                if c.get("name") not in seen_names:
+                    context_files.append(c)
+                    seen_names.add(c.get("name"))
+            if not context_files and ("use " in request.message.lower() or "from drive" in request.message.lower() or "print " in request.message.lower()):
+                print(f"Chat context: no files found for query (name search + keyword over root/subfolders)")
+    except Exception as e:
+        print(f"Context from Drive: {e}")
+    return context_files
+
+
+def _sse(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
 @router.post("/create", response_model=dict)
 async def create_chat(request: CreateChatRequest):
     """Create a new chat session"""
@@ -55,14 +103,12 @@ async def create_chat(request: CreateChatRequest):
             messages=[]
         )
         
-        # Store in local storage
-        data = read_local_storage()
-        data["chats"][chat_id] = {
-            "content_type": chat_session.content_type,
-            "created_at": chat_session.created_at.isoformat(),
-            "messages": []
-        }
-        write_local_storage(data)
+        # Store new chat
+        chat_cache.create_chat(
+            chat_id,
+            content_type=chat_session.content_type,
+            created_at=chat_session.created_at.isoformat()
+        )
         
         return {
             "chat_id": chat_id,
@@ -78,8 +124,7 @@ async def create_chat(request: CreateChatRequest):
 async def get_chat(chat_id: str):
     """Get chat session by ID"""
     try:
-        data = read_local_storage()
-        chat = data.get("chats", {}).get(chat_id)
+        chat = await chat_cache.get_chat_async(chat_id)
         
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
@@ -102,131 +147,231 @@ async def send_message(
     gemini_client: GeminiClient = Depends(get_gemini_client)
 ):
     """Send a message in a chat and get AI response"""
-    try:
-        # Get chat session
-        data = read_local_storage()
-        chat = data.get("chats", {}).get(chat_id)
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
+    # Turns in one chat are serialized; other chats proceed in parallel
+    async with chat_cache.locked(chat_id):
+        try:
+            # Get chat session
+            chat = await chat_cache.get_chat_async(chat_id)
+            if not chat:
+                raise HTTPException(status_code=404, detail="Chat not found")
         
-        # Add user message
-        user_message = ChatMessage(
-            role="user",
-            content=request.message,
-            timestamp=datetime.utcnow()
-        )
+            # Add user message
+            user_message = ChatMessage(
+                role="user",
+                content=request.message,
+                timestamp=datetime.utcnow()
+            )
         
-        chat["messages"].append({
-            "role": user_message.role,
-            "content": user_message.content,
-            "timestamp": user_message.timestamp.isoformat()
-        })
+            user_record = {
+                "role": user_message.role,
+                "content": user_message.content,
+                "timestamp": user_message.timestamp.isoformat()
+            }
+            chat["messages"].append(user_record)
         
-        # Get context from Drive via OAuth (if connected)
-        context_files = []
-        try:
-            from app.api.routes.drive import get_oauth_credentials
-            creds = get_oauth_credentials()
-            if not creds:
-                print("Chat context: Drive not connected (no OAuth credentials)")
-            else:
-                drive_service = GoogleDriveService(creds)
-                # Priority context: user-selected event summary file (e.g. from prompt builder)
-                if getattr(request, "context_file_id", None):
-                    content = drive_service.get_file_content(request.context_file_id)
-                    if content:
-                        if len(content) > 8000:
-                            content = content[:8000] + "\n...(truncated)"
-                        context_files.append({
-                            "name": "Selected event summary",
-                            "folder": "Drive",
-                            "content": content,
-                            "relevance_score": 100.0,
-                            "modified_time": None,
-                        })
-                context_retriever = ContextRetriever(drive_service)
-                content_type = chat.get('content_type', 'general')
-                retrieved = context_retriever.get_relevant_files(
-                    content_type=content_type,
-                    user_query=request.message,
-                    max_files=10
+            # Get context from Drive via OAuth (if connected), counting the API calls it takes
+            drive_usage = DriveUsage()
+            with drive_limiter.track(drive_usage):
+                context_files = await drive_executor.run(
+                    collect_context_files, chat.get('content_type', 'general'), request
                 )
-                seen_names = {c.get("name") for c in context_files}
-                for c in retrieved:
-                    if c.get("name") not in seen_names:
-                        context_files.append(c)
-                        seen_names.add(c.get("name"))
-                if not context_files and ("use " in request.message.lower() or "from drive" in request.message.lower() or "print " in request.message.lower()):
-                    print(f"Chat context: no files found for query (name search + keyword over root/subfolders)")
-        except Exception as e:
-            print(f"Context from Drive: {e}")
         
-        # Build prompt
-        content_type = chat.get('content_type', 'general')
-        chat_history = chat.get('messages', [])
+            # Build prompt
+            content_type = chat.get('content_type', 'general')
+            chat_history = chat.get('messages', [])
         
-        prompt = PromptBuilder.build_prompt(
-            content_type=content_type,
-            user_input=request.message,
-            context_files=context_files,
-            chat_history=chat_history
-        )
+            prompt = PromptBuilder.build_prompt(
+                content_type=content_type,
+                user_input=request.message,
+                context_files=context_files,
+                chat_history=chat_history
+            )
         
-        # Generate response
-        try:
-            ai_response = gemini_client.generate_with_retry(prompt)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
+            # Generate response
+            try:
+                ai_response = await gemini_client.generate_with_retry_async(prompt)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"AI generation failed: {str(e)}")
         
-        # Add assistant message
-        assistant_message = ChatMessage(
-            role="assistant",
-            content=ai_response,
-            timestamp=datetime.utcnow()
-        )
+            # Add assistant message
+            assistant_message = ChatMessage(
+                role="assistant",
+                content=ai_response,
+                timestamp=datetime.utcnow()
+            )
         
-        chat["messages"].append({
-            "role": assistant_message.role,
-            "content": assistant_message.content,
-            "timestamp": assistant_message.timestamp.isoformat()
-        })
+            assistant_record = {
+                "role": assistant_message.role,
+                "content": assistant_message.content,
+                "timestamp": assistant_message.timestamp.isoformat()
+            }
         
-        # Save updated chat
-        data["chats"][chat_id] = chat
-        write_local_storage(data)
+            # Append only the new turn; the version check catches writers that bypassed the lock.
+            # An evicted chat is reloaded from storage, so keep it off the event loop
+            await asyncio.to_thread(
+                chat_cache.append_messages,
+                chat_id,
+                [user_record, assistant_record],
+                expected_version=chat["version"]
+            )
         
-        return {
-            "message": ai_response,
-            "context_files_used": len(context_files),
-            "timestamp": assistant_message.timestamp.isoformat()
-        }
+            return {
+                "message": ai_response,
+                "context_files_used": len(context_files),
+                "drive_api": drive_usage.as_dict(),
+                "timestamp": assistant_message.timestamp.isoformat()
+            }
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
+        except HTTPException:
+            raise
+        except ChatVersionConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
+
+
+@router.post("/{chat_id}/message/stream")
+async def stream_message(
+    chat_id: str,
+    request: SendMessageRequest,
+    http_request: Request,
+    gemini_client: GeminiClient = Depends(get_gemini_client)
+):
+    """
+    Send a message and stream the AI response as Server-Sent Events.
+
+    Events: 'status' (progress stages), 'context' (files used), 'token'
+    (generated text chunks), then 'done' with message metadata or 'error'.
+    The turn is persisted only after the stream completes; a client
+    disconnect stops the upstream Gemini stream.
+    """
+    if not await chat_cache.get_chat_async(chat_id):
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    async def event_stream() -> AsyncIterator[str]:
+        stop = threading.Event()
+        chunks = None
+        try:
+            # Turns in one chat are serialized; other chats proceed in parallel
+            async with chat_cache.locked(chat_id):
+                chat = await chat_cache.get_chat_async(chat_id)
+                if not chat:
+                    yield _sse("error", {"detail": "Chat not found"})
+                    return
+
+                user_record = {
+                    "role": "user",
+                    "content": request.message,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+                chat["messages"].append(user_record)
+
+                yield _sse("status", {"stage": "retrieving_context"})
+                content_type = chat.get('content_type', 'general')
+                drive_usage = DriveUsage()
+                with drive_limiter.track(drive_usage):
+                    context_files = await drive_executor.run(collect_context_files, content_type, request)
+                yield _sse("context", {
+                    "context_files_used": len(context_files),
+                    "files": [c.get("name") for c in context_files],
+                    "drive_api": drive_usage.as_dict(),
+                })
+
+                prompt = PromptBuilder.build_prompt(
+                    content_type=content_type,
+                    user_input=request.message,
+                    context_files=context_files,
+                    chat_history=chat.get('messages', [])
+                )
+
+                yield _sse("status", {"stage": "generating"})
+                loop = asyncio.get_running_loop()
+                queue: asyncio.Queue = asyncio.Queue()
+
+                chunks = gemini_client.generate_stream(prompt)
+
+                def produce():
+                    # Runs in a worker thread; stops pulling chunks once the client is gone
+                    try:
+                        for chunk in chunks:
+                            if stop.is_set():
+                                break
+                            loop.call_soon_threadsafe(queue.put_nowait, ("token", chunk))
+                        loop.call_soon_threadsafe(queue.put_nowait, ("end", None))
+                    except Exception as e:
+                        loop.call_soon_threadsafe(queue.put_nowait, ("error", str(e)))
+                    finally:
+                        chunks.close()
+
+                producer = asyncio.ensure_future(gemini_executor.run(produce))
+                parts = []
+                while True:
+                    kind, value = await queue.get()
+                    if kind == "token":
+                        parts.append(value)
+                        yield _sse("token", {"text": value})
+                        if await http_request.is_disconnected():
+                            stop.set()
+                            return
+                    elif kind == "error":
+                        yield _sse("error", {"detail": f"AI generation failed: {value}"})
+                        return
+                    else:
+                        break
+                await producer
+
+                assistant_record = {
+                    "role": "assistant",
+                    "content": "".join(parts),
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+                try:
+                    version = await asyncio.to_thread(
+                        chat_cache.append_messages,
+                        chat_id,
+                        [user_record, assistant_record],
+                        expected_version=chat["version"]
+                    )
+                except ChatVersionConflict as e:
+                    yield _sse("error", {"detail": str(e)})
+                    return
+
+                yield _sse("done", {
+                    "context_files_used": len(context_files),
+                    "drive_api": drive_usage.as_dict(),
+                    "timestamp": assistant_record["timestamp"],
+                    "version": version,
+                })
+        finally:
+            # Also reached when Starlette cancels the response on disconnect
+            stop.set()
+            if chunks is not None:
+                try:
+                    # Closes the upstream Gemini stream now unless the producer is
+                    # mid-chunk; then it closes it as soon as that chunk arrives
+                    chunks.close()
+                except ValueError:
+                    pass
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/", response_model=list)
-async def list_chats(limit: int = 20):
-    """List recent chat sessions"""
+async def list_chats(
+    limit: int = 20,
+    before: Optional[str] = None,
+    before_id: Optional[str] = None
+):
+    """List recent chat sessions (chat_id, content_type, created_at, message_count; fetch a chat for its messages); pass the last item's created_at/chat_id as before/before_id for the next page"""
     try:
-        data = read_local_storage()
-        chats = data.get("chats", {})
-        
-        # Convert to list and add chat_id
-        chat_list = []
-        for chat_id, chat_data in chats.items():
-            chat_list.append({
-                "chat_id": chat_id,
-                **chat_data
-            })
-        
-        # Sort by created_at (most recent first)
-        chat_list.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        
-        # Limit results
-        return chat_list[:limit]
+        # Flushes pending writes and reads storage: keep it off the event loop
+        return await asyncio.to_thread(
+            chat_cache.list_chats, limit=limit, before=before, before_id=before_id
+        )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list chats: {str(e)}")
@@ -236,16 +381,11 @@ async def list_chats(limit: int = 20):
 async def delete_chat(chat_id: str):
     """Delete a chat session"""
     try:
-        data = read_local_storage()
-        chats = data.get("chats", {})
-        
-        if chat_id not in chats:
+        async with chat_cache.locked(chat_id):
+            deleted = await asyncio.to_thread(chat_cache.delete_chat, chat_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Chat not found")
         
-        del chats[chat_id]
-        data["chats"] = chats
-        write_local_storage(data)
-        
         return {"message": "Chat deleted successfully"}
     
     except HTTPException:
@@ -1,14 +1,26 @@
 """Google Drive management API endpoints"""
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, StreamingResponse
 from app.services.google_drive import GoogleDriveService
-from app.services.file_sorter import FileSorter
+from app.services.drive_pool import drive_service_pool
+from app.services.sort_jobs import sort_jobs
+from app.services.sort_checkpoint import sort_checkpoints
+from app.services.folder_map import folder_map_store
+from app.services.duplicates import duplicate_index
+from app.services.executor import drive_executor
+from app.services.search_index import search_index
+from app.services.vector_index import vector_index
+from app.services.drive_sync import drive_sync
+from app.services.drive_tree import drive_tree
+from app.services.content_cache import content_cache
 from app.utils.auth import GoogleAuthHandler
 from app.config import settings
-from typing import Optional, Dict
+from typing import AsyncIterator, Literal, Optional, Dict
 from datetime import datetime
+import asyncio
 import json
 import os
+import threading
 
 router = APIRouter()
 
@@ -19,23 +31,60 @@ CREDENTIALS_FILE = os.path.join(BASE_DIR, "drive_credentials.json")
 STATE_FILE = os.path.join(BASE_DIR, "drive_auth_state.json")
 
 
+# Parsed credentials, reused until the token file changes (connect/disconnect)
+_credentials_cache: Dict = {"stamp": None, "creds": None}
+_credentials_lock = threading.Lock()
+
+
 def get_oauth_credentials():
-    """Load OAuth token from file; return Credentials or None."""
-    if not os.path.exists(CREDENTIALS_FILE):
+    """Load OAuth token from file (cached until the file changes); return Credentials or None."""
+    try:
+        stat = os.stat(CREDENTIALS_FILE)
+    except OSError:
         return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
     try:
-        with open(CREDENTIALS_FILE, "r") as f:
-            data = json.load(f)
-        token = data.get("token_data")
-        if not token:
-            return None
-        creds = GoogleAuthHandler.create_credentials_from_token(token)
-        creds = GoogleAuthHandler.refresh_token_if_needed(creds)
-        return creds
+        with _credentials_lock:
+            if _credentials_cache["stamp"] != stamp:
+                with open(CREDENTIALS_FILE, "r") as f:
+                    data = json.load(f)
+                token = data.get("token_data")
+                creds = GoogleAuthHandler.create_credentials_from_token(token) if token else None
+                _credentials_cache.update(stamp=stamp, creds=creds)
+            creds = _credentials_cache["creds"]
+            if creds is None:
+                return None
+            return GoogleAuthHandler.refresh_token_if_needed(creds)
     except Exception:
         return None
 
 
+def get_drive_service(credentials) -> GoogleDriveService:
+    """Shared Drive service for a credential set (built once, see DriveServicePool)."""
+    return drive_service_pool.get(credentials)
+
+
+def get_connected_drive_service() -> Optional[GoogleDriveService]:
+    """Drive service for the stored OAuth token, or None if Drive isn't connected."""
+    creds = get_oauth_credentials()
+    return get_drive_service(creds) if creds is not None else None
+
+
+def reset_account_state():
+    """Forget everything derived from the connected account (call on connect and disconnect)"""
+    drive_service_pool.clear()
+    # File metadata, change tokens and folder IDs belong to the previous account
+    drive_sync.clear()
+    drive_tree.invalidate()
+    # Cached text is served without asking Drive, so it must not outlive the account
+    content_cache.clear()
+    search_index.clear()
+    vector_index.clear()
+    sort_checkpoints.reset()
+    folder_map_store.clear()
+    duplicate_index.clear()
+
+
 def get_drive_credentials():
     """Return OAuth credentials for Drive; raise 401 if not connected."""
     creds = get_oauth_credentials()
@@ -72,9 +121,13 @@ async def auth_callback(code: Optional[str] = None, state: Optional[str] = None)
         # Pass the original PKCE code_verifier so Google can validate the
         # authorization code and avoid the "invalid_grant: Missing code verifier"
         # error on the token endpoint.
-        token_data = GoogleAuthHandler.exchange_code_for_token(code, code_verifier=code_verifier)
+        token_data = await drive_executor.run(
+            GoogleAuthHandler.exchange_code_for_token, code, code_verifier=code_verifier
+        )
         with open(CREDENTIALS_FILE, "w") as f:
             json.dump({"token_data": token_data}, f)
+        # A new connection may be a different account
+        await drive_executor.run(reset_account_state)
         if os.path.exists(STATE_FILE):
             os.remove(STATE_FILE)
     except Exception as e:
@@ -85,7 +138,7 @@ async def auth_callback(code: Optional[str] = None, state: Optional[str] = None)
 @router.get("/auth/status")
 async def auth_status():
     """Return whether user has connected Google Drive (OAuth)."""
-    creds = get_oauth_credentials()
+    creds = await drive_executor.run(get_oauth_credentials)
     return {"connected": creds is not None}
 
 
@@ -94,17 +147,34 @@ async def auth_disconnect():
     """Clear stored OAuth token."""
     if os.path.exists(CREDENTIALS_FILE):
         os.remove(CREDENTIALS_FILE)
+    await drive_executor.run(reset_account_state)
     return {"message": "Disconnected"}
 
 
 @router.post("/sync")
-async def sync_drive():
-    """Trigger file sync from Google Drive (OAuth)."""
+async def sync_drive(full: bool = False):
+    """
+    Sync Drive metadata and update the local search and vector indexes.
+
+    The first sync (or full=true) crawls every file; later syncs only replay
+    the Changes API since the last one.
+    """
     try:
-        credentials = get_drive_credentials()
-        drive_service = GoogleDriveService(credentials)
-        files = drive_service.list_files()
-        return {"message": "Sync completed", "files_found": len(files), "timestamp": datetime.utcnow().isoformat()}
+        credentials = await drive_executor.run(get_drive_credentials)
+        drive_service = await drive_executor.run(get_drive_service, credentials)
+        sync_stats = await drive_executor.run(drive_sync.sync, drive_service, full)
+        files = drive_sync.list_tree_files()
+        index_stats = await drive_executor.run(search_index.refresh, drive_service, files)
+        # Text comes from the content cache the first refresh just filled
+        vector_stats = await drive_executor.run(vector_index.refresh, drive_service, files)
+        return {
+            "message": "Sync completed",
+            "files_found": len(files),
+            "sync": sync_stats,
+            "index": index_stats,
+            "vectors": vector_stats,
+            "timestamp": datetime.utcnow().isoformat(),
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -112,25 +182,40 @@ async def sync_drive():
 
 
 @router.post("/sort")
-async def sort_files():
-    """Run file sorting algorithm - uses OAuth Drive."""
+async def sort_files(
+    full: bool = False,
+    sniff_content: bool = False,
+    duplicates: Literal["report", "skip", "quarantine"] = settings.sort_duplicates
+):
+    """Run file sorting algorithm - uses OAuth Drive. Only files changed since the last sort unless full=true; sniff_content=true classifies would-be Unsorted files by their text; duplicates=skip leaves copies of other files (same md5Checksum and size) in place, quarantine moves them to Duplicates. Waits for the job; see /sort/jobs for background runs."""
     try:
-        credentials = get_drive_credentials()
-        drive_service = GoogleDriveService(credentials)
-        file_sorter = FileSorter(drive_service)
-        
-        result = file_sorter.sort_all_files()
+        credentials = await drive_executor.run(get_drive_credentials)
+        drive_service = await drive_executor.run(get_drive_service, credentials)
+        # Runs as a journaled job; it keeps going if this request is dropped
+        try:
+            job = sort_jobs.start(drive_service, full=full, sniff_content=sniff_content, duplicates=duplicates)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        job = await sort_jobs.wait(job)
+        if job.status != "completed":
+            raise RuntimeError(job.error or f"job {job.status}")
+        result = job.result()
         return {
             "message": "Sorting completed",
+            "job_id": job.id,
+            "mode": result["mode"],
             "stats": {k: result[k] for k in ("total", "sorted", "skipped", "failed")},
             "files_found": result["files_found"],
             "folders_created": result["folders_created"],
             "sorted": result["sorted"],
             "skipped": result["skipped"],
             "failed": result["failed"],
+            "duplicates": result["duplicates"],
             "timestamp": datetime.utcnow().isoformat(),
         }
     
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -140,10 +225,106 @@ async def sort_files():
         raise HTTPException(status_code=500, detail=f"Sorting failed: {str(e)}")
 
 
+@router.post("/sort/jobs", status_code=202)
+async def start_sort_job(
+    dry_run: bool = False,
+    full: bool = False,
+    sniff_content: bool = False,
+    duplicates: Literal["report", "skip", "quarantine"] = settings.sort_duplicates,
+    source_folder_id: Optional[str] = None
+):
+    """Start sorting in the background; dry_run only produces the plan, full ignores the sort checkpoint, sniff_content adds the content pass for Unsorted files, duplicates says what to do with copies (report, skip or quarantine). Returns the job to poll."""
+    credentials = await drive_executor.run(get_drive_credentials)
+    drive_service = await drive_executor.run(get_drive_service, credentials)
+    try:
+        job = sort_jobs.start(
+            drive_service, dry_run=dry_run, source_folder_id=source_folder_id, full=full,
+            sniff_content=sniff_content, duplicates=duplicates
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.summary()
+
+
+@router.get("/sort/jobs")
+async def list_sort_jobs(limit: int = Query(20, ge=1, le=100)):
+    """Recent sort jobs, newest first."""
+    return await drive_executor.run(sort_jobs.list_jobs, limit)
+
+
+def _get_sort_job(job_id: str):
+    """Job by ID or 404"""
+    job = sort_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Sort job not found")
+    return job
+
+
+@router.get("/sort/jobs/{job_id}")
+async def get_sort_job(job_id: str, include_result: bool = False):
+    """Job status and progress; include_result adds the plan outcome (for dry runs, the planned moves)."""
+    job = _get_sort_job(job_id)
+    response = job.summary()
+    if include_result:
+        response["result"] = job.result()
+        if job.dry_run and job.plan is not None:
+            response["planned_moves"] = job.plan["moves"]
+    return response
+
+
+@router.get("/sort/jobs/{job_id}/events")
+async def stream_sort_job(job_id: str, http_request: Request):
+    """
+    Job progress as Server-Sent Events: 'progress' on every change (and
+    every 15 s as a heartbeat), then 'done' with the final status.
+    """
+    job = _get_sort_job(job_id)
+
+    async def event_stream() -> AsyncIterator[str]:
+        while True:
+            changed = job.changed()
+            event = "done" if job.finished else "progress"
+            yield f"event: {event}\ndata: {json.dumps(job.summary(), default=str)}\n\n"
+            if job.finished or await http_request.is_disconnected():
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                pass
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/sort/jobs/{job_id}/resume", status_code=202)
+async def resume_sort_job(job_id: str):
+    """Continue an interrupted, cancelled or failed job with the moves it hasn't made yet."""
+    _get_sort_job(job_id)
+    credentials = await drive_executor.run(get_drive_credentials)
+    drive_service = await drive_executor.run(get_drive_service, credentials)
+    try:
+        job = sort_jobs.resume(job_id, drive_service)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.summary()
+
+
+@router.post("/sort/jobs/{job_id}/cancel")
+async def cancel_sort_job(job_id: str):
+    """Stop a running job after its in-flight batches; it can be resumed later."""
+    _get_sort_job(job_id)
+    if not sort_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Sort job is not running")
+    return {"message": "Cancelling", "job_id": job_id}
+
+
 @router.get("/status")
 async def get_drive_status():
     """Get Google Drive integration status (OAuth connected or not)."""
-    creds = get_oauth_credentials()
+    creds = await drive_executor.run(get_oauth_credentials)
     return {"authenticated": creds is not None}
 
 
@@ -151,13 +332,16 @@ async def get_drive_status():
 async def list_summaries():
     """List event summary files (from Summaries folder or name contains 'summary') for suggestions."""
     try:
-        credentials = get_drive_credentials()
-        drive_service = GoogleDriveService(credentials)
-        folder_id = drive_service.find_folder_by_name("Summaries")
-        if folder_id:
-            files = drive_service.list_files(folder_id=folder_id, page_size=50)
-        else:
-            files = drive_service.list_files_by_name("summary", page_size=50)
+        credentials = await drive_executor.run(get_drive_credentials)
+
+        def fetch_summaries():
+            drive_service = get_drive_service(credentials)
+            folder_id = drive_service.find_folder_by_name("Summaries")
+            if folder_id:
+                return drive_service.list_files(folder_id=folder_id, page_size=50, max_items=50)
+            return drive_service.list_files_by_name("summary", page_size=50)
+
+        files = await drive_executor.run(fetch_summaries)
         out = [
             {"id": f.id, "name": f.name, "modified_time": f.modified_time.isoformat() if f.modified_time else None}
             for f in files
@@ -178,9 +362,11 @@ async def list_drive_files(
 ):
     """List files from Google Drive (OAuth); optional read_sample=filename returns content preview."""
     try:
-        credentials = get_drive_credentials()
-        drive_service = GoogleDriveService(credentials)
-        files = drive_service.list_files(folder_id=folder_id, page_size=limit)
+        credentials = await drive_executor.run(get_drive_credentials)
+        drive_service = await drive_executor.run(get_drive_service, credentials)
+        files = await drive_executor.run(
+            drive_service.list_files, folder_id=folder_id, page_size=min(limit, 1000), max_items=limit
+        )
 
         file_list = []
         for file in files:
@@ -198,7 +384,7 @@ async def list_drive_files(
         if read_sample:
             match = next((f for f in files if read_sample.lower() in f.name.lower()), None)
             if match:
-                content = drive_service.get_file_content(match.id)
+                content = await drive_executor.run(drive_service.get_file_text, match)
                 out["read_sample"] = {"file_name": match.name, "content_preview": (content or "")[:500]}
             else:
                 out["read_sample"] = {"file_name": read_sample, "found": False}
@@ -20,6 +20,92 @@ class Settings(BaseSettings):
     debug: bool = True
     cors_origins: str = "http://localhost:3000"
     
+    # Chat storage: "log" (append-only per-chat logs) or "sqlite"
+    chat_storage_backend: str = "log"
+    chat_sqlite_path: str = "chat_storage.db"
+    chat_log_dir: str = "chat_logs"
+    chat_log_fsync: bool = False
+    chat_log_compact_threshold: int = 200
+    chat_log_compact_interval: int = 300
+    chat_cache_max_bytes: int = 64 * 1024 * 1024
+    chat_cache_flush_delay: float = 1.0
+    chat_cache_flush_max_delay: float = 10.0
+    
+    # Thread pools for blocking Drive / Gemini calls
+    drive_pool_size: int = 8
+    gemini_pool_size: int = 8
+    
+    # Max concurrent Drive requests per chat turn during context retrieval
+    drive_max_in_flight: int = 6
+    
+    # Client-side Drive API limiter (calls/second, 0 disables; Drive allows ~200/s per user) and retry backoff (seconds)
+    drive_rate_limit: float = 100.0
+    drive_rate_burst: int = 200
+    drive_max_retries: int = 5
+    drive_backoff_base: float = 0.5
+    drive_backoff_max: float = 32.0
+    
+    # Extracted Drive text cache, keyed by (file_id, modifiedTime)
+    content_cache_dir: str = "drive_cache"
+    content_cache_max_bytes: int = 256 * 1024 * 1024
+    content_cache_memory_bytes: int = 32 * 1024 * 1024
+    
+    # Most bytes read from a text file or export per download (the rest is ignored)
+    drive_download_max_bytes: int = 2 * 1024 * 1024
+    
+    # Text extraction for PDF/DOCX/XLSX downloads (worker processes, seconds per file, input bytes, output chars)
+    extract_pool_size: int = 2
+    extract_timeout: float = 20.0
+    extract_max_bytes: int = 20 * 1024 * 1024
+    extract_max_chars: int = 200000
+    
+    # Local BM25 index over synced Drive text
+    search_index_path: str = "drive_index.json"
+    
+    # Passage chunking for retrieval (characters); context budget in tokens (~4 chars each)
+    passage_chars: int = 1200
+    passage_overlap: int = 200
+    passages_per_file: int = 3
+    context_token_budget: int = 12000
+    
+    # Drive metadata snapshot kept current with the Changes API (interval 0 disables the background sync)
+    drive_snapshot_path: str = "drive_snapshot.json"
+    drive_sync_interval: int = 300
+    
+    # Folder tree crawl used for retrieval (levels below My Drive, 1 = root only) and its cache lifetime
+    drive_crawl_max_depth: int = 4
+    drive_tree_ttl: int = 300
+    
+    # Background sort jobs: journal directory and move batches in flight per job
+    sort_journal_dir: str = "sort_jobs"
+    sort_move_concurrency: int = 4
+    
+    # Incremental sorting: Changes API token and placed files per sort scope
+    sort_checkpoint_path: str = "sort_checkpoint.json"
+    
+    # IDs of the sorted folders under each organization parent
+    sort_folder_map_path: str = "sort_folders.json"
+    
+    # Files grouped by md5Checksum + size; what sorting does with copies by
+    # default ("report", "skip" or "quarantine" into a Duplicates folder)
+    duplicate_index_path: str = "drive_duplicates.json"
+    sort_duplicates: str = "report"
+    
+    # Optional content pass for Unsorted files: text prefix read (bytes), worker processes,
+    # seconds per sort and per scored file, lowest score that places a file, and an optional
+    # JSON term-weight model
+    sort_sniff_max_bytes: int = 64 * 1024
+    sort_sniff_workers: int = 2
+    sort_sniff_budget: float = 120.0
+    sort_sniff_timeout: float = 10.0
+    sort_sniff_min_score: float = 2.0
+    sort_sniff_model_path: str = ""
+    
+    # Local vector index (semantic retrieval stage)
+    vector_index_dir: str = "drive_vectors"
+    vector_dim: int = 1024
+    vector_min_score: float = 0.2
+    
     @property
     def cors_origins_list(self) -> List[str]:
         """Parse CORS origins from comma-separated string"""
@@ -5,6 +5,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.config import settings
 from app.api.routes import chat, content, drive
+from app.services.chat_repository import chat_repository
+from app.services.chat_cache import chat_cache
+from app.services.executor import drive_executor, gemini_executor
+from app.services.content_cache import content_cache
+from app.services.drive_sync import drive_sync
+from app.services.drive_pool import drive_service_pool
+from app.services.drive_quota import drive_limiter
+from app.services.text_extract import text_extractor
+from app.services.content_classifier import content_classifier
+from app.services.sort_jobs import sort_jobs
+from app.services.sort_checkpoint import sort_checkpoints
+from app.services.folder_map import folder_map_store
+from app.services.duplicates import duplicate_index
+import asyncio
 
 
 @asynccontextmanager
@@ -12,9 +26,27 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     print("Starting up BCYI AI Assistant API...")
+    chat_repository.recover()
+    sort_jobs.recover()
+    compaction_task = asyncio.create_task(chat_repository.run_compaction())
+    flush_task = asyncio.create_task(chat_cache.run_flush_loop())
+    sync_task = None
+    if settings.drive_sync_interval > 0:
+        sync_task = asyncio.create_task(drive_sync.run_sync_loop(
+            drive.get_connected_drive_service, drive_executor.run, settings.drive_sync_interval
+        ))
     yield
     # Shutdown
     print("Shutting down BCYI AI Assistant API...")
+    if sync_task:
+        sync_task.cancel()
+    flush_task.cancel()
+    compaction_task.cancel()
+    chat_cache.flush()
+    drive_executor.shutdown(wait=False)
+    gemini_executor.shutdown(wait=False)
+    text_extractor.shutdown()
+    content_classifier.shutdown()
 
 
 # Create FastAPI app
@@ -57,6 +89,27 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics: thread pool queues and caches"""
+    return {
+        "executors": {
+            "drive": drive_executor.stats(),
+            "gemini": gemini_executor.stats(),
+        },
+        "chat_cache": chat_cache.stats(),
+        "content_cache": content_cache.stats(),
+        "drive_snapshot": drive_sync.stats(),
+        "drive_services": drive_service_pool.stats(),
+        "drive_api": drive_limiter.stats(),
+        "text_extraction": text_extractor.stats(),
+        "content_classification": content_classifier.stats(),
+        "sort_checkpoints": sort_checkpoints.stats(),
+        "sort_folders": folder_map_store.stats(),
+        "duplicates": duplicate_index.stats(),
+    }
+
+
 @app.get("/auth/callback")
 async def auth_callback_legacy(request: Request):
     """Legacy redirect: /auth/callback -> /api/drive/auth/callback (same query params)."""
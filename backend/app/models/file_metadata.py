@@ -1,6 +1,6 @@
 """Google Drive file metadata models"""
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -13,6 +13,8 @@ class DriveFile(BaseModel):
     modified_time: Optional[datetime] = None
     size: Optional[int] = None
     folder_path: Optional[str] = None
+    parents: Optional[List[str]] = None
+    md5_checksum: Optional[str] = None
     
     class Config:
         json_schema_extra = {
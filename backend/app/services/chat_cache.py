@@ -0,0 +1,362 @@
+"""In-memory chat session cache with debounced background flush"""
+from app.config import settings
+from app.services.chat_repository import ChatRepository, ChatVersionConflict, chat_repository
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import threading
+
+
+class ChatLockManager:
+    """
+    Per-chat asyncio locks.
+
+    Turns within one chat are serialized while turns in different chats run
+    in parallel; there is no global lock. Locks are created on demand and
+    dropped once nobody holds or waits on them.
+    """
+
+    def __init__(self):
+        """Initialize with no locks"""
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refs: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, chat_id: str) -> AsyncIterator[None]:
+        """Hold the lock for a chat for the duration of the block"""
+        lock = self._locks.setdefault(chat_id, asyncio.Lock())
+        self._refs[chat_id] = self._refs.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._refs[chat_id] -= 1
+            if self._refs[chat_id] == 0:
+                del self._refs[chat_id]
+                del self._locks[chat_id]
+
+    def __len__(self) -> int:
+        """Number of chats with a held or awaited lock"""
+        return len(self._locks)
+
+
+class ChatSessionCache:
+    """
+    Process-level cache of chat sessions in front of a ChatRepository.
+
+    Reads of hot sessions are served from memory. Mutations update the
+    cache immediately and are queued; a background task started from the
+    app lifespan coalesces them into one flush once no write has arrived
+    for `flush_delay` seconds (or `flush_max_delay` after the first write,
+    so a steady stream of writes still gets persisted). Entries are evicted least-recently-used once the cached
+    message bytes exceed `max_bytes`; chats with unflushed writes are never
+    evicted.
+
+    Every chat carries a version; `append_messages` checks the caller's
+    expected version so a writer that read a stale copy fails instead of
+    silently interleaving. Use `locked(chat_id)` to serialize a whole
+    read-generate-write turn on one chat.
+    """
+
+    def __init__(
+        self,
+        repository: ChatRepository,
+        max_bytes: int = settings.chat_cache_max_bytes,
+        flush_delay: float = settings.chat_cache_flush_delay,
+        flush_max_delay: float = settings.chat_cache_flush_max_delay
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            repository: Backing chat repository
+            max_bytes: Approximate memory budget for cached chats
+            flush_delay: Seconds without writes before flushing
+            flush_max_delay: Longest a write waits for a quiet period
+        """
+        self.repository = repository
+        self.max_bytes = max_bytes
+        self.flush_delay = flush_delay
+        self.flush_max_delay = flush_max_delay
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()  # chat_id -> {"chat", "bytes"}
+        self._pending: Dict[str, Dict] = {}  # chat_id -> {"create", "base_version", "messages"}
+        self._size = 0
+        self._inflight: set = set()  # chat_ids being written by flush()
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dirty: Optional[asyncio.Event] = None
+        self.locks = ChatLockManager()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _message_bytes(message: Dict) -> int:
+        """Rough in-memory size of one message"""
+        return len(message.get("content") or "") + 100
+
+    def _chat_bytes(self, chat: Dict) -> int:
+        """Rough in-memory size of a chat"""
+        return 200 + sum(self._message_bytes(m) for m in chat.get("messages", []))
+
+    @staticmethod
+    def _copy(chat: Dict) -> Dict:
+        """Copy a chat so callers can't mutate the cached message list"""
+        return {**chat, "messages": list(chat.get("messages", []))}
+
+    def _put(self, chat_id: str, chat: Dict):
+        """Insert or replace a cache entry and enforce the byte budget"""
+        old = self._entries.pop(chat_id, None)
+        if old:
+            self._size -= old["bytes"]
+        size = self._chat_bytes(chat)
+        self._entries[chat_id] = {"chat": chat, "bytes": size}
+        self._size += size
+        self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used clean entries until under budget"""
+        if self._size <= self.max_bytes:
+            return
+        for chat_id in list(self._entries.keys()):
+            if self._size <= self.max_bytes:
+                break
+            if chat_id in self._pending or chat_id in self._inflight:
+                continue
+            self._size -= self._entries.pop(chat_id)["bytes"]
+
+    def _mark_dirty(self):
+        """Wake the flush task (safe to call from any thread)"""
+        if self._loop is None or self._dirty is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._dirty.set)
+        except RuntimeError:
+            # Event loop already closed; shutdown flush picks the writes up
+            pass
+
+    def locked(self, chat_id: str):
+        """Async context manager serializing turns on one chat"""
+        return self.locks.hold(chat_id)
+
+    def create_chat(self, chat_id: str, content_type: str, created_at: str) -> Dict:
+        """Create a chat in memory; it is persisted on the next flush"""
+        chat = {"content_type": content_type, "created_at": created_at, "messages": [], "version": 0}
+        with self._lock:
+            self._pending[chat_id] = {
+                "create": {"content_type": content_type, "created_at": created_at},
+                "base_version": 0,
+                "messages": [],
+            }
+            self._put(chat_id, chat)
+        self._mark_dirty()
+        return self._copy(chat)
+
+    def get_chat(self, chat_id: str) -> Optional[Dict]:
+        """Return a chat from memory, loading it from the repository on a miss"""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is not None:
+                self._entries.move_to_end(chat_id)
+                self.hits += 1
+                return self._copy(entry["chat"])
+            self.misses += 1
+        chat = self.repository.get_chat(chat_id)
+        if chat is None:
+            return None
+        with self._lock:
+            # Another caller may have loaded and mutated it meanwhile
+            entry = self._entries.get(chat_id)
+            if entry is not None:
+                return self._copy(entry["chat"])
+            self._put(chat_id, chat)
+        return self._copy(chat)
+
+    async def get_chat_async(self, chat_id: str) -> Optional[Dict]:
+        """get_chat for the event loop: hits are served inline, misses load in a worker thread"""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is not None:
+                self._entries.move_to_end(chat_id)
+                self.hits += 1
+                return self._copy(entry["chat"])
+        return await asyncio.to_thread(self.get_chat, chat_id)
+
+    def append_messages(
+        self,
+        chat_id: str,
+        messages: List[Dict],
+        expected_version: Optional[int] = None
+    ) -> int:
+        """
+        Append messages in memory and queue them for the next flush
+        (may read the repository: call off the event loop)
+
+        Args:
+            chat_id: Chat ID
+            messages: Messages to append, in order
+            expected_version: Optional version the caller read the chat at
+
+        Returns:
+            The chat's new version
+        """
+        loaded = None
+        while True:
+            with self._lock:
+                entry = self._entries.get(chat_id)
+                if entry is None and loaded is not None:
+                    # Cached without evicting: the append below makes it dirty, and so unevictable
+                    entry = {"chat": loaded, "bytes": self._chat_bytes(loaded)}
+                    self._entries[chat_id] = entry
+                    self._size += entry["bytes"]
+                if entry is not None:
+                    chat = entry["chat"]
+                    if expected_version is not None and chat["version"] != expected_version:
+                        raise ChatVersionConflict(chat_id, expected_version, chat["version"])
+                    ops = self._pending.setdefault(
+                        chat_id, {"create": None, "base_version": chat["version"], "messages": []}
+                    )
+                    chat["messages"].extend(messages)
+                    chat["version"] += len(messages)
+                    ops["messages"].extend(messages)
+                    added = sum(self._message_bytes(m) for m in messages)
+                    entry["bytes"] += added
+                    self._size += added
+                    self._entries.move_to_end(chat_id)
+                    self._evict()
+                    version = chat["version"]
+                    break
+                self.misses += 1
+            # Not cached (or evicted): load outside the lock so readers aren't held up by storage
+            loaded = self.repository.get_chat(chat_id)
+            if loaded is None:
+                raise KeyError(chat_id)
+        self._mark_dirty()
+        return version
+
+    def list_chats(
+        self,
+        limit: int = 20,
+        before: Optional[str] = None,
+        before_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Flush pending writes, then list summaries from the repository's index
+        (blocking: call off the event loop)
+
+        Args:
+            limit: Maximum chats to return
+            before: Keyset cursor (see ChatRepository.list_chats)
+            before_id: Tiebreaker for chats sharing the `before` timestamp
+
+        Returns:
+            Chat summaries, most recent first
+        """
+        self.flush()
+        return self.repository.list_chats(limit=limit, before=before, before_id=before_id)
+
+    def delete_chat(self, chat_id: str) -> bool:
+        """Delete a chat from memory and the repository"""
+        with self._lock:
+            entry = self._entries.pop(chat_id, None)
+            if entry:
+                self._size -= entry["bytes"]
+            pending = self._pending.pop(chat_id, None)
+        if pending and pending["create"]:
+            # Never reached the repository
+            return True
+        with self._flush_lock:
+            # Wait out an in-flight flush so it can't resurrect the chat
+            return self.repository.delete_chat(chat_id)
+
+    def flush(self) -> int:
+        """
+        Write all queued mutations to the repository
+
+        Returns:
+            Number of chats flushed
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._inflight = set(pending)
+            try:
+                return self._write_pending(pending)
+            finally:
+                with self._lock:
+                    self._inflight = set()
+                    self._evict()
+
+    def _write_pending(self, pending: Dict[str, Dict]) -> int:
+        """Apply queued creates and appends; failures are re-queued"""
+        flushed = 0
+        for chat_id, ops in pending.items():
+            try:
+                if ops["create"]:
+                    self.repository.create_chat(chat_id, **ops["create"])
+                    ops["create"] = None
+                if ops["messages"]:
+                    try:
+                        self.repository.append_messages(
+                            chat_id, ops["messages"], expected_version=ops["base_version"]
+                        )
+                    except ChatVersionConflict as e:
+                        # Another process appended to this chat. Messages are
+                        # append-only, so keep ours and reload the merged chat
+                        print(f"Chat flush conflict: {str(e)}; appending and reloading")
+                        self.repository.append_messages(chat_id, ops["messages"])
+                        with self._lock:
+                            if chat_id not in self._pending:
+                                entry = self._entries.pop(chat_id, None)
+                                if entry:
+                                    self._size -= entry["bytes"]
+                    ops["messages"] = []
+                flushed += 1
+            except Exception as e:
+                print(f"Error flushing chat {chat_id}: {str(e)}")
+                with self._lock:
+                    # Re-queue whatever did not make it, ahead of newer writes
+                    newer = self._pending.get(chat_id)
+                    if newer is not None:
+                        ops["messages"].extend(newer["messages"])
+                    if chat_id in self._entries or newer is not None:
+                        self._pending[chat_id] = ops
+        return flushed
+
+    async def run_flush_loop(self):
+        """Background task: debounce writes and flush them off the event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._dirty = asyncio.Event()
+        if self._pending:
+            self._dirty.set()
+        while True:
+            await self._dirty.wait()
+            # Let a burst of writes settle: every write restarts the quiet period
+            deadline = self._loop.time() + self.flush_max_delay
+            while True:
+                self._dirty.clear()
+                quiet = min(self.flush_delay, deadline - self._loop.time())
+                if quiet <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._dirty.wait(), timeout=quiet)
+                except asyncio.TimeoutError:
+                    break
+            await asyncio.to_thread(self.flush)
+
+    def stats(self) -> Dict:
+        """Cache counters for diagnostics"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "pending_chats": len(self._pending),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Global chat session cache instance
+chat_cache = ChatSessionCache(chat_repository)
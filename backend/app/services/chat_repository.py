@@ -0,0 +1,300 @@
+"""Pluggable chat repository interface and SQLite implementation"""
+from app.config import settings
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+import json
+import os
+import sqlite3
+import threading
+
+
+class ChatVersionConflict(Exception):
+    """Raised when a write's expected chat version no longer matches storage"""
+
+    def __init__(self, chat_id: str, expected: int, actual: int):
+        super().__init__(f"Chat {chat_id} is at version {actual}, expected {expected}")
+        self.chat_id = chat_id
+        self.expected = expected
+        self.actual = actual
+
+
+class ChatRepository(ABC):
+    """
+    Storage backend for chat sessions.
+
+    Chats are plain dicts with 'content_type', 'created_at' (ISO string),
+    'messages' (list of dicts with 'role', 'content', 'timestamp') and
+    'version', which increases with every appended message and is used for
+    optimistic concurrency checks.
+    """
+
+    @abstractmethod
+    def recover(self):
+        """Prepare the backend on startup (rebuild indexes, create schema)"""
+
+    @abstractmethod
+    def create_chat(self, chat_id: str, content_type: str, created_at: str) -> Dict:
+        """Create a new empty chat and return it"""
+
+    @abstractmethod
+    def get_chat(self, chat_id: str) -> Optional[Dict]:
+        """Load a chat with all of its messages, or None if not found"""
+
+    @abstractmethod
+    def append_messages(
+        self,
+        chat_id: str,
+        messages: List[Dict],
+        expected_version: Optional[int] = None
+    ) -> int:
+        """
+        Atomically append messages to an existing chat
+
+        Args:
+            chat_id: Chat ID
+            messages: Messages to append, in order
+            expected_version: If set, the chat's current version; a mismatch
+                raises ChatVersionConflict and nothing is written
+
+        Returns:
+            The chat's new version
+        """
+
+    @abstractmethod
+    def list_chats(
+        self,
+        limit: int = 20,
+        before: Optional[str] = None,
+        before_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        List chat summaries, most recent first, without message bodies
+
+        Args:
+            limit: Maximum chats to return
+            before: Keyset cursor - only chats created before this ISO timestamp
+            before_id: Tiebreaker for chats sharing the `before` timestamp
+
+        Returns:
+            List of dicts with 'chat_id', 'content_type', 'created_at', 'message_count'
+        """
+
+    @abstractmethod
+    def delete_chat(self, chat_id: str) -> bool:
+        """Delete a chat; returns False if it does not exist"""
+
+    async def run_compaction(self):
+        """Background maintenance task; backends without compaction return at once"""
+        return None
+
+
+class SQLiteChatRepository(ChatRepository):
+    """Chat repository backed by SQLite in WAL mode"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS chats (
+        id TEXT PRIMARY KEY,
+        content_type TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        message_count INTEGER NOT NULL DEFAULT 0,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_chats_created_at ON chats (created_at DESC, id DESC);
+    CREATE TABLE IF NOT EXISTS messages (
+        chat_id TEXT NOT NULL REFERENCES chats (id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp TEXT,
+        PRIMARY KEY (chat_id, seq)
+    );
+    """
+
+    def __init__(self, db_path: str, legacy_file: Optional[str] = "chat_storage.json"):
+        """
+        Initialize the repository
+
+        Args:
+            db_path: SQLite database file
+            legacy_file: Optional chat_storage.json to import on first startup
+        """
+        self.db_path = db_path
+        self.legacy_file = legacy_file
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def _conn(self) -> sqlite3.Connection:
+        """Per-thread connection; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        if not self._schema_ready:
+            conn.executescript(self.SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(chats)")}
+            if "version" not in columns:
+                # Databases created before optimistic versioning
+                conn.execute("ALTER TABLE chats ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE chats SET version = message_count")
+            self._schema_ready = True
+        return conn
+
+    def _import_legacy(self, conn: sqlite3.Connection):
+        """Import chats from a legacy chat_storage.json into empty tables"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        if conn.execute("SELECT 1 FROM chats LIMIT 1").fetchone():
+            return
+        try:
+            with open(self.legacy_file, "r") as file:
+                data = json.load(file)
+            chats = data.get("chats", {})
+            conn.execute("BEGIN")
+            for chat_id, chat in chats.items():
+                messages = chat.get("messages", [])
+                conn.execute(
+                    "INSERT INTO chats (id, content_type, created_at, message_count, version) VALUES (?, ?, ?, ?, ?)",
+                    (chat_id, chat.get("content_type", "general"), chat.get("created_at") or "", len(messages), len(messages))
+                )
+                conn.executemany(
+                    "INSERT INTO messages (chat_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (chat_id, seq, m.get("role"), m.get("content") or "", m.get("timestamp"))
+                        for seq, m in enumerate(messages)
+                    ]
+                )
+            conn.execute("COMMIT")
+            print(f"Imported {len(chats)} chats from {self.legacy_file}")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"Error importing legacy chat storage: {str(e)}")
+
+    def recover(self):
+        """Create the schema and import legacy data if the database is new"""
+        conn = self._conn()
+        self._import_legacy(conn)
+        count = conn.execute("SELECT COUNT(*) FROM chats").fetchone()[0]
+        print(f"Chat repository opened {self.db_path} ({count} chats)")
+
+    def create_chat(self, chat_id: str, content_type: str, created_at: str) -> Dict:
+        """Insert a new chat row"""
+        self._conn().execute(
+            "INSERT INTO chats (id, content_type, created_at) VALUES (?, ?, ?)",
+            (chat_id, content_type, created_at)
+        )
+        return {"content_type": content_type, "created_at": created_at, "messages": [], "version": 0}
+
+    def get_chat(self, chat_id: str) -> Optional[Dict]:
+        """Load a chat and its messages in sequence order"""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT content_type, created_at, version FROM chats WHERE id = ?", (chat_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        messages = conn.execute(
+            "SELECT role, content, timestamp FROM messages WHERE chat_id = ? ORDER BY seq",
+            (chat_id,)
+        ).fetchall()
+        return {
+            "content_type": row["content_type"],
+            "created_at": row["created_at"],
+            "messages": [dict(m) for m in messages],
+            "version": row["version"],
+        }
+
+    def append_messages(
+        self,
+        chat_id: str,
+        messages: List[Dict],
+        expected_version: Optional[int] = None
+    ) -> int:
+        """Append messages and bump the chat's version in one transaction"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT message_count, version FROM chats WHERE id = ?", (chat_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(chat_id)
+            if expected_version is not None and row["version"] != expected_version:
+                raise ChatVersionConflict(chat_id, expected_version, row["version"])
+            seq = row["message_count"]
+            conn.executemany(
+                "INSERT INTO messages (chat_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (chat_id, seq + i, m.get("role"), m.get("content") or "", m.get("timestamp"))
+                    for i, m in enumerate(messages)
+                ]
+            )
+            version = row["version"] + len(messages)
+            conn.execute(
+                "UPDATE chats SET message_count = ?, version = ? WHERE id = ?",
+                (seq + len(messages), version, chat_id)
+            )
+            conn.execute("COMMIT")
+            return version
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def list_chats(
+        self,
+        limit: int = 20,
+        before: Optional[str] = None,
+        before_id: Optional[str] = None
+    ) -> List[Dict]:
+        """Keyset-paginated listing over idx_chats_created_at; never reads messages"""
+        if before is None:
+            rows = self._conn().execute(
+                "SELECT id, content_type, created_at, message_count FROM chats "
+                "ORDER BY created_at DESC, id DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        elif before_id is None:
+            rows = self._conn().execute(
+                "SELECT id, content_type, created_at, message_count FROM chats "
+                "WHERE created_at < ? ORDER BY created_at DESC, id DESC LIMIT ?",
+                (before, limit)
+            ).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT id, content_type, created_at, message_count FROM chats "
+                "WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                (before, before_id, limit)
+            ).fetchall()
+        return [
+            {
+                "chat_id": row["id"],
+                "content_type": row["content_type"],
+                "created_at": row["created_at"],
+                "message_count": row["message_count"],
+            }
+            for row in rows
+        ]
+
+    def delete_chat(self, chat_id: str) -> bool:
+        """Delete a chat; messages go with it via ON DELETE CASCADE"""
+        cursor = self._conn().execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+        return cursor.rowcount > 0
+
+
+def create_chat_repository() -> ChatRepository:
+    """Build the chat repository selected by settings.chat_storage_backend"""
+    backend = settings.chat_storage_backend.lower()
+    if backend == "sqlite":
+        return SQLiteChatRepository(settings.chat_sqlite_path)
+    if backend == "log":
+        from app.services.chat_store import ChatLogStore
+        return ChatLogStore(settings.chat_log_dir)
+    raise ValueError(f"Unknown chat storage backend: {settings.chat_storage_backend}")
+
+
+# Global chat repository instance
+chat_repository = create_chat_repository()
@@ -0,0 +1,355 @@
+"""Append-only chat log storage engine"""
+from app.config import settings
+from app.services.chat_repository import ChatRepository, ChatVersionConflict
+from typing import Dict, List, Optional
+import asyncio
+import heapq
+import json
+import os
+import threading
+
+
+# Legacy single-file store, migrated into per-chat logs on first recovery
+LEGACY_STORAGE_FILE = "chat_storage.json"
+
+
+class ChatLogStore(ChatRepository):
+    """
+    Chat storage with one append-only JSONL log per chat.
+
+    Each log is a sequence of records:
+        {"op": "create", "content_type": ..., "created_at": ...}
+        {"op": "message", "role": ..., "content": ..., "timestamp": ...}
+        {"op": "snapshot", "content_type": ..., "created_at": ..., "messages": [...]}
+
+    Appending a message writes a single line, so a turn costs O(message size)
+    instead of re-serializing every chat. An in-memory index of chat metadata
+    is rebuilt from the logs on startup, and background compaction folds long
+    logs into a single snapshot record.
+    """
+
+    def __init__(self, log_dir: str, legacy_file: Optional[str] = LEGACY_STORAGE_FILE):
+        """
+        Initialize the store
+
+        Args:
+            log_dir: Directory holding one <chat_id>.jsonl file per chat
+            legacy_file: Optional chat_storage.json to migrate on recovery
+        """
+        self.log_dir = log_dir
+        self.legacy_file = legacy_file
+        self._index: Dict[str, Dict] = {}  # chat_id -> metadata
+        self._lock = threading.RLock()
+        self._recovered = False
+
+    def _log_path(self, chat_id: str) -> str:
+        """Path of the log file for a chat"""
+        return os.path.join(self.log_dir, f"{chat_id}.jsonl")
+
+    @staticmethod
+    def _replay(lines: List[str]) -> tuple[Optional[Dict], int, bool]:
+        """
+        Replay log lines into a chat dict
+
+        Args:
+            lines: Raw JSONL lines
+
+        Returns:
+            Tuple of (chat dict or None, record count, whether a torn/corrupt line was skipped)
+        """
+        chat = None
+        records = 0
+        corrupt = False
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-append can leave a partial last line; drop it
+                corrupt = True
+                continue
+            records += 1
+            op = record.get("op")
+            if op == "snapshot":
+                chat = {
+                    "content_type": record.get("content_type", "general"),
+                    "created_at": record.get("created_at"),
+                    "messages": list(record.get("messages", [])),
+                }
+            elif op == "create":
+                chat = {
+                    "content_type": record.get("content_type", "general"),
+                    "created_at": record.get("created_at"),
+                    "messages": [],
+                }
+            elif op == "message" and chat is not None:
+                chat["messages"].append({
+                    "role": record.get("role"),
+                    "content": record.get("content"),
+                    "timestamp": record.get("timestamp"),
+                })
+        if chat is not None:
+            # Logs only ever append messages, so the message count is the version
+            chat["version"] = len(chat["messages"])
+        return chat, records, corrupt
+
+    def _read_log(self, chat_id: str) -> tuple[Optional[Dict], int, bool]:
+        """Read and replay a single chat log"""
+        path = self._log_path(chat_id)
+        if not os.path.exists(path):
+            return None, 0, False
+        with open(path, "r") as file:
+            return self._replay(file.readlines())
+
+    def _append(self, chat_id: str, record: Dict, mode: str = "a"):
+        """Append one record as a single JSON line"""
+        with open(self._log_path(chat_id), mode) as file:
+            file.write(json.dumps(record, default=str) + "\n")
+            file.flush()
+            if settings.chat_log_fsync:
+                os.fsync(file.fileno())
+
+    def _migrate_legacy(self):
+        """Split a legacy chat_storage.json into per-chat snapshot logs"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        try:
+            with open(self.legacy_file, "r") as file:
+                data = json.load(file)
+            for chat_id, chat in data.get("chats", {}).items():
+                if os.path.exists(self._log_path(chat_id)):
+                    continue
+                self._append(chat_id, {
+                    "op": "snapshot",
+                    "content_type": chat.get("content_type", "general"),
+                    "created_at": chat.get("created_at"),
+                    "messages": chat.get("messages", []),
+                })
+            os.replace(self.legacy_file, f"{self.legacy_file}.migrated")
+            print(f"Migrated {len(data.get('chats', {}))} chats from {self.legacy_file}")
+        except Exception as e:
+            print(f"Error migrating legacy chat storage: {str(e)}")
+
+    def recover(self):
+        """Rebuild the in-memory index from the logs on disk"""
+        with self._lock:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._migrate_legacy()
+            index = {}
+            for entry in os.listdir(self.log_dir):
+                if not entry.endswith(".jsonl"):
+                    continue
+                chat_id = entry[:-len(".jsonl")]
+                try:
+                    chat, records, corrupt = self._read_log(chat_id)
+                except OSError as e:
+                    print(f"Error reading chat log {entry}: {str(e)}")
+                    continue
+                if chat is None:
+                    continue
+                index[chat_id] = {
+                    "content_type": chat["content_type"],
+                    "created_at": chat["created_at"],
+                    "message_count": len(chat["messages"]),
+                    "version": chat["version"],
+                    "records": records,
+                    "needs_compaction": corrupt,
+                }
+            self._index = index
+            self._recovered = True
+            # Repair torn tails now so the next append starts on a clean line
+            for chat_id, meta in index.items():
+                if meta["needs_compaction"]:
+                    self.compact(chat_id)
+            print(f"Chat store recovered {len(index)} chats from {self.log_dir}")
+
+    def _ensure_recovered(self):
+        """Run recovery lazily if startup did not"""
+        if not self._recovered:
+            self.recover()
+
+    def create_chat(self, chat_id: str, content_type: str, created_at: str) -> Dict:
+        """
+        Create a new chat log
+
+        Args:
+            chat_id: New chat ID
+            content_type: Content type of the chat
+            created_at: ISO creation timestamp
+
+        Returns:
+            Chat dictionary
+        """
+        self._ensure_recovered()
+        with self._lock:
+            self._append(chat_id, {
+                "op": "create",
+                "content_type": content_type,
+                "created_at": created_at,
+            }, mode="x")
+            self._index[chat_id] = {
+                "content_type": content_type,
+                "created_at": created_at,
+                "message_count": 0,
+                "version": 0,
+                "records": 1,
+                "needs_compaction": False,
+            }
+        return {"content_type": content_type, "created_at": created_at, "messages": [], "version": 0}
+
+    def get_chat(self, chat_id: str) -> Optional[Dict]:
+        """Load a chat with all of its messages, or None if not found"""
+        self._ensure_recovered()
+        if chat_id not in self._index:
+            return None
+        chat, _, _ = self._read_log(chat_id)
+        return chat
+
+    def append_messages(
+        self,
+        chat_id: str,
+        messages: List[Dict],
+        expected_version: Optional[int] = None
+    ) -> int:
+        """
+        Append messages to a chat log in a single write
+
+        Args:
+            chat_id: Chat ID
+            messages: Dicts with 'role', 'content' and 'timestamp'
+            expected_version: Optional version check (see ChatRepository)
+
+        Returns:
+            The chat's new version
+        """
+        self._ensure_recovered()
+        with self._lock:
+            meta = self._index.get(chat_id)
+            if meta is None:
+                raise KeyError(chat_id)
+            if expected_version is not None and meta["version"] != expected_version:
+                raise ChatVersionConflict(chat_id, expected_version, meta["version"])
+            lines = "".join(
+                json.dumps({
+                    "op": "message",
+                    "role": m.get("role"),
+                    "content": m.get("content"),
+                    "timestamp": m.get("timestamp"),
+                }, default=str) + "\n"
+                for m in messages
+            )
+            with open(self._log_path(chat_id), "a") as file:
+                file.write(lines)
+                file.flush()
+                if settings.chat_log_fsync:
+                    os.fsync(file.fileno())
+            meta["message_count"] += len(messages)
+            meta["version"] += len(messages)
+            meta["records"] += len(messages)
+            return meta["version"]
+
+    def list_chats(
+        self,
+        limit: int = 20,
+        before: Optional[str] = None,
+        before_id: Optional[str] = None
+    ) -> List[Dict]:
+        """List chat summaries from the in-memory index; no logs are read"""
+        self._ensure_recovered()
+        with self._lock:
+            entries = [
+                (meta.get("created_at") or "", chat_id, meta)
+                for chat_id, meta in self._index.items()
+            ]
+        if before is not None and before_id is not None:
+            entries = [e for e in entries if (e[0], e[1]) < (before, before_id)]
+        elif before is not None:
+            entries = [e for e in entries if e[0] < before]
+        recent = heapq.nlargest(limit, entries, key=lambda e: (e[0], e[1]))
+        return [
+            {
+                "chat_id": chat_id,
+                "content_type": meta["content_type"],
+                "created_at": meta["created_at"],
+                "message_count": meta["message_count"],
+            }
+            for _, chat_id, meta in recent
+        ]
+
+    def delete_chat(self, chat_id: str) -> bool:
+        """Delete a chat log; returns False if the chat does not exist"""
+        self._ensure_recovered()
+        with self._lock:
+            if self._index.pop(chat_id, None) is None:
+                return False
+            try:
+                os.remove(self._log_path(chat_id))
+            except FileNotFoundError:
+                pass
+        return True
+
+    def compact(self, chat_id: str) -> bool:
+        """
+        Rewrite a chat log as a single snapshot record
+
+        Args:
+            chat_id: Chat ID
+
+        Returns:
+            True if the log was compacted
+        """
+        with self._lock:
+            meta = self._index.get(chat_id)
+            if meta is None:
+                return False
+            chat, _, _ = self._read_log(chat_id)
+            if chat is None:
+                return False
+            path = self._log_path(chat_id)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write(json.dumps({
+                    "op": "snapshot",
+                    "content_type": chat["content_type"],
+                    "created_at": chat["created_at"],
+                    "messages": chat["messages"],
+                }, default=str) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+            meta["records"] = 1
+            meta["needs_compaction"] = False
+        return True
+
+    def compact_pending(self, threshold: Optional[int] = None) -> int:
+        """
+        Compact every log with at least `threshold` records or a torn line
+
+        Returns:
+            Number of logs compacted
+        """
+        threshold = threshold or settings.chat_log_compact_threshold
+        with self._lock:
+            pending = [
+                chat_id for chat_id, meta in self._index.items()
+                if meta["needs_compaction"] or meta["records"] >= threshold
+            ]
+        compacted = 0
+        for chat_id in pending:
+            try:
+                if self.compact(chat_id):
+                    compacted += 1
+            except Exception as e:
+                print(f"Error compacting chat log {chat_id}: {str(e)}")
+        return compacted
+
+    async def run_compaction(self, interval: Optional[float] = None):
+        """Background task: periodically compact long logs off the event loop"""
+        interval = interval or settings.chat_log_compact_interval
+        while True:
+            await asyncio.sleep(interval)
+            compacted = await asyncio.to_thread(self.compact_pending)
+            if compacted:
+                print(f"Compacted {compacted} chat logs")
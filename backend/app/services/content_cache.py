@@ -0,0 +1,214 @@
+"""Persistent cache of extracted Drive file text"""
+from app.config import settings
+from collections import OrderedDict
+from typing import Dict, Optional
+import hashlib
+import os
+import threading
+
+
+class DriveContentCache:
+    """
+    Two-tier LRU cache of extracted text keyed by (file_id, modifiedTime).
+
+    A Drive file's modifiedTime changes whenever its content does, so a key
+    never goes stale: edited files simply miss and the old entry ages out.
+    Text lives on disk (one file per key, bounded by `max_bytes`) with an
+    optional in-memory tier in front (bounded by `memory_max_bytes`, 0 to
+    disable). Disk LRU order survives restarts via file mtimes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, memory_max_bytes: int = 0):
+        """
+        Initialize the cache
+
+        Args:
+            cache_dir: Directory for cached text files
+            max_bytes: Disk budget in bytes
+            memory_max_bytes: In-memory tier budget in bytes (0 disables it)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # key -> size, LRU first
+        self._disk_bytes = 0
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._generation = 0  # bumped by clear(), so puts racing it are dropped
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(file_id: str, modified_time: str) -> str:
+        """Cache key for a file version"""
+        return hashlib.sha1(f"{file_id}:{modified_time}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """Path of a cached text file"""
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _load_index(self):
+        """Rebuild the disk LRU index from the cache directory"""
+        if self._loaded:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".txt"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len(".txt")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._loaded = True
+
+    def _remember(self, key: str, text: str):
+        """Put text in the memory tier, evicting LRU entries"""
+        if self.memory_max_bytes <= 0:
+            return
+        size = len(text)
+        if size > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = text
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, file_id: str, modified_time: str) -> Optional[str]:
+        """
+        Look up cached text for a file version
+
+        Args:
+            file_id: Drive file ID
+            modified_time: The file's modifiedTime (ISO string)
+
+        Returns:
+            Cached text, or None on a miss
+        """
+        key = self.make_key(file_id, modified_time)
+        with self._lock:
+            self._load_index()
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return text
+            if key not in self._disk:
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as file:
+                text = file.read()
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._remember(key, text)
+        return text
+
+    def put(self, file_id: str, modified_time: str, text: str):
+        """
+        Store extracted text for a file version
+
+        Args:
+            file_id: Drive file ID
+            modified_time: The file's modifiedTime (ISO string)
+            text: Extracted text
+        """
+        key = self.make_key(file_id, modified_time)
+        data = text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._load_index()
+            generation = self._generation
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing content cache for {file_id}: {str(e)}")
+            return
+        with self._lock:
+            if generation != self._generation:
+                # Cleared while writing: the text belongs to a previous account
+                self._discard(path)
+                return
+            old = self._disk.pop(key, None)
+            if old is not None:
+                self._disk_bytes -= old
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._remember(key, text)
+            evict = []
+            while self._disk_bytes > self.max_bytes and self._disk:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self._memory_bytes -= len(self._memory.pop(old_key, ""))
+                evict.append(old_key)
+                self.evictions += 1
+        for old_key in evict:
+            self._discard(self._path(old_key))
+
+    @staticmethod
+    def _discard(path: str):
+        """Delete a cached text file if it exists"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Drop every cached text, on disk and in memory (e.g. the account changed)"""
+        with self._lock:
+            self._load_index()
+            self._generation += 1
+            keys = list(self._disk)
+            self._disk.clear()
+            self._disk_bytes = 0
+            self._memory.clear()
+            self._memory_bytes = 0
+        for key in keys:
+            self._discard(self._path(key))
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+            }
+
+
+# Global content cache instance
+content_cache = DriveContentCache(
+    settings.content_cache_dir,
+    max_bytes=settings.content_cache_max_bytes,
+    memory_max_bytes=settings.content_cache_memory_bytes
+)
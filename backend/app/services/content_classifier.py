@@ -0,0 +1,203 @@
+"""Content-based classification for files whose names match no sorting rule"""
+from app.config import settings
+from app.services.process_pool import RecyclingProcessPool
+from app.services.sorting_rules import SORTING_RULES
+from typing import Dict, List, Optional, Tuple
+import json
+import math
+import os
+import re
+
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# Compiled scorer of the current worker process (set by _init_worker)
+_worker_scorer: Optional["ContentScorer"] = None
+
+
+class ContentScorer:
+    """
+    Scores text against each rule folder.
+
+    A folder's score is the number of times its rule keywords occur in the
+    text (whole words, case-insensitive), plus, if a model is loaded, the
+    model's linear score: bias + sum(weight * log(1 + count)) over its
+    terms. The best-scoring folder wins if it reaches `min_score`; ties go
+    to the higher-priority rule.
+    """
+
+    def __init__(self, keyword_rules: List[Tuple[str, List[str]]], model: Optional[Dict], min_score: float):
+        """
+        Compile the scorer
+
+        Args:
+            keyword_rules: (folder, keywords) in priority order
+            model: {"folders": {folder: {"bias": float, "terms": {term: weight}}}} or None
+            min_score: Lowest score that places a file
+        """
+        self.min_score = min_score
+        self._keywords = [
+            (folder, re.compile(r"\b(?:" + "|".join(re.escape(k.lower()) for k in keywords) + r")\b"))
+            for folder, keywords in keyword_rules if keywords
+        ]
+        self._rank = {folder: rank for rank, (folder, _) in enumerate(keyword_rules)}
+        self._model = (model or {}).get("folders", {})
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Score of every folder with a non-zero score"""
+        text = text.lower()
+        scores: Dict[str, float] = {}
+        for folder, pattern in self._keywords:
+            hits = sum(1 for _ in pattern.finditer(text))
+            if hits:
+                scores[folder] = scores.get(folder, 0.0) + hits
+        if self._model:
+            counts: Dict[str, int] = {}
+            for token in TOKEN_RE.findall(text):
+                counts[token] = counts.get(token, 0) + 1
+            for folder, params in self._model.items():
+                score = params.get("bias", 0.0) + sum(
+                    weight * math.log1p(counts[term]) for term, weight in params.get("terms", {}).items()
+                    if term in counts
+                )
+                if score:
+                    scores[folder] = scores.get(folder, 0.0) + score
+        return scores
+
+    def best(self, text: str) -> Optional[Tuple[str, float]]:
+        """(folder, score) of the winning folder, or None if nothing reaches min_score"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        folder = max(scores, key=lambda f: (scores[f], -self._rank.get(f, len(self._rank))))
+        return (folder, scores[folder]) if scores[folder] >= self.min_score else None
+
+
+def _init_worker(keyword_rules, model, min_score):
+    """Compile the scorer once per worker process"""
+    global _worker_scorer
+    _worker_scorer = ContentScorer(keyword_rules, model, min_score)
+
+
+def _score_in_worker(text: str) -> Optional[Tuple[str, float]]:
+    """Pool task: best folder for one text"""
+    return _worker_scorer.best(text)
+
+
+class ContentClassifier:
+    """
+    Places files by the text they contain, for the sorter's Unsorted pass.
+
+    Uses the keywords of the name-based sorting rules (a file full of
+    "newsletter" and "monthly update" is a newsletter whatever it's called)
+    and, optionally, a JSON term-weight model. Scoring runs in a spawned
+    process pool so large backlogs don't hold the GIL against request
+    threads; with `max_workers` 0 it runs inline. A score that overruns
+    its timeout recycles the pool like a stuck text extraction (see
+    RecyclingProcessPool). The pool is separate from the extractor's so
+    each worker keeps its compiled scorer and a slow PDF can't stall a
+    sort's content pass.
+    """
+
+    def __init__(
+        self,
+        rules: Dict[str, Dict],
+        max_workers: int,
+        max_chars: int,
+        min_score: float,
+        timeout: float,
+        model_path: str = ""
+    ):
+        """
+        Initialize the classifier
+
+        Args:
+            rules: Sorting rules (rule_name -> {'priority', 'folder', 'keywords', ...})
+            max_workers: Worker processes (0 scores in the calling thread)
+            max_chars: Text scored per file (the rest is ignored)
+            min_score: Lowest score that places a file
+            timeout: Seconds a worker may spend scoring one file
+            model_path: Optional JSON scoring model (see ContentScorer)
+        """
+        ordered = sorted(rules.values(), key=lambda rule: rule.get("priority", float("inf")))
+        self.keyword_rules = [(rule["folder"], list(rule.get("keywords", []))) for rule in ordered]
+        self.folders = {folder for folder, _ in self.keyword_rules}
+        self.max_workers = max_workers
+        self.max_chars = max_chars
+        self.min_score = min_score
+        self.timeout = timeout
+        self.model = self._load_model(model_path)
+        self._scorer = ContentScorer(self.keyword_rules, self.model, min_score)
+        self._pool = RecyclingProcessPool(
+            max_workers, initializer=_init_worker, initargs=(self.keyword_rules, self.model, min_score)
+        )
+        self.classified = 0
+        self.unmatched = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def _load_model(model_path: str) -> Optional[Dict]:
+        """Read the optional scoring model"""
+        if not model_path or not os.path.exists(model_path):
+            return None
+        try:
+            with open(model_path, "r") as file:
+                return json.load(file)
+        except Exception as e:
+            print(f"Error loading content scoring model {model_path}: {str(e)}")
+            return None
+
+    def classify(self, text: str, wait: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """
+        Best rule folder for a file's text
+
+        Args:
+            text: File text (only the first max_chars are scored)
+            wait: Seconds to wait for a free worker (None waits as long as it takes)
+
+        Returns:
+            (folder, score), or None if no folder scores high enough
+
+        Raises:
+            TimeoutError: No worker was free within `wait`, or scoring
+                overran the timeout (the stuck worker is recycled)
+        """
+        text = text[:self.max_chars]
+        if self.max_workers > 0:
+            try:
+                result = self._pool.run(_score_in_worker, text, timeout=self.timeout, wait=wait)
+            except TimeoutError:
+                self.timeouts += 1
+                raise TimeoutError("content classification timed out")
+        else:
+            result = self._scorer.best(text)
+        if result is None:
+            self.unmatched += 1
+        else:
+            self.classified += 1
+        return result
+
+    def stats(self) -> Dict:
+        """Classification counters for /metrics"""
+        return {
+            "classified": self.classified,
+            "unmatched": self.unmatched,
+            "timeouts": self.timeouts,
+            "model": self.model is not None,
+            **self._pool.stats(),
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        self._pool.shutdown()
+
+
+# Content pass for files the sorting rules leave Unsorted
+content_classifier = ContentClassifier(
+    SORTING_RULES,
+    max_workers=settings.sort_sniff_workers,
+    max_chars=settings.sort_sniff_max_bytes,
+    min_score=settings.sort_sniff_min_score,
+    timeout=settings.sort_sniff_timeout,
+    model_path=settings.sort_sniff_model_path
+)
@@ -1,17 +1,60 @@
 """Context retrieval service for finding relevant files from Google Drive"""
 from app.services.google_drive import GoogleDriveService
 from app.models.file_metadata import DriveFile
-from typing import List, Dict, Optional, Tuple
+from app.services.search_index import DriveSearchIndex, search_index
+from app.services.vector_index import VectorIndex, vector_index
+from app.services.drive_sync import DriveSyncEngine, drive_sync
+from app.services.drive_tree import DriveTreeCrawler, drive_tree
+from app.services.duplicates import DuplicateIndex, duplicate_index
+from app.services.executor import propagate_context
+from app.services.passages import STOP_WORDS, select_passages, tokenize
+from app.config import settings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Dict, Optional, Tuple, TypeVar
 from datetime import datetime, timedelta
+import functools
+import heapq
 import re
 
 
+T = TypeVar("T")
+R = TypeVar("R")
+
+
 class ContextRetriever:
     """Service for retrieving relevant context from Google Drive"""
     
-    def __init__(self, drive_service: GoogleDriveService):
-        """Initialize with Google Drive service"""
+    def __init__(
+        self,
+        drive_service: GoogleDriveService,
+        max_in_flight: Optional[int] = None,
+        index: Optional[DriveSearchIndex] = None,
+        vectors: Optional[VectorIndex] = None,
+        snapshot: Optional[DriveSyncEngine] = None,
+        tree: Optional[DriveTreeCrawler] = None,
+        duplicates: Optional[DuplicateIndex] = None
+    ):
+        """
+        Initialize with Google Drive service
+        
+        Args:
+            drive_service: Google Drive service
+            max_in_flight: Cap on concurrent Drive requests (1 = sequential)
+            index: Local BM25 index (defaults to the global synced index)
+            vectors: Local vector index (defaults to the global synced index)
+            snapshot: Drive metadata snapshot; once synced, name searches and
+                the folder tree are answered from it instead of Drive
+            tree: Cached folder tree crawler used until the snapshot is ready
+            duplicates: Index of files by content; copies of a file already
+                retrieved are skipped
+        """
         self.drive_service = drive_service
+        self.max_in_flight = max_in_flight or settings.drive_max_in_flight
+        self.index = index if index is not None else search_index
+        self.vectors = vectors if vectors is not None else vector_index
+        self.snapshot = snapshot if snapshot is not None else drive_sync
+        self.tree = tree if tree is not None else drive_tree
+        self.duplicates = duplicates if duplicates is not None else duplicate_index
     
     def extract_keywords(self, text: str) -> List[str]:
         """
@@ -27,16 +70,7 @@ class ContextRetriever:
         words = text.lower().split()
         
         # Remove common stop words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'been',
-            'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
-            'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
-            'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'what', 'which',
-            'who', 'when', 'where', 'why', 'how', 'create', 'make', 'write', 'generate'
-        }
-        
-        keywords = [word for word in words if word not in stop_words and len(word) > 2]
+        keywords = [word for word in words if word not in STOP_WORDS and len(word) > 2]
         
         # Return unique keywords
         return list(set(keywords))
@@ -119,30 +153,103 @@ class ContextRetriever:
         self,
         keywords: List[str],
         folder_name: Optional[str] = None,
-        files: Optional[List[DriveFile]] = None,
+        files: Optional[Iterable[DriveFile]] = None,
         max_results: int = 10
     ) -> List[Tuple[DriveFile, float]]:
-        """Search for files matching keywords. Pass files= to search a pre-fetched list."""
+        """
+        Search for files matching keywords. Pass files= to search a pre-fetched list or a stream.
+
+        Files are scored as they are consumed and only the top max_results
+        are kept, so a streamed listing never has to fit in memory.
+        """
         if files is None:
             folder_id = self.drive_service.find_folder_by_name(folder_name) if folder_name else None
-            files = self.drive_service.list_files(folder_id=folder_id)
-        scored_files = []
-        for file in files:
-            if file.mime_type == "application/vnd.google-apps.folder":
-                continue
-            score = self.score_file_relevance(file, keywords, folder_name)
-            if score > 0:
-                scored_files.append((file, score))
-        scored_files.sort(key=lambda x: x[1], reverse=True)
-        return scored_files[:max_results]
+            files = self.drive_service.iter_files(folder_id=folder_id)
+        scored_files = (
+            (file, self.score_file_relevance(file, keywords, folder_name))
+            for file in files
+            if self.drive_service.can_read_text(file.mime_type, file.size)
+        )
+        # nlargest is stable, so ties keep listing order like a sorted() would
+        return heapq.nlargest(max_results, (item for item in scored_files if item[1] > 0), key=lambda x: x[1])
+
+    def _map_concurrent(self, fn: Callable[[T], R], items: List[T]) -> List[R]:
+        """Apply fn to items with at most max_in_flight calls at once; keeps input order"""
+        if self.max_in_flight <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(items))) as pool:
+            return list(pool.map(propagate_context(fn), items))
+
+    def _context_entry(
+        self,
+        file: DriveFile,
+        content: str,
+        score: float,
+        query_terms: List[str],
+        spans: Optional[List[Tuple[int, int]]] = None,
+        max_chars: Optional[int] = None
+    ) -> Dict:
+        """
+        Build the context dict for a retrieved file from its best passages
+
+        Args:
+            file: Retrieved file
+            content: Extracted text
+            score: Stage relevance score
+            query_terms: Tokenized user query
+            spans: Matching passage spans from the index, best first
+            max_chars: Character budget left for this file
+        """
+        # Index spans only line up with the text version that was indexed
+        if spans and max(end for _, end in spans) > len(content):
+            spans = None
+        passages = select_passages(query_terms, content, max_chars=max_chars, spans=spans)
+        return {
+            'name': file.name,
+            'folder': file.folder_path or 'Drive',
+            'content': "\n...\n".join(passages),
+            'passages': passages,
+            'relevance_score': score,
+            'modified_time': file.modified_time.isoformat() if file.modified_time else None
+        }
+
+    def _search_by_filename(self, token: str) -> List[DriveFile]:
+        """Stage 1 search: name contains token, retrying with spaces for underscores"""
+        list_by_name = self.drive_service.list_files_by_name
+        if self.snapshot.ready:
+            list_by_name = self.snapshot.list_files_by_name
+        by_name = list_by_name(token)
+        if not by_name and "_" in token:
+            by_name = list_by_name(token.replace("_", " "))
+        return by_name
 
     def get_relevant_files(
         self,
         content_type: str,
         user_query: str,
-        max_files: int = 10
+        max_files: int = 10,
+        max_chars: Optional[int] = None
     ) -> List[Dict]:
-        """Get relevant files: filename match, then fullText content search, then keyword-by-name over root + subfolders."""
+        """
+        Get relevant files: filename match, then content search, then semantic search, then keyword-by-name over the folder tree.
+
+        Content search ranks the local BM25 index once a sync has built it
+        (scores scaled to at most 85); before that it falls back to Drive
+        fullText searches (85 each). The semantic stage ranks the local
+        vector index (scores scaled to at most 60) and catches files that
+        share meaning but few exact terms. All remote searches are issued
+        concurrently, then candidates are ranked in stage order (filename
+        100, content, semantic, keyword score), deduplicated by file ID and
+        by content (copies with the same md5Checksum and size count once;
+        the canonical copy's text is read, which is usually cached) and
+        downloaded concurrently in waves until max_files have non-empty
+        content.
+
+        Each file contributes its passages most relevant to the query (the
+        index's matching passages when it has them) rather than its head, and
+        all files together stay within max_chars (default: the whole
+        settings.context_token_budget); downloads stop once it is used up.
+        """
         keywords = self.extract_keywords(user_query)
         type_keywords = {
             'newsletter': ['newsletter', 'monthly', 'update', 'community'],
@@ -152,82 +259,111 @@ class ContextRetriever:
         }
         if content_type in type_keywords:
             keywords.extend(type_keywords[content_type])
+        # Files filed under the content type's sorted folder get the folder bonus
+        type_folders = {
+            'newsletter': 'Newsletters',
+            'blog_post': 'Blog Posts',
+            'social_media': 'Social Media',
+        }
+        target_folder = type_folders.get(content_type)
 
-        relevant_files = []
-        seen_ids = set()
-
-        # 1) Explicit filename match: user said "use test_event_summary" etc.
-        for token in self._filename_like_tokens(user_query):
-            by_name = self.drive_service.list_files_by_name(token)
-            if not by_name and "_" in token:
-                by_name = self.drive_service.list_files_by_name(token.replace("_", " "))
-            for file in by_name:
-                if file.id in seen_ids or file.mime_type == "application/vnd.google-apps.folder":
-                    continue
-                seen_ids.add(file.id)
-                content = self.drive_service.get_file_content(file.id)
-                if content:
-                    if len(content) > 5000:
-                        content = content[:5000] + "\n...(truncated)"
-                    relevant_files.append({
-                        'name': file.name,
-                        'folder': file.folder_path or 'Drive',
-                        'content': content,
-                        'relevance_score': 100.0,
-                        'modified_time': file.modified_time.isoformat() if file.modified_time else None
-                    })
-                    if len(relevant_files) >= max_files:
-                        return relevant_files
+        # Fan out every search at once:
+        # 1) explicit filename match ("use test_event_summary"),
+        # 2) fullText content search for terms like "2pm", "summary",
+        # 3) folder tree listing (cached crawl), streamed into keyword-by-name
+        #    scoring so only the top max_files are kept
+        # (1 and 3 come from the local snapshot once a sync has built it)
+        name_tokens = self._filename_like_tokens(user_query)
+        use_index = len(self.index) > 0
+        content_terms = [] if use_index else self._content_search_terms(user_query, keywords, max_terms=5)
+        if self.snapshot.ready:
+            tree_files = self.snapshot.iter_tree_files
+        else:
+            tree_files = functools.partial(self.tree.get_files, self.drive_service)
+        searches = (
+            [lambda t=token: self._search_by_filename(t) for token in name_tokens]
+            + [lambda t=term: self.drive_service.list_files_by_content(t, page_size=10) for term in content_terms]
+            + [lambda: self.search_files_by_keywords(
+                keywords=keywords, folder_name=target_folder, files=tree_files(), max_results=max_files
+            )]
+        )
+        results = self._map_concurrent(lambda search: search(), searches)
+        by_name_results = results[:len(name_tokens)]
+        by_content_results = results[len(name_tokens):-1]
+        scored = results[-1]
 
-        # 2) Content search: fullText for terms like "2pm", "5pm", "summary", "time"
-        for term in self._content_search_terms(user_query, keywords, max_terms=5):
-            if len(relevant_files) >= max_files:
-                break
-            try:
-                by_content = self.drive_service.list_files_by_content(term, page_size=10)
-                for file in by_content:
-                    if file.id in seen_ids or file.mime_type == "application/vnd.google-apps.folder":
-                        continue
-                    seen_ids.add(file.id)
-                    content = self.drive_service.get_file_content(file.id)
-                    if content:
-                        if len(content) > 5000:
-                            content = content[:5000] + "\n...(truncated)"
-                        relevant_files.append({
-                            'name': file.name,
-                            'folder': file.folder_path or 'Drive',
-                            'content': content,
-                            'relevance_score': 85.0,
-                            'modified_time': file.modified_time.isoformat() if file.modified_time else None
-                        })
-                        if len(relevant_files) >= max_files:
-                            break
-            except Exception:
-                continue
+        # Rank candidates in stage priority order; seen_ids dedups across stages
+        query_terms = tokenize(user_query)
+        ranked: List[Tuple[DriveFile, float]] = []
+        index_spans: Dict[str, List[Tuple[int, int]]] = {}
+        for files in by_name_results:
+            ranked.extend((file, 100.0) for file in files)
+        if use_index:
+            hits = self.index.search_passages(query_terms, limit=max_files)
+            if hits:
+                top = hits[0][1]
+                for file, score, spans in hits:
+                    ranked.append((file, 60.0 + 25.0 * score / top))
+                    index_spans[file.id] = spans
+        else:
+            for files in by_content_results:
+                ranked.extend((file, 85.0) for file in files)
+        if len(self.vectors) > 0:
+            for file, similarity, spans in self.vectors.search(user_query, limit=max_files):
+                ranked.append((file, 40.0 + 20.0 * similarity))
+                index_spans.setdefault(file.id, spans)
+        candidates: List[Tuple[DriveFile, float]] = []
+        seen_ids = set()
+        seen_clusters = set()
 
-        # 3) Keyword search over root + all immediate subfolders (by name)
-        all_files = self.drive_service.list_root_and_subfolder_files()
-        scored = self.search_files_by_keywords(keywords=keywords, files=all_files, max_results=max_files)
-        for file, score in scored:
+        def is_new(file: DriveFile) -> bool:
             if file.id in seen_ids:
-                continue
+                return False
             seen_ids.add(file.id)
-            content = self.drive_service.get_file_content(file.id)
-            if content:
-                if len(content) > 5000:
-                    content = content[:5000] + "\n...(truncated)"
-                relevant_files.append({
-                    'name': file.name,
-                    'folder': file.folder_path or 'Drive',
-                    'content': content,
-                    'relevance_score': score,
-                    'modified_time': file.modified_time.isoformat() if file.modified_time else None
-                })
-            if len(relevant_files) >= max_files:
-                break
+            cluster = self.duplicates.cluster_key(file)
+            if cluster is not None:
+                if cluster in seen_clusters:
+                    return False
+                seen_clusters.add(cluster)
+            return True
+
+        for file, score in ranked:
+            if self.drive_service.can_read_text(file.mime_type, file.size) and is_new(file):
+                candidates.append((file, score))
+        for file, score in scored:
+            if is_new(file):
+                candidates.append((file, score))
+
+        # Download in waves sized to the remaining slots so no more files are
+        # fetched than the sequential scan would have; empty files are skipped
+        relevant_files = []
+        budget = settings.context_token_budget * 4 if max_chars is None else max_chars
+        per_file = settings.passage_chars * settings.passages_per_file
+        pos = 0
+        while pos < len(candidates) and len(relevant_files) < max_files and budget > 0:
+            wave = candidates[pos:pos + max_files - len(relevant_files)]
+            pos += len(wave)
+            contents = self._map_concurrent(lambda candidate: self._read_text(candidate[0]), wave)
+            for (file, score), content in zip(wave, contents):
+                if content and budget > 0:
+                    entry = self._context_entry(
+                        file, content, score, query_terms,
+                        spans=index_spans.get(file.id), max_chars=min(per_file, budget)
+                    )
+                    budget -= len(entry['content'])
+                    relevant_files.append(entry)
 
         return relevant_files
     
+    def _read_text(self, file: DriveFile) -> Optional[str]:
+        """A file's text, read from its canonical copy if it is a duplicate"""
+        canonical = self.duplicates.canonical_file(file)
+        if canonical is not None:
+            content = self.drive_service.get_file_text(canonical)
+            if content:
+                return content
+        return self.drive_service.get_file_text(file)
+    
     def cache_file_metadata(self, files: List[DriveFile]):
         """
         Cache file metadata (currently disabled - no database)
@@ -275,7 +411,7 @@ class ContextRetriever:
         # Limit and get content
         result = []
         for file in recent_files[:max_files]:
-            content = self.drive_service.get_file_content(file.id)
+            content = self.drive_service.get_file_text(file)
             if content:
                 result.append({
                     'name': file.name,
@@ -0,0 +1,81 @@
+"""Process-wide pool of Drive service objects"""
+from app.services.google_drive import GoogleDriveService
+from collections import OrderedDict
+from google.oauth2.credentials import Credentials
+from typing import Dict, Tuple
+import threading
+
+
+class DriveServicePool:
+    """
+    One GoogleDriveService per credential set, built once and shared.
+
+    Building a Drive client parses the (bundled, static) discovery document,
+    which costs far more than the API call many requests make. Pooled
+    services are safe to share across threads: each thread gets its own
+    authorized httplib2 transport (see GoogleDriveService._http), which
+    keeps its connections alive between requests. Expired access tokens
+    are refreshed by the transport before each request, so a pooled
+    service outlives any single token.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        """
+        Initialize the pool
+
+        Args:
+            max_entries: Credential sets kept; older ones (e.g. after a
+                reconnect) are dropped first
+        """
+        self.max_entries = max_entries
+        self._services: "OrderedDict[Tuple, GoogleDriveService]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+
+    @staticmethod
+    def _key(credentials: Credentials) -> Tuple:
+        """Identity of a credential set (the refresh token survives access token refreshes)"""
+        return (
+            getattr(credentials, "client_id", None),
+            getattr(credentials, "refresh_token", None) or getattr(credentials, "token", None),
+        )
+
+    def get(self, credentials: Credentials) -> GoogleDriveService:
+        """
+        Get the shared service for a credential set, building it on first use
+
+        Args:
+            credentials: OAuth credentials
+
+        Returns:
+            GoogleDriveService
+        """
+        key = self._key(credentials)
+        with self._lock:
+            service = self._services.get(key)
+            if service is not None:
+                self._services.move_to_end(key)
+                self.hits += 1
+                return service
+            # Build under the lock so concurrent first requests share one build
+            service = GoogleDriveService(credentials)
+            self.builds += 1
+            self._services[key] = service
+            while len(self._services) > self.max_entries:
+                self._services.popitem(last=False)
+            return service
+
+    def clear(self):
+        """Drop all pooled services (e.g. after disconnecting Drive)"""
+        with self._lock:
+            self._services.clear()
+
+    def stats(self) -> Dict:
+        """Pool counters for /metrics"""
+        with self._lock:
+            return {"services": len(self._services), "builds": self.builds, "hits": self.hits}
+
+
+# Global service pool instance
+drive_service_pool = DriveServicePool()
@@ -0,0 +1,253 @@
+"""Client-side Drive API rate limiting, retry with backoff and quota accounting"""
+from app.config import settings
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+import contextvars
+import json
+import random
+import threading
+import time
+
+
+# 403 reasons Drive uses for quota / rate limits (other 403s are permission errors)
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "sharingRateLimitExceeded"}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of an API error (HttpError or anything exposing resp.status)"""
+    status = getattr(getattr(error, "resp", None), "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def error_reason(error: BaseException) -> Optional[str]:
+    """First error reason in a Drive error body (e.g. 'userRateLimitExceeded')"""
+    reason = getattr(error, "reason", None)
+    if isinstance(reason, str) and reason in RATE_LIMIT_REASONS:
+        return reason
+    content = getattr(error, "content", None)
+    if not content:
+        return None
+    try:
+        body = json.loads(content.decode("utf-8") if isinstance(content, bytes) else content)
+        errors = body.get("error", {}).get("errors") or [{}]
+        return errors[0].get("reason")
+    except Exception:
+        return None
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an error means 'slow down' (429, or 403 with a rate limit reason)"""
+    status = error_status(error)
+    return status == 429 or (status == 403 and error_reason(error) in RATE_LIMIT_REASONS)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether retrying an API call after a pause can succeed"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    status = error_status(error)
+    return status in RETRYABLE_STATUSES or is_rate_limited(error)
+
+
+class DriveUsage:
+    """Drive API calls issued on behalf of one request (e.g. one chat turn)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+        self.by_method: Dict[str, int] = {}
+
+    def record(self, method: str, cost: int = 1, retries: int = 0, rate_limited: int = 0,
+               failed: bool = False, throttled: float = 0.0):
+        """Add one executed call (or batch of `cost` calls) to the counters"""
+        with self._lock:
+            self.calls += cost
+            self.retries += retries
+            self.rate_limited += rate_limited
+            self.failures += int(failed)
+            self.throttled_seconds += throttled
+            self.by_method[method] = self.by_method.get(method, 0) + cost
+
+    def as_dict(self) -> Dict:
+        """Counters for API responses and metrics"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "throttled_ms": round(self.throttled_seconds * 1000, 1),
+                "by_method": dict(self.by_method),
+            }
+
+
+# Usage of the request being served; worker pools inherit it via copied contexts
+_request_usage: contextvars.ContextVar[Optional[DriveUsage]] = contextvars.ContextVar(
+    "drive_request_usage", default=None
+)
+
+
+class DriveRateLimiter:
+    """
+    Token bucket shared by every Drive call in the process, with retries.
+
+    Each call (each sub-request of a batch) takes one token; tokens refill
+    at `rate` per second up to `burst`, so a burst of fullText searches is
+    spread out instead of tripping Drive's per-user quota. Calls that fail
+    with 429, a 403 rate limit reason or a 5xx are retried with full-jitter
+    exponential backoff. The refill rate adapts: it halves on every rate
+    limit response and creeps back to the configured rate as calls succeed.
+    Counts are kept process-wide and per request (see track()).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        min_rate: float = 0.5
+    ):
+        """
+        Initialize the limiter
+
+        Args:
+            rate: Sustained calls per second (0 disables limiting)
+            burst: Bucket size (calls allowed back to back)
+            max_retries: Retries per call after the first attempt
+            backoff_base: First backoff ceiling in seconds (doubles per retry)
+            backoff_max: Largest backoff ceiling in seconds
+            min_rate: Floor for the adaptive rate
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_rate = min(min_rate, rate) if rate else 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.totals = DriveUsage()
+
+    def acquire(self, cost: int = 1) -> float:
+        """
+        Block until `cost` tokens are available and take them
+
+        Returns:
+            Seconds spent waiting
+        """
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Batches larger than the bucket go through once it is full
+                needed = min(cost, self.burst)
+                if self._tokens >= needed:
+                    self._tokens -= cost
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def slow_down(self):
+        """Multiplicative decrease after a rate limit response"""
+        with self._lock:
+            if self.rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+
+    def speed_up(self):
+        """Additive increase back toward the configured rate after a success"""
+        if self.rate and self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def backoff(self, attempt: int) -> float:
+        """Sleep a full-jitter backoff for a retry attempt (0-based); returns seconds slept"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        time.sleep(delay)
+        return delay
+
+    def call(self, fn: Callable[[], Any], method: str = "unknown", cost: int = 1) -> Any:
+        """
+        Run one API call (or one batch of `cost` calls) under the limiter
+
+        Args:
+            fn: Performs the HTTP round trip
+            method: API method name for the per-method counts
+            cost: Quota units the round trip uses (sub-requests in a batch)
+
+        Returns:
+            fn's result. The last error propagates once retries are exhausted
+            or the error isn't retryable.
+        """
+        retries = rate_limited = 0
+        throttled = 0.0
+        while True:
+            throttled += self.acquire(cost)
+            try:
+                result = fn()
+            except Exception as e:
+                if is_rate_limited(e):
+                    rate_limited += 1
+                    self.slow_down()
+                if retries >= self.max_retries or not is_retryable(e):
+                    self._record(method, cost, retries, rate_limited, True, throttled)
+                    raise
+                print(f"Drive {method} failed ({str(e)[:80]}); retry {retries + 1}/{self.max_retries}")
+                throttled += self.backoff(retries)
+                retries += 1
+                continue
+            self.speed_up()
+            self._record(method, cost, retries, rate_limited, False, throttled)
+            return result
+
+    def _record(self, method: str, cost: int, retries: int, rate_limited: int, failed: bool, throttled: float):
+        """Count a finished call process-wide and for the current request"""
+        self.totals.record(method, cost, retries, rate_limited, failed, throttled)
+        usage = _request_usage.get()
+        if usage is not None:
+            usage.record(method, cost, retries, rate_limited, failed, throttled)
+
+    @contextmanager
+    def track(self, usage: DriveUsage) -> Iterator[DriveUsage]:
+        """
+        Count Drive calls made in this context (and in work submitted from it
+        through BlockingExecutor or propagate_context) into `usage`
+        """
+        token = _request_usage.set(usage)
+        try:
+            yield usage
+        finally:
+            _request_usage.reset(token)
+
+    def stats(self) -> Dict:
+        """Limiter state and process-wide counters for /metrics"""
+        with self._lock:
+            state = {"rate": round(self.rate, 2), "max_rate": self.max_rate, "tokens": round(self._tokens, 2)}
+        return {**state, **self.totals.as_dict()}
+
+
+# Global limiter shared by every GoogleDriveService
+drive_limiter = DriveRateLimiter(
+    rate=settings.drive_rate_limit,
+    burst=settings.drive_rate_burst,
+    max_retries=settings.drive_max_retries,
+    backoff_base=settings.drive_backoff_base,
+    backoff_max=settings.drive_backoff_max
+)
@@ -0,0 +1,298 @@
+"""Incremental Drive metadata sync backed by the Changes API"""
+from app.config import settings
+from app.models.file_metadata import DriveFile
+from app.services.drive_tree import FOLDER_MIME_TYPE, build_folder_paths
+from app.services.duplicates import DuplicateIndex, duplicate_index
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+import asyncio
+import json
+import os
+import threading
+
+
+class DriveSyncEngine:
+    """
+    Local snapshot of Drive file metadata, kept current with the Changes API.
+
+    The first sync crawls every file. It records a Changes API start page
+    token *before* crawling, so edits made during the crawl are replayed by
+    the next sync. Later syncs only page through `changes.list` from the
+    stored token. An expired token (HTTP 410) falls back to a full crawl.
+    The snapshot (id, name, mime, parents, modifiedTime, md5 and the token)
+    is persisted as JSON, so retrieval and sorting can read file metadata
+    without listing Drive. Every sync also feeds the duplicate index.
+    """
+
+    def __init__(self, snapshot_path: str, duplicates: Optional[DuplicateIndex] = None):
+        """
+        Initialize the engine
+
+        Args:
+            snapshot_path: JSON file the snapshot is persisted to
+            duplicates: Duplicate index kept current with the snapshot
+                (defaults to the global one)
+        """
+        self.snapshot_path = snapshot_path
+        self.duplicates = duplicates if duplicates is not None else duplicate_index
+        self._files: Dict[str, DriveFile] = {}
+        self._root_id: Optional[str] = None
+        self._page_token: Optional[str] = None
+        self._last_sync: Optional[str] = None
+        self._paths: Optional[Dict[str, str]] = None  # folder_id -> path, rebuilt after changes
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        """Load the persisted snapshot on first use"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path, "r") as file:
+                        data = json.load(file)
+                    self._files = {item["id"]: DriveFile(**item) for item in data.get("files", [])}
+                    self._root_id = data.get("root_id")
+                    self._page_token = data.get("page_token")
+                    self._last_sync = data.get("last_sync")
+                except Exception as e:
+                    print(f"Error loading Drive snapshot: {str(e)}")
+            self._loaded = True
+
+    def _save(self):
+        """Persist the snapshot atomically"""
+        with self._lock:
+            data = json.dumps({
+                "root_id": self._root_id,
+                "page_token": self._page_token,
+                "last_sync": self._last_sync,
+                "files": [f.model_dump(mode="json", exclude={"folder_path"}) for f in self._files.values()],
+            })
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(data)
+        os.replace(tmp_path, self.snapshot_path)
+
+    @property
+    def ready(self) -> bool:
+        """Whether a full crawl has completed"""
+        self._ensure_loaded()
+        return self._page_token is not None
+
+    def __len__(self) -> int:
+        """Number of files in the snapshot"""
+        self._ensure_loaded()
+        return len(self._files)
+
+    def sync(self, drive_service, full: bool = False) -> Dict:
+        """
+        Bring the snapshot up to date
+
+        Args:
+            drive_service: GoogleDriveService (or one wrapping a fake Drive resource)
+            full: Force a full crawl even if a page token is stored
+
+        Returns:
+            Dict with mode ("full" or "incremental"), changed, removed and files
+        """
+        self._ensure_loaded()
+        with self._sync_lock:
+            if full or self._page_token is None:
+                return self._full_sync(drive_service)
+            try:
+                return self._incremental_sync(drive_service)
+            except Exception as e:
+                if getattr(getattr(e, "resp", None), "status", None) == 410:
+                    print("Drive change token expired; running a full crawl")
+                    return self._full_sync(drive_service)
+                raise
+
+    def _full_sync(self, drive_service) -> Dict:
+        """Crawl every file and replace the snapshot"""
+        page_token = drive_service.get_start_page_token()
+        root_id = drive_service.get_root_folder_id()
+        # Build the new snapshot page by page; the old one stays live until it's complete
+        files = {f.id: f for f in drive_service.iter_files(page_size=1000, raise_errors=True)}
+        with self._lock:
+            self._files = files
+            self._paths = None
+            self._root_id = root_id
+            self._page_token = page_token
+            self._last_sync = datetime.utcnow().isoformat()
+        self._save()
+        self.duplicates.observe(files.values(), complete=True)
+        return {"mode": "full", "changed": len(files), "removed": 0, "files": len(files)}
+
+    def _incremental_sync(self, drive_service) -> Dict:
+        """Replay changes since the stored page token"""
+        token = self._page_token
+        updates: Dict[str, Optional[DriveFile]] = {}
+        while True:
+            changes, next_token, new_start_token = drive_service.list_changes(token)
+            for file_id, file in changes:
+                updates[file_id] = file  # later changes win
+            if new_start_token:
+                break
+            token = next_token
+        changed = removed = 0
+        with self._lock:
+            for file_id, file in updates.items():
+                if file is None:
+                    if self._files.pop(file_id, None) is not None:
+                        removed += 1
+                else:
+                    self._files[file_id] = file
+                    changed += 1
+            self._paths = None
+            self._page_token = new_start_token
+            self._last_sync = datetime.utcnow().isoformat()
+            total = len(self._files)
+        self._save()
+        self.duplicates.observe(
+            [file for file in updates.values() if file is not None],
+            removed=[file_id for file_id, file in updates.items() if file is None]
+        )
+        return {"mode": "incremental", "changed": changed, "removed": removed, "files": total}
+
+    def _folder_paths(self) -> Dict[str, str]:
+        """folder_id -> path for folders under My Drive (caller holds the lock)"""
+        if self._paths is None:
+            folders = {
+                f.id: (f.name, (f.parents or [None])[0])
+                for f in self._files.values() if f.mime_type == FOLDER_MIME_TYPE
+            }
+            self._paths = build_folder_paths(folders, self._root_id, rooted_only=True)
+        return self._paths
+
+    def _with_folder_path(self, file: DriveFile) -> DriveFile:
+        """Copy of a file with folder_path set to its parent folder's full path"""
+        path = self._folder_paths().get((file.parents or [None])[0])
+        return file.model_copy(update={"folder_path": path or None})
+
+    def get_file(self, file_id: str) -> Optional[DriveFile]:
+        """Snapshot metadata for one file"""
+        self._ensure_loaded()
+        with self._lock:
+            file = self._files.get(file_id)
+            return self._with_folder_path(file) if file is not None else None
+
+    def iter_files(self, folder_id: Optional[str] = None) -> Iterator[DriveFile]:
+        """
+        Stream files in the snapshot, optionally only the direct children of a folder
+
+        Copies (with folder_path filled in) are made one at a time as the
+        caller consumes them, and no lock is held between items.
+
+        Args:
+            folder_id: Parent folder ID ("root" for My Drive), or None for all files
+        """
+        self._ensure_loaded()
+        with self._lock:
+            if folder_id == "root":
+                folder_id = self._root_id
+            files = list(self._files.values())
+        for f in files:
+            if folder_id is None or folder_id in (f.parents or []):
+                with self._lock:
+                    copy = self._with_folder_path(f)
+                yield copy
+
+    def list_files(self, folder_id: Optional[str] = None) -> List[DriveFile]:
+        """List version of iter_files"""
+        return list(self.iter_files(folder_id))
+
+    def list_files_by_name(self, name_substring: str, page_size: int = 20) -> List[DriveFile]:
+        """Files whose name contains a substring (case-insensitive), most recently modified first"""
+        needle = name_substring.lower()
+        self._ensure_loaded()
+        with self._lock:
+            matches = [f for f in self._files.values() if needle in f.name.lower()]
+            matches.sort(key=lambda f: f.modified_time.timestamp() if f.modified_time else 0, reverse=True)
+            return [self._with_folder_path(f) for f in matches[:page_size]]
+
+    def iter_tree_files(self, max_depth: Optional[int] = None) -> Iterator[DriveFile]:
+        """
+        Snapshot equivalent of DriveTreeCrawler: non-folder files under My
+        Drive at most `max_depth` folder levels down, with folder_path set
+
+        Args:
+            max_depth: Folder levels (1 = root only); defaults to settings.drive_crawl_max_depth
+        """
+        max_depth = max_depth or settings.drive_crawl_max_depth
+        self._ensure_loaded()
+        with self._lock:
+            paths = self._folder_paths()
+            files = list(self._files.values())
+        for f in files:
+            if f.mime_type == FOLDER_MIME_TYPE:
+                continue
+            path = paths.get((f.parents or [None])[0])
+            if path is None:
+                continue
+            depth = path.count("/") + 2 if path else 1
+            if depth <= max_depth:
+                yield f.model_copy(update={"folder_path": path or None})
+
+    def list_tree_files(self, max_depth: Optional[int] = None) -> List[DriveFile]:
+        """List version of iter_tree_files"""
+        return list(self.iter_tree_files(max_depth))
+
+    def record_move(self, file_id: str, dest_folder_id: str):
+        """Reflect a move made through the API without waiting for the next sync"""
+        self._ensure_loaded()
+        with self._lock:
+            file = self._files.get(file_id)
+            if file is not None:
+                self._files[file_id] = file.model_copy(update={"parents": [dest_folder_id]})
+                if file.mime_type == FOLDER_MIME_TYPE:
+                    self._paths = None
+
+    async def run_sync_loop(self, service_factory: Callable, run_blocking: Callable, interval: float):
+        """
+        Background task: sync every `interval` seconds while Drive is connected
+
+        Args:
+            service_factory: Blocking callable returning a GoogleDriveService,
+                or None when Drive isn't connected
+            run_blocking: Async callable running blocking work off the loop
+                (e.g. drive_executor.run)
+            interval: Seconds between syncs
+        """
+        while True:
+            try:
+                drive_service = await run_blocking(service_factory)
+                if drive_service is not None:
+                    await run_blocking(self.sync, drive_service)
+            except Exception as e:
+                print(f"Background Drive sync failed: {str(e)}")
+            await asyncio.sleep(interval)
+
+    def clear(self):
+        """Forget the snapshot (e.g. the account changed); waits for a running sync"""
+        self._ensure_loaded()
+        with self._sync_lock:
+            with self._lock:
+                self._files = {}
+                self._paths = None
+                self._root_id = None
+                self._page_token = None
+                self._last_sync = None
+            self._save()
+
+    def stats(self) -> Dict:
+        """Snapshot size and sync state"""
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "ready": self._page_token is not None,
+                "last_sync": self._last_sync,
+            }
+
+
+# Global sync engine instance
+drive_sync = DriveSyncEngine(settings.drive_snapshot_path)
@@ -0,0 +1,142 @@
+"""Breadth-first Drive folder crawler with folder path resolution"""
+from app.config import settings
+from app.models.file_metadata import DriveFile
+from app.services.executor import propagate_context
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+def build_folder_paths(
+    folders: Dict[str, Tuple[str, Optional[str]]],
+    root_id: Optional[str],
+    rooted_only: bool = False
+) -> Dict[str, str]:
+    """
+    Resolve every folder's path from its parent chain
+
+    Args:
+        folders: folder_id -> (name, parent folder ID or None)
+        root_id: ID of My Drive's root; it maps to "" and is not part of paths
+        rooted_only: Only resolve folders whose chain reaches root_id
+
+    Returns:
+        folder_id -> "Parent/Child" path. Otherwise folders whose chain
+        leaves the map (e.g. shared with the user) are rooted at their
+        top-most known ancestor; cycles are cut where they repeat.
+    """
+    paths: Dict[str, str] = {}
+    if root_id:
+        paths[root_id] = ""
+    for folder_id in folders:
+        chain = []
+        current = folder_id
+        while current is not None and current not in paths and current in folders and current not in chain:
+            chain.append(current)
+            current = folders[current][1]
+        if rooted_only and current not in paths:
+            continue
+        prefix = paths.get(current, "") if current is not None else ""
+        for node in reversed(chain):
+            prefix = f"{prefix}/{folders[node][0]}" if prefix else folders[node][0]
+            paths[node] = prefix
+    return paths
+
+
+class DriveTreeCrawler:
+    """
+    Breadth-first crawl of My Drive down to `max_depth` folder levels.
+
+    Each level's folders are listed concurrently (at most `max_in_flight`
+    at once, every page of each), and each folder's path is derived from
+    its parent's as the crawl descends, so every file comes back with
+    folder_path filled in. The result is cached for `ttl` seconds and
+    shared across requests; call invalidate() after moving files.
+    """
+
+    def __init__(self, max_depth: int, max_in_flight: int, ttl: float):
+        """
+        Initialize the crawler
+
+        Args:
+            max_depth: Folder levels to descend (1 = root only, 2 = root and
+                its immediate subfolders, ...)
+            max_in_flight: Maximum folders listed concurrently
+            ttl: Seconds a crawled tree is reused
+        """
+        self.max_depth = max_depth
+        self.max_in_flight = max_in_flight
+        self.ttl = ttl
+        self._files: Optional[List[DriveFile]] = None
+        self._crawled_at = 0.0
+        self._lock = threading.Lock()
+
+    def crawl(self, drive_service, max_depth: Optional[int] = None) -> Tuple[List[DriveFile], Dict[str, str]]:
+        """
+        Crawl the tree now (uncached)
+
+        Args:
+            drive_service: GoogleDriveService
+            max_depth: Override for the configured depth limit
+
+        Returns:
+            (non-folder files with folder_path set, folder_id -> path); a
+            file in several folders is listed once, under the first found
+        """
+        max_depth = max_depth or self.max_depth
+        files: List[DriveFile] = []
+        seen_files = set()
+        folder_paths: Dict[str, str] = {"root": ""}
+        level = ["root"]
+        depth = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.max_in_flight)) as pool:
+            while level and depth < max_depth:
+                listings = pool.map(
+                    propagate_context(lambda folder_id: list(drive_service.iter_files(folder_id=folder_id, page_size=1000))),
+                    level
+                )
+                next_level = []
+                for parent_id, children in zip(level, listings):
+                    parent_path = folder_paths[parent_id]
+                    for child in children:
+                        if child.mime_type == FOLDER_MIME_TYPE:
+                            if child.id not in folder_paths:
+                                folder_paths[child.id] = f"{parent_path}/{child.name}" if parent_path else child.name
+                                next_level.append(child.id)
+                        elif child.id not in seen_files:
+                            seen_files.add(child.id)
+                            files.append(child.model_copy(update={"folder_path": parent_path or None}))
+                level = next_level
+                depth += 1
+        del folder_paths["root"]
+        return files, folder_paths
+
+    def get_files(self, drive_service) -> List[DriveFile]:
+        """
+        Files in the tree, from the cache when it is fresh
+
+        Concurrent callers during a crawl wait for it instead of starting
+        their own.
+        """
+        with self._lock:
+            if self._files is None or time.monotonic() - self._crawled_at > self.ttl:
+                self._files, _ = self.crawl(drive_service)
+                self._crawled_at = time.monotonic()
+            return self._files
+
+    def invalidate(self):
+        """Drop the cached tree so the next request re-crawls"""
+        with self._lock:
+            self._files = None
+
+
+# Global crawler instance; its cached tree is shared by all requests
+drive_tree = DriveTreeCrawler(
+    max_depth=settings.drive_crawl_max_depth,
+    max_in_flight=settings.drive_max_in_flight,
+    ttl=settings.drive_tree_ttl
+)
@@ -0,0 +1,212 @@
+"""Duplicate file detection by Drive md5Checksum and size"""
+from app.config import settings
+from app.models.file_metadata import DriveFile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+import json
+import os
+import threading
+
+
+# What the sorter does with non-canonical copies
+DUPLICATE_MODES = ("report", "skip", "quarantine")
+DUPLICATES_FOLDER = "Duplicates"
+
+
+class DuplicateIndex:
+    """
+    Files grouped by content (md5Checksum + size), persisted as JSON.
+
+    Drive reports md5Checksum for uploaded files (not Google Docs or
+    folders), so two files with the same checksum and size are copies. The
+    canonical copy of a cluster is the earliest created (the original
+    upload; ties by ID). Drive sync (full crawls and replayed changes) and
+    the sorter feed every file they list in here, so a copy uploaded later
+    is recognized even by an incremental sort that only sees the new file,
+    and retrieval uses the map to download one copy per cluster whether or
+    not the user ever sorts.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the index
+
+        Args:
+            path: JSON file the index is persisted to
+        """
+        self.path = path
+        self._clusters: Dict[str, Dict[str, Dict]] = {}  # key -> file_id -> file dict
+        self._by_id: Dict[str, str] = {}  # file_id -> key
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def key_for(file: DriveFile) -> Optional[str]:
+        """Content key of a file, or None if Drive gives it no checksum"""
+        if not file.md5_checksum or file.size is None:
+            return None
+        return f"{file.md5_checksum}:{file.size}"
+
+    def _ensure_loaded(self):
+        """Load the persisted index on first use (call with the lock held)"""
+        if self._loaded:
+            return
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as file:
+                    self._clusters = json.load(file).get("clusters", {})
+                self._by_id = {file_id: key for key, files in self._clusters.items() for file_id in files}
+            except Exception as e:
+                print(f"Error loading duplicate index: {str(e)}")
+        self._loaded = True
+
+    def _save(self):
+        """Persist the index atomically (call with the lock held)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"clusters": self._clusters}, file)
+        os.replace(tmp_path, self.path)
+
+    def _drop(self, file_id: str):
+        """Remove a file from its cluster (call with the lock held)"""
+        key = self._by_id.pop(file_id, None)
+        if key is not None:
+            files = self._clusters.get(key, {})
+            files.pop(file_id, None)
+            if not files:
+                self._clusters.pop(key, None)
+
+    def observe(self, files: Iterable[DriveFile], removed: Iterable[str] = (), complete: bool = False):
+        """
+        Record files seen in a listing (and forget removed ones)
+
+        Args:
+            files: Listed files; those without a checksum are ignored
+            removed: IDs of files deleted or trashed
+            complete: `files` is every file in Drive (a full crawl); files
+                not in it are forgotten
+        """
+        files = list(files)
+        with self._lock:
+            self._ensure_loaded()
+            changed = False
+            if complete:
+                listed = {file.id for file in files}
+                removed = [*removed, *(file_id for file_id in self._by_id if file_id not in listed)]
+            for file_id in removed:
+                changed |= file_id in self._by_id
+                self._drop(file_id)
+            for file in files:
+                key = self.key_for(file)
+                if self._by_id.get(file.id) != key:
+                    changed |= file.id in self._by_id
+                    self._drop(file.id)
+                if key is None:
+                    continue
+                entry = {
+                    "id": file.id,
+                    "name": file.name,
+                    "mime_type": file.mime_type,
+                    "size": file.size,
+                    "md5_checksum": file.md5_checksum,
+                    "created_time": file.created_time.isoformat() if file.created_time else None,
+                    "modified_time": file.modified_time.isoformat() if file.modified_time else None,
+                    "parents": file.parents,
+                }
+                cluster = self._clusters.setdefault(key, {})
+                if cluster.get(file.id) != entry:
+                    cluster[file.id] = entry
+                    self._by_id[file.id] = key
+                    changed = True
+            if changed:
+                self._save()
+
+    @staticmethod
+    def _canonical(files: Dict[str, Dict]) -> Dict:
+        """Earliest created file of a cluster (ties by ID)"""
+        return min(files.values(), key=lambda f: (f.get("created_time") or datetime.max.isoformat(), f["id"]))
+
+    def cluster_key(self, file: DriveFile) -> Optional[str]:
+        """Key of the cluster a file belongs to (by its checksum, or its recorded ID)"""
+        key = self.key_for(file)
+        if key is not None:
+            return key
+        with self._lock:
+            self._ensure_loaded()
+            return self._by_id.get(file.id)
+
+    def canonical_file(self, file: DriveFile) -> Optional[DriveFile]:
+        """
+        The copy to read instead of a file, if it is a duplicate
+
+        Args:
+            file: Any file
+
+        Returns:
+            The cluster's canonical DriveFile, or None if the file has no
+            other copies or is itself canonical
+        """
+        key = self.cluster_key(file)
+        if key is None:
+            return None
+        with self._lock:
+            self._ensure_loaded()
+            files = self._clusters.get(key)
+            if not files or len(files) < 2:
+                return None
+            canonical = self._canonical(files)
+        return DriveFile(**canonical) if canonical["id"] != file.id else None
+
+    def clusters(self, file_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Duplicate clusters, optionally only those containing given files
+
+        Returns:
+            Dicts with key, canonical ({id, name}) and copies ([{id, name}]),
+            largest clusters first
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if file_ids is None:
+                keys = self._clusters.keys()
+            else:
+                keys = {self._by_id[file_id] for file_id in file_ids if file_id in self._by_id}
+            result = []
+            for key in keys:
+                files = self._clusters[key]
+                if len(files) < 2:
+                    continue
+                canonical = self._canonical(files)
+                result.append({
+                    "key": key,
+                    "canonical": {"id": canonical["id"], "name": canonical["name"]},
+                    "copies": sorted(
+                        ({"id": f["id"], "name": f["name"]} for f in files.values() if f["id"] != canonical["id"]),
+                        key=lambda f: f["id"]
+                    ),
+                })
+        result.sort(key=lambda c: (-len(c["copies"]), c["key"]))
+        return result
+
+    def clear(self):
+        """Forget every file"""
+        with self._lock:
+            self._ensure_loaded()
+            self._clusters = {}
+            self._by_id = {}
+            self._save()
+
+    def stats(self) -> Dict:
+        """File, cluster and redundant copy counts"""
+        with self._lock:
+            self._ensure_loaded()
+            duplicated = [files for files in self._clusters.values() if len(files) > 1]
+            return {
+                "files": len(self._by_id),
+                "clusters": len(duplicated),
+                "redundant_copies": sum(len(files) - 1 for files in duplicated),
+            }
+
+
+# Global duplicate index
+duplicate_index = DuplicateIndex(settings.duplicate_index_path)
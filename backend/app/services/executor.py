@@ -0,0 +1,128 @@
+"""Bounded thread pools for blocking Drive and Gemini calls"""
+from app.config import settings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+
+
+def propagate_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap fn for an inner thread pool so every call runs in a copy of the
+    caller's context (e.g. to keep counting Drive calls for the request)
+
+    The context is captured when wrapping; each call gets its own copy, as
+    one Context can't be entered by several threads at once.
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+class BlockingExecutor:
+    """
+    Run blocking calls (googleapiclient, genai, time.sleep) off the event loop.
+
+    Calls are queued onto a fixed-size thread pool so one slow generation
+    can't freeze other requests, and the pool size bounds how many run at
+    once. Queue depth and time spent waiting for a worker are tracked for
+    the /metrics endpoint.
+    """
+
+    def __init__(self, name: str, max_workers: int, wait_window: int = 1000):
+        """
+        Initialize the pool
+
+        Args:
+            name: Pool name used for thread names and metrics
+            max_workers: Maximum concurrent blocking calls
+            wait_window: Number of recent wait times kept for percentiles
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._waits = deque(maxlen=wait_window)  # seconds waited for a worker
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the pool and await its result
+
+        Args:
+            fn: Blocking callable
+            *args, **kwargs: Arguments for fn
+
+        Returns:
+            Whatever fn returns (exceptions propagate)
+        """
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._waits.append(started - submitted)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+            return result
+
+        # Carry context variables (e.g. per-request counters) into the worker
+        ctx = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(ctx.run, task))
+
+    def stats(self) -> Dict:
+        """Pool metrics: queue depth, active workers and wait times in ms"""
+        with self._lock:
+            waits = sorted(self._waits)
+            queued, active = self._queued, self._active
+            completed, failed = self._completed, self._failed
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2)
+
+        return {
+            "max_workers": self.max_workers,
+            "queue_depth": queued,
+            "active": active,
+            "completed": completed,
+            "failed": failed,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": round(waits[-1] * 1000, 2) if waits else 0.0,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work and optionally wait for running calls"""
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+# Global executors: separate pools so long generations can't starve Drive calls
+drive_executor = BlockingExecutor("drive", settings.drive_pool_size)
+gemini_executor = BlockingExecutor("gemini", settings.gemini_pool_size)
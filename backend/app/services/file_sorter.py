@@ -1,73 +1,60 @@
 """File sorting service for organizing Google Drive files"""
 from app.services.google_drive import GoogleDriveService
+from app.services.drive_sync import DriveSyncEngine, drive_sync
+from app.services.drive_tree import drive_tree
 from app.models.file_metadata import DriveFile
-from typing import Dict, List, Optional
+from app.services.file_classifier import FileClassifier
+from app.services.content_classifier import content_classifier
+from app.services.sorting_rules import SORTING_RULES
+from app.services.executor import propagate_context
+from app.config import settings
+from app.services.drive_quota import error_status
+from app.services.sort_checkpoint import SortCheckpointStore, sort_checkpoints
+from app.services.folder_map import FolderMapStore, folder_map_store
+from app.services.duplicates import DUPLICATE_MODES, DUPLICATES_FOLDER, DuplicateIndex, duplicate_index
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
 from datetime import datetime
 import re
+import time
 
 
-# Folder set: Blog Posts, Annual Reports, Documents, Summaries, Photos, Videos, Newsletters, Social Media, Spreadsheets, Unsorted
-SORTING_RULES = {
-    'blog_posts': {
-        'patterns': ['blog_', 'article_', 'post_', 'blog-', 'article-', 'post-'],
-        'folder': 'Blog Posts',
-        'keywords': ['blog', 'article', 'post']
-    },
-    'annual_reports': {
-        'patterns': ['annual_report', 'annual-report', 'annualreport', 'yearly_report'],
-        'folder': 'Annual Reports',
-        'keywords': ['annual report', 'year in review', 'yearly report']
-    },
-    'summaries': {
-        'patterns': ['summary_', 'summary-', 'summaries_', 'summaries-'],
-        'folder': 'Summaries',
-        'keywords': ['summary', 'summaries', 'executive summary', 'meeting summary']
-    },
-    'newsletters': {
-        'patterns': ['newsletter_', 'monthly_update', 'newsletter-', 'monthly-update'],
-        'folder': 'Newsletters',
-        'keywords': ['newsletter', 'monthly update', 'community update']
-    },
-    'social_media': {
-        'patterns': ['sm_', 'instagram_', 'twitter_', 'facebook_', 'linkedin_', 'social_', 'social-'],
-        'folder': 'Social Media',
-        'keywords': ['instagram', 'twitter', 'facebook', 'social media', 'tweet']
-    },
-    'photos': {
-        'mime_types': ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/svg+xml'],
-        'folder': 'Photos'
-    },
-    'videos': {
-        'mime_types': ['video/mp4', 'video/quicktime', 'video/x-msvideo', 'video/webm'],
-        'folder': 'Videos'
-    },
-    'documents': {
-        'mime_types': [
-            'application/vnd.google-apps.document',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'application/msword',
-            'application/pdf'
-        ],
-        'folder': 'Documents'
-    },
-    'spreadsheets': {
-        'mime_types': [
-            'application/vnd.google-apps.spreadsheet',
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            'application/vnd.ms-excel'
-        ],
-        'folder': 'Spreadsheets'
-    }
-}
+# Drive accepts at most 100 calls per batch request
+MOVE_BATCH_SIZE = 100
+
+# Rules compiled once for all sorters
+file_classifier = FileClassifier(SORTING_RULES)
 
 
 class FileSorter:
     """Service for sorting and organizing Google Drive files"""
     
-    def __init__(self, drive_service: GoogleDriveService):
-        """Initialize with Google Drive service"""
+    def __init__(
+        self,
+        drive_service: GoogleDriveService,
+        snapshot: Optional[DriveSyncEngine] = None,
+        checkpoints: Optional[SortCheckpointStore] = None,
+        folder_maps: Optional[FolderMapStore] = None,
+        duplicates: Optional[DuplicateIndex] = None
+    ):
+        """
+        Initialize with Google Drive service
+        
+        Args:
+            drive_service: Google Drive service
+            snapshot: Drive metadata snapshot; once synced, files to sort are
+                read from it instead of listed from Drive
+            checkpoints: Store for incremental sort checkpoints
+            folder_maps: Store for sorted-folder IDs
+            duplicates: Index of files by content, for duplicate clusters
+        """
         self.drive_service = drive_service
-        self.folder_cache: Dict[str, str] = {}  # Cache folder IDs
+        self.snapshot = snapshot if snapshot is not None else drive_sync
+        self.checkpoints = checkpoints if checkpoints is not None else sort_checkpoints
+        self.folder_maps = folder_maps if folder_maps is not None else folder_map_store
+        self.duplicates = duplicates if duplicates is not None else duplicate_index
+        self.classifier = file_classifier
+        self.content_classifier = content_classifier
     
     def analyze_file(self, file: DriveFile) -> Optional[str]:
         """
@@ -79,72 +66,81 @@ class FileSorter:
         Returns:
             Target folder name, or None if no match
         """
-        file_name_lower = file.name.lower()
+        return self.classifier.classify(file.name, file.mime_type)
+    
+    def classify_many(self, files: Iterable[DriveFile]) -> List[str]:
+        """
+        Target folder for each file (see analyze_file), in order
         
-        # Check each rule
-        for rule_name, rule_config in SORTING_RULES.items():
-            # Check MIME type rules first (for media files)
-            if 'mime_types' in rule_config:
-                if file.mime_type in rule_config['mime_types']:
-                    return rule_config['folder']
-            
-            # Check filename patterns
-            if 'patterns' in rule_config:
-                for pattern in rule_config['patterns']:
-                    if pattern.lower() in file_name_lower:
-                        return rule_config['folder']
+        Args:
+            files: DriveFile objects
             
-            # Check keywords (more flexible matching)
-            if 'keywords' in rule_config:
-                for keyword in rule_config['keywords']:
-                    if keyword.lower() in file_name_lower:
-                        return rule_config['folder']
-        
-        # No match found - return general folder
-        return 'Unsorted'
+        Returns:
+            Target folder names
+        """
+        return self.classifier.classify_many(files)
     
-    def create_folder_structure(self, parent_id: Optional[str] = None) -> Dict[str, str]:
+    def create_folder_structure(
+        self,
+        parent_id: Optional[str] = None,
+        create: bool = True,
+        extra_folders: Iterable[str] = ()
+    ) -> Dict[str, str]:
         """
         Create organized folder structure in Google Drive
         
+        Known folder IDs come from the shared folder map, so a warm sort
+        makes no calls here. Otherwise each level of the layout costs one
+        folder listing per parent plus one batch creating whatever is
+        missing, instead of a lookup (and create) per folder.
+        
         Args:
             parent_id: Optional parent folder ID to create structure under
+            create: Create missing folders; if False (dry runs) only existing
+                folders are looked up and missing ones are left out of the map
+            extra_folders: Folders needed besides the rule folders (e.g. Duplicates)
             
         Returns:
             Dictionary mapping folder names to their IDs
         """
-        folder_map = {}
-        
         # Collect all unique folder paths
-        folder_paths = set()
-        for rule_config in SORTING_RULES.values():
-            folder_paths.add(rule_config['folder'])
-        folder_paths.add('Unsorted')  # Add default folder
-        
-        # Create folders
-        for folder_path in sorted(folder_paths):
-            # Handle nested folders (e.g., "Media/Images")
-            parts = folder_path.split('/')
-            current_parent = parent_id
-            
-            for part in parts:
-                # Build full path for caching
-                if current_parent:
-                    cache_key = f"{current_parent}/{part}"
-                else:
-                    cache_key = part
-                
-                # Check if already created
-                if cache_key in self.folder_cache:
-                    current_parent = self.folder_cache[cache_key]
-                else:
-                    # Create or get folder
-                    folder_id = self.drive_service.get_or_create_folder(part, current_parent)
-                    if folder_id:
-                        self.folder_cache[cache_key] = folder_id
-                        folder_map[folder_path] = folder_id
-                        current_parent = folder_id
+        folder_paths = {rule_config['folder'] for rule_config in SORTING_RULES.values()}
+        folder_paths.add(self.classifier.default_folder)
+        folder_paths.update(extra_folders)
+        
+        parent_key = parent_id or "root"
+        known = self.folder_maps.get(parent_key)
+        if folder_paths.issubset(known):
+            return {path: known[path] for path in sorted(folder_paths)}
+        
+        # Handle nested folders (e.g., "Media/Images") one level at a time
+        resolved: Dict[str, Optional[str]] = {"": parent_id}
+        depth = max(len(path.split('/')) for path in folder_paths)
+        for level in range(1, depth + 1):
+            children: Dict[str, Set[str]] = {}  # parent path -> child paths
+            for path in folder_paths:
+                parts = path.split('/')
+                if len(parts) >= level:
+                    children.setdefault('/'.join(parts[:level - 1]), set()).add('/'.join(parts[:level]))
+            for parent_path, child_paths in sorted(children.items()):
+                if parent_path and resolved.get(parent_path) is None:
+                    continue  # parent missing (dry run) or failed to create
+                folder_parent = resolved[parent_path]
+                existing = self.drive_service.list_child_folders(folder_parent)
+                missing = []
+                for child in sorted(child_paths):
+                    name = child.rsplit('/', 1)[-1]
+                    if name in existing:
+                        resolved[child] = existing[name]
+                    else:
+                        missing.append(child)
+                if create and missing:
+                    names = [child.rsplit('/', 1)[-1] for child in missing]
+                    for child, folder_id in zip(missing, self.drive_service.create_folders(names, folder_parent)):
+                        resolved[child] = folder_id
         
+        folder_map = {path: resolved[path] for path in sorted(folder_paths) if resolved.get(path)}
+        self.folder_maps.update(parent_key, folder_map)
         return folder_map
     
     def sort_file(self, file: DriveFile, folder_map: Dict[str, str]) -> bool:
@@ -162,7 +158,7 @@ class FileSorter:
         
         if target_folder and target_folder in folder_map:
             dest_folder_id = folder_map[target_folder]
-            success = self.drive_service.move_file(file.id, dest_folder_id)
+            success = self.drive_service.move_file(file.id, dest_folder_id, previous_parents=file.parents)
             
             if success:
                 print(f"Sorted '{file.name}' -> {target_folder}")
@@ -173,50 +169,386 @@ class FileSorter:
         
         return False
     
-    def sort_all_files(
-        self, 
+    def _files_changed_since(
+        self, page_token: str, source_folder_id: Optional[str]
+    ) -> Tuple[Dict[str, Optional[DriveFile]], str]:
+        """
+        Files changed since a Changes API token, limited to the source folder
+        
+        Args:
+            page_token: Token from a previous run's checkpoint
+            source_folder_id: Folder being sorted (None for all files)
+            
+        Returns:
+            (file_id -> DriveFile, or None if removed; the new start token).
+            Errors propagate (HTTP 410 means the token expired).
+        """
+        if source_folder_id == "root":
+            source_folder_id = self.drive_service.get_root_folder_id()
+        updates: Dict[str, Optional[DriveFile]] = {}
+        token = page_token
+        while True:
+            changes, next_token, new_start_token = self.drive_service.list_changes(token)
+            for file_id, file in changes:
+                updates[file_id] = file  # later changes win
+            if new_start_token:
+                break
+            token = next_token
+        if source_folder_id is not None:
+            updates = {
+                file_id: file for file_id, file in updates.items()
+                if file is None or source_folder_id in (file.parents or [])
+            }
+        return updates, new_start_token
+    
+    def plan_sort(
+        self,
         source_folder_id: Optional[str] = None,
-        parent_for_organization: Optional[str] = None
+        parent_for_organization: Optional[str] = None,
+        dry_run: bool = False,
+        full: bool = False,
+        sniff_content: bool = False,
+        duplicates: str = "report"
     ) -> Dict:
-        """Sort all files; returns stats plus files_found, folders_created, sorted, skipped, failed."""
-        folder_map = self.create_folder_structure(parent_for_organization)
-        files = self.drive_service.list_files(folder_id=source_folder_id)
-
-        files_found = [{"name": f.name, "mime_type": f.mime_type} for f in files]
-        folders_created = list(folder_map.keys())
-        sorted_list: List[Dict] = []
+        """
+        Decide where every file goes without moving anything
+        
+        Unless `full` is set, a scope that was sorted before only looks at
+        files changed since its checkpoint (plus files the last run couldn't
+        place), and leaves files it already placed alone unless renamed.
+        With `sniff_content`, files no name or MIME rule places are
+        classified by their text (see classify_by_content) before falling
+        back to Unsorted. Every listed file is fed to the duplicate index;
+        copies of a file (same md5Checksum and size, not the earliest
+        created) are sorted like any file ("report"), left where they are
+        ("skip") or moved to the Duplicates folder ("quarantine").
+        
+        Args:
+            source_folder_id: Folder to sort (None for all files)
+            parent_for_organization: Parent of the sorted folders
+            dry_run: Don't create missing folders; moves into them are
+                planned with dest_folder_id None
+            full: Ignore the checkpoint and classify every file
+            sniff_content: Run the content pass over would-be Unsorted files
+            duplicates: "report", "skip" or "quarantine"
+            
+        Returns:
+            Dict with files_found, folders_created, moves (dicts with id,
+            name, mime_type, target_folder, dest_folder_id, parents, and
+            content_score if placed by content), skipped, failed,
+            duplicates (clusters among the listed files, see
+            DuplicateIndex.clusters) and checkpoint (scope, mode,
+            page_token, removed, unplaced; see commit_checkpoint)
+        """
+        if duplicates not in DUPLICATE_MODES:
+            raise ValueError(f"Unknown duplicates mode: {duplicates}")
+        scope = self.checkpoints.scope_key(source_folder_id, parent_for_organization)
+        checkpoint = None if full else self.checkpoints.get(scope)
+        record = checkpoint["sorted"] if checkpoint is not None else {}
+        mode = "full"
+        removed: List[str] = []
+        page_token = None
+        if checkpoint is not None and checkpoint.get("page_token"):
+            try:
+                updates, page_token = self._files_changed_since(checkpoint["page_token"], source_folder_id)
+                mode = "incremental"
+            except Exception as e:
+                if error_status(e) != 410:
+                    raise
+                print("Sort checkpoint token expired; classifying every file")
+        
+        extra_folders = [DUPLICATES_FOLDER] if duplicates == "quarantine" else []
+        folder_map = self.create_folder_structure(
+            parent_for_organization, create=not dry_run, extra_folders=extra_folders
+        )
+        rule_folders = {rule['folder'] for rule in SORTING_RULES.values()} | {self.classifier.default_folder}
+        rule_folders.update(extra_folders)
+        if mode == "incremental":
+            for file_id, item in checkpoint["pending"].items():
+                updates.setdefault(file_id, DriveFile(**item))
+            removed = [file_id for file_id, file in updates.items() if file is None]
+            files = [file for file in updates.values() if file is not None]
+        else:
+            # Token first, so changes made while listing are seen by the next run
+            page_token = self.drive_service.get_start_page_token()
+            # Files are streamed (page by page from Drive) and classified as they arrive
+            if self.snapshot.ready:
+                files = self.snapshot.iter_files(folder_id=source_folder_id)
+            else:
+                files = self.drive_service.iter_files(folder_id=source_folder_id, page_size=1000)
+        
+        files_found: List[Dict] = []
+        moves: List[Dict] = []
         skipped_list: List[Dict] = []
         failed_list: List[Dict] = []
-
+        unplaced: List[Dict] = []
+        
+        def pending_entry(file: DriveFile) -> Dict:
+            return {"id": file.id, "name": file.name, "mime_type": file.mime_type, "parents": file.parents}
+        
+        def place(file: DriveFile, target_folder: Optional[str], content_score: Optional[float] = None):
+            if target_folder in folder_map or (dry_run and target_folder in rule_folders):
+                dest_folder_id = folder_map.get(target_folder)
+                if dest_folder_id is not None and dest_folder_id in (file.parents or []):
+                    skipped_list.append({"id": file.id, "name": file.name, "reason": "already sorted"})
+                    return
+                move = {
+                    "id": file.id,
+                    "name": file.name,
+                    "mime_type": file.mime_type,
+                    "target_folder": target_folder,
+                    "dest_folder_id": dest_folder_id,
+                    "parents": file.parents,
+                }
+                if content_score is not None:
+                    move["content_score"] = content_score
+                moves.append(move)
+            else:
+                failed_list.append({"id": file.id, "name": file.name, "reason": target_folder or "no rule"})
+                unplaced.append(pending_entry(file))
+        
+        listed: List[DriveFile] = []
+        to_place: List[DriveFile] = []
         for file in files:
+            files_found.append({"name": file.name, "mime_type": file.mime_type})
             if file.mime_type == 'application/vnd.google-apps.folder':
-                skipped_list.append({"name": file.name, "reason": "folder"})
+                skipped_list.append({"id": file.id, "name": file.name, "reason": "folder"})
+                continue
+            listed.append(file)
+            if record.get(file.id) == file.name:
+                skipped_list.append({"id": file.id, "name": file.name, "reason": "previously sorted"})
                 continue
+            to_place.append(file)
+        
+        # Group by content first, so a copy is recognized whichever copy is listed first
+        self.duplicates.observe(listed, removed)
+        unsorted: List[DriveFile] = []  # for the content pass
+        for file in to_place:
+            if duplicates != "report":
+                canonical = self.duplicates.canonical_file(file)
+                if canonical is not None:
+                    if duplicates == "skip":
+                        skipped_list.append({"id": file.id, "name": file.name, "reason": f"duplicate of {canonical.id}"})
+                    else:
+                        place(file, DUPLICATES_FOLDER)
+                    continue
             target_folder = self.analyze_file(file)
-            if target_folder and target_folder in folder_map:
-                success = self.drive_service.move_file(file.id, folder_map[target_folder])
-                if success:
-                    sorted_list.append({"name": file.name, "target_folder": target_folder})
+            if (
+                sniff_content
+                and target_folder == self.classifier.default_folder
+                and self.drive_service.can_read_text(file.mime_type, file.size)
+            ):
+                unsorted.append(file)
+            else:
+                place(file, target_folder)
+        
+        if unsorted:
+            by_content = self.classify_by_content(unsorted, settings.sort_sniff_budget)
+            for file in unsorted:
+                if file.id not in by_content:
+                    # Out of time: leave it where it is and look again next run
+                    skipped_list.append({"id": file.id, "name": file.name, "reason": "content pass over budget"})
+                    unplaced.append(pending_entry(file))
+                elif by_content[file.id] is None:
+                    place(file, self.classifier.default_folder)
                 else:
-                    failed_list.append({"name": file.name})
+                    place(file, *by_content[file.id])
+        return {
+            "files_found": files_found,
+            "folders_created": list(folder_map.keys()),
+            "moves": moves,
+            "skipped": skipped_list,
+            "failed": failed_list,
+            "duplicates": self.duplicates.clusters(file.id for file in listed),
+            "checkpoint": {
+                "scope": scope,
+                "mode": mode,
+                "page_token": page_token,
+                "removed": removed,
+                "unplaced": unplaced,
+            },
+        }
+    
+    def classify_by_content(self, files: List[DriveFile], budget: float) -> Dict[str, Optional[Tuple[str, float]]]:
+        """
+        Classify files by a prefix of their text, within a time budget
+        
+        Prefixes (settings.sort_sniff_max_bytes) are downloaded on up to
+        settings.drive_max_in_flight threads and scored by the content
+        classifier's process pool. Files not finished when the budget runs
+        out are left out of the result.
+        
+        Args:
+            files: Files that can produce text
+            budget: Seconds for the whole pass
+            
+        Returns:
+            file_id -> (folder, score), or None if the text placed it
+            nowhere (or couldn't be read)
+        """
+        deadline = time.monotonic() + budget
+        
+        def classify(file: DriveFile) -> Optional[Tuple[str, float]]:
+            if time.monotonic() >= deadline:
+                raise TimeoutError("content pass over budget")
+            text = self.drive_service.get_file_text(file, max_bytes=settings.sort_sniff_max_bytes)
+            if not text:
+                return None
+            return self.content_classifier.classify(text, wait=max(0.0, deadline - time.monotonic()))
+        
+        results: Dict[str, Optional[Tuple[str, float]]] = {}
+        pool = ThreadPoolExecutor(max_workers=settings.drive_max_in_flight)
+        futures = {pool.submit(propagate_context(classify), file): file for file in files}
+        try:
+            for future in as_completed(futures, timeout=budget):
+                try:
+                    results[futures[future].id] = future.result()
+                except TimeoutError:
+                    pass
+                except Exception as e:
+                    print(f"Error classifying '{futures[future].name}' by content: {str(e)}")
+                    results[futures[future].id] = None
+        except FutureTimeout:
+            print(f"Content pass stopped after {budget}s; {len(files) - len(results)} file(s) left for the next sort")
+        finally:
+            # Downloads already running finish in the background; their results are dropped
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
+    
+    def commit_checkpoint(self, plan: Dict, outcomes: Dict[str, Optional[str]]):
+        """
+        Advance the scope's checkpoint once a plan's moves have been attempted
+        
+        Moved and already-sorted files are recorded as placed; failed,
+        unattempted and unplaceable files are kept for the next run.
+        
+        Args:
+            plan: Result of plan_sort (not a dry run)
+            outcomes: file_id -> None (moved) or error message
+        """
+        checkpoint = plan.get("checkpoint")
+        if not checkpoint or not checkpoint.get("page_token"):
+            return
+        placed = {s["id"]: s["name"] for s in plan["skipped"] if s["reason"] == "already sorted"}
+        pending = {item["id"]: item for item in checkpoint["unplaced"]}
+        for move in plan["moves"]:
+            if move["id"] in outcomes and outcomes[move["id"]] is None:
+                placed[move["id"]] = move["name"]
             else:
-                failed_list.append({"name": file.name, "reason": target_folder or "no rule"})
-
+                pending[move["id"]] = {
+                    "id": move["id"], "name": move["name"], "mime_type": move["mime_type"], "parents": move["parents"]
+                }
+        self.checkpoints.update(checkpoint["scope"], checkpoint["page_token"], placed, pending, checkpoint["removed"])
+    
+    def apply_moves(self, moves: List[Dict]) -> List[Optional[str]]:
+        """
+        Execute planned moves in batches of MOVE_BATCH_SIZE
+        
+        Parents come from the plan, so no per-file lookup is needed.
+        Successful moves are reflected in the snapshot; if moves fail
+        because a sorted folder was deleted, the folder map is invalidated.
+        
+        Args:
+            moves: Move dicts from plan_sort
+            
+        Returns:
+            One entry per move: None on success, else the error message
+        """
+        errors = self.drive_service.move_files(
+            [(m["id"], m["dest_folder_id"], m["parents"]) for m in moves],
+            batch_size=MOVE_BATCH_SIZE
+        )
+        for move, error in zip(moves, errors):
+            if error is None:
+                self.snapshot.record_move(move["id"], move["dest_folder_id"])
+        failed_dests = sorted({m["dest_folder_id"] for m, error in zip(moves, errors) if error is not None})
+        if failed_dests:
+            # A sorted folder may have been deleted; forget its ID so the next sort recreates it
+            missing = self.drive_service.find_missing(failed_dests)
+            if missing and self.folder_maps.invalidate(missing):
+                print(f"Sorted folder(s) {', '.join(missing)} no longer exist; folder map reset")
+        return errors
+    
+    @staticmethod
+    def sort_result(plan: Dict, outcomes: Dict[str, Optional[str]]) -> Dict:
+        """
+        Build the sort result from a plan and move outcomes
+        
+        Args:
+            plan: Result of plan_sort
+            outcomes: file_id -> None (moved) or error message, for moves attempted
+            
+        Returns:
+            Stats plus mode ("full" or "incremental"), duplicates,
+            files_found, folders_created, sorted, skipped, failed
+        """
+        sorted_list = []
+        failed_list = list(plan["failed"])
+        for move in plan["moves"]:
+            if move["id"] not in outcomes:
+                continue
+            error = outcomes[move["id"]]
+            if error is None:
+                entry = {"id": move["id"], "name": move["name"], "target_folder": move["target_folder"]}
+                if "content_score" in move:
+                    entry["content_score"] = move["content_score"]
+                sorted_list.append(entry)
+            else:
+                failed_list.append({
+                    "id": move["id"], "name": move["name"], "target_folder": move["target_folder"], "reason": error
+                })
         stats = {
-            "total": len(files),
+            "total": len(plan["files_found"]),
             "sorted": len(sorted_list),
-            "skipped": len(skipped_list),
+            "skipped": len(plan["skipped"]),
             "failed": len(failed_list),
         }
         return {
             **stats,
-            "files_found": files_found,
-            "folders_created": folders_created,
+            "mode": plan.get("checkpoint", {}).get("mode", "full"),
+            "duplicates": plan.get("duplicates", []),
+            "files_found": plan["files_found"],
+            "folders_created": plan["folders_created"],
             "sorted": sorted_list,
-            "skipped": skipped_list,
+            "skipped": plan["skipped"],
             "failed": failed_list,
         }
     
+    def sort_all_files(
+        self, 
+        source_folder_id: Optional[str] = None,
+        parent_for_organization: Optional[str] = None,
+        full: bool = False,
+        sniff_content: bool = False,
+        duplicates: str = "report"
+    ) -> Dict:
+        """
+        Sort all files; returns stats plus files_found, folders_created, sorted, skipped, failed.
+
+        Moves are sent in batches of MOVE_BATCH_SIZE. Each entry in sorted,
+        skipped and failed carries the file's id, so callers get a per-file
+        outcome (failed entries include the API error as reason). Repeat
+        runs are incremental unless `full` is set, `sniff_content` adds
+        the content pass for Unsorted files and `duplicates` says what to do
+        with copies of other files (see plan_sort). For long
+        runs use the background jobs in sort_jobs, which journal progress.
+        """
+        plan = self.plan_sort(
+            source_folder_id, parent_for_organization, full=full, sniff_content=sniff_content, duplicates=duplicates
+        )
+        moves = plan["moves"]
+        outcomes: Dict[str, Optional[str]] = {}
+        for start in range(0, len(moves), MOVE_BATCH_SIZE):
+            chunk = moves[start:start + MOVE_BATCH_SIZE]
+            for move, error in zip(chunk, self.apply_moves(chunk)):
+                outcomes[move["id"]] = error
+        self.commit_checkpoint(plan, outcomes)
+        result = self.sort_result(plan, outcomes)
+        if result["sorted"]:
+            # Cached folder paths are stale now
+            drive_tree.invalidate()
+        return result
+    
     def get_sorting_rules(self) -> Dict:
         """Get current sorting rules for display"""
         return SORTING_RULES
@@ -0,0 +1,106 @@
+"""Persisted IDs of the folders files are sorted into"""
+from app.config import settings
+from typing import Dict, Iterable
+import json
+import os
+import threading
+
+
+class FolderMapStore:
+    """
+    Sorted-folder IDs per organization parent, shared by every FileSorter
+    and persisted as JSON.
+
+    Maps are keyed by the parent folder ID ("root" for My Drive) and hold
+    folder path -> folder ID, so a sort whose folders are all known makes
+    no folder lookups at all. A map is dropped as soon as one of its IDs
+    turns out to be deleted (a 404 on a move into it) and is rebuilt on
+    the next sort.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the store
+
+        Args:
+            path: JSON file the folder maps are persisted to
+        """
+        self.path = path
+        self._maps: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        """Load persisted maps on first use (call with the lock held)"""
+        if self._loaded:
+            return
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as file:
+                    self._maps = json.load(file).get("parents", {})
+            except Exception as e:
+                print(f"Error loading sort folder map: {str(e)}")
+        self._loaded = True
+
+    def _save(self):
+        """Persist maps atomically (call with the lock held)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"parents": self._maps}, file)
+        os.replace(tmp_path, self.path)
+
+    def get(self, parent_key: str) -> Dict[str, str]:
+        """Copy of the folder path -> ID map under a parent (empty if unknown)"""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._maps.get(parent_key, {}))
+
+    def update(self, parent_key: str, folder_map: Dict[str, str]):
+        """Record resolved folder IDs under a parent"""
+        with self._lock:
+            self._ensure_loaded()
+            current = self._maps.setdefault(parent_key, {})
+            if all(current.get(path) == folder_id for path, folder_id in folder_map.items()):
+                return
+            current.update(folder_map)
+            self._save()
+
+    def invalidate(self, folder_ids: Iterable[str]) -> int:
+        """
+        Drop every map that contains, or is keyed by, one of the folder IDs
+
+        Args:
+            folder_ids: Folders found to be deleted
+
+        Returns:
+            Number of maps dropped
+        """
+        gone = set(folder_ids)
+        with self._lock:
+            self._ensure_loaded()
+            stale = [
+                parent_key for parent_key, folder_map in self._maps.items()
+                if parent_key in gone or gone.intersection(folder_map.values())
+            ]
+            for parent_key in stale:
+                del self._maps[parent_key]
+            if stale:
+                self._save()
+            return len(stale)
+
+    def clear(self):
+        """Forget all folder maps"""
+        with self._lock:
+            self._ensure_loaded()
+            self._maps = {}
+            self._save()
+
+    def stats(self) -> Dict:
+        """Known folders per parent"""
+        with self._lock:
+            self._ensure_loaded()
+            return {parent_key: len(folder_map) for parent_key, folder_map in self._maps.items()}
+
+
+# Global folder map store
+folder_map_store = FolderMapStore(settings.sort_folder_map_path)
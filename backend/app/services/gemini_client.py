@@ -2,7 +2,9 @@
 from google import genai
 from google.genai import types
 from app.config import settings
+from app.services.executor import gemini_executor
 from typing import Optional, Generator, Dict
+import asyncio
 import time
 
 
@@ -79,9 +81,12 @@ class GeminiClient:
             print(f"Error generating content: {str(e)}")
             raise
     
-    def _generate_streaming(self, prompt: str) -> Generator[str, None, None]:
+    def generate_stream(self, prompt: str) -> Generator[str, None, None]:
         """
-        Generate content with streaming
+        Generate content with streaming, raising API errors
+        
+        Closing the generator closes the upstream Gemini stream and its
+        HTTP response, so an abandoned stream stops generating.
         
         Args:
             prompt: Input prompt
@@ -89,17 +94,30 @@ class GeminiClient:
         Yields:
             Chunks of generated text
         """
+        response = self.client.models.generate_content_stream(
+            model=self.model_id,
+            contents=prompt,
+            config=self.generation_config
+        )
         try:
-            response = self.client.models.generate_content_stream(
-                model=self.model_id,
-                contents=prompt,
-                config=self.generation_config
-            )
-            
             for chunk in response:
                 if chunk.text:
                     yield chunk.text
+        finally:
+            response.close()
+    
+    def _generate_streaming(self, prompt: str) -> Generator[str, None, None]:
+        """
+        Generate content with streaming
         
+        Args:
+            prompt: Input prompt
+            
+        Yields:
+            Chunks of generated text (an error is yielded as text)
+        """
+        try:
+            yield from self.generate_stream(prompt)
         except Exception as e:
             print(f"Error in streaming generation: {str(e)}")
             yield f"Error: {str(e)}"
@@ -180,14 +198,46 @@ class GeminiClient:
     
     async def generate_async(self, prompt: str) -> str:
         """
-        Generate content asynchronously (future implementation)
+        Generate content without blocking the event loop
+        
+        Args:
+            prompt: Input prompt
+            
+        Returns:
+            Generated text content
+        """
+        return await gemini_executor.run(self.generate_content, prompt, False)
+    
+    async def generate_with_retry_async(
+        self,
+        prompt: str,
+        max_retries: int = 3,
+        retry_delay: int = 2
+    ) -> str:
+        """
+        Async variant of generate_with_retry: each attempt runs on the Gemini
+        pool and the backoff sleeps on the event loop instead of a worker
         
         Args:
             prompt: Input prompt
+            max_retries: Maximum number of retries
+            retry_delay: Delay between retries in seconds
             
         Returns:
             Generated text content
         """
-        # For now, wrap sync method
-        # Future: Use proper async implementation
-        return self.generate_content(prompt, stream=False)
+        last_error = None
+        
+        for attempt in range(max_retries):
+            try:
+                return await self.generate_async(prompt)
+            
+            except Exception as e:
+                last_error = e
+                print(f"Attempt {attempt + 1} failed: {str(e)}")
+                
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(retry_delay)
+                    retry_delay *= 2  # Exponential backoff
+        
+        raise Exception(f"Failed after {max_retries} attempts: {str(last_error)}")
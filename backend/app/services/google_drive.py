@@ -1,21 +1,156 @@
 """Google Drive API integration service"""
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.http import MediaIoBaseDownload, HttpRequest
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from app.utils.auth import GoogleAuthHandler
 from app.models.file_metadata import DriveFile
-from typing import List, Optional, Dict
+from app.services.content_cache import content_cache
+from app.config import settings
+from app.services.text_extract import text_extractor
+from app.services.drive_quota import DriveRateLimiter, drive_limiter, error_status, is_rate_limited, is_retryable
+from typing import Iterator, List, Optional, Dict, Tuple
 from datetime import datetime
+import httplib2
 import io
+import threading
+
+
+# Metadata fetched for every listed file
+FILE_FIELDS = "id, name, mimeType, createdTime, modifiedTime, size, parents, md5Checksum"
+
+# Google Workspace types and the text format each is exported as
+EXPORT_MIME_TYPES = {
+    'application/vnd.google-apps.document': 'text/plain',
+    'application/vnd.google-apps.spreadsheet': 'text/csv',
+    'application/vnd.google-apps.presentation': 'text/plain',
+}
 
 
 class GoogleDriveService:
     """Service for interacting with Google Drive API"""
     
-    def __init__(self, credentials: Credentials):
-        """Initialize with Google credentials"""
-        self.credentials = GoogleAuthHandler.refresh_token_if_needed(credentials)
-        self.service = build('drive', 'v3', credentials=self.credentials)
+    def __init__(self, credentials: Optional[Credentials], service=None, limiter: Optional[DriveRateLimiter] = None):
+        """
+        Initialize with Google credentials
+        
+        Args:
+            credentials: OAuth credentials
+            service: Optional prebuilt Drive v3 resource (e.g. an in-process fake)
+            limiter: Rate limiter for API calls (defaults to the shared drive_limiter)
+        """
+        if service is None:
+            self.credentials = GoogleAuthHandler.refresh_token_if_needed(credentials)
+            # Bundled discovery document: no network fetch, no discovery cache
+            service = build('drive', 'v3', credentials=self.credentials, static_discovery=True, cache_discovery=False)
+        else:
+            self.credentials = credentials
+        self.service = service
+        self.limiter = limiter or drive_limiter
+        self._local = threading.local()
+    
+    def _http(self) -> AuthorizedHttp:
+        """Per-thread authorized transport (httplib2.Http is not thread-safe)"""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+    
+    @staticmethod
+    def _method_name(request: HttpRequest) -> str:
+        """API method of a request for quota accounting (e.g. 'drive.files.list')"""
+        return getattr(request, 'methodId', None) or getattr(request, 'method', None) or 'unknown'
+    
+    def _execute(self, request: HttpRequest) -> Dict:
+        """Execute an API request on this thread's transport, rate limited and retried"""
+        return self.limiter.call(
+            lambda: request.execute(http=self._http()), method=self._method_name(request)
+        )
+    
+    @staticmethod
+    def _to_drive_file(item: Dict) -> DriveFile:
+        """Convert a Drive API file resource to a DriveFile"""
+        return DriveFile(
+            id=item['id'],
+            name=item['name'],
+            mime_type=item['mimeType'],
+            created_time=datetime.fromisoformat(item['createdTime'].replace('Z', '+00:00')) if 'createdTime' in item else None,
+            modified_time=datetime.fromisoformat(item['modifiedTime'].replace('Z', '+00:00')) if 'modifiedTime' in item else None,
+            size=int(item['size']) if 'size' in item else None,
+            parents=item.get('parents'),
+            md5_checksum=item.get('md5Checksum')
+        )
+    
+    def iter_files(
+        self,
+        folder_id: Optional[str] = None,
+        query: Optional[str] = None,
+        name_contains: Optional[str] = None,
+        full_text_contains: Optional[str] = None,
+        page_size: int = 100,
+        max_items: Optional[int] = None,
+        raise_errors: bool = False
+    ) -> Iterator[DriveFile]:
+        """
+        Stream files from Google Drive, following nextPageToken lazily
+        
+        Each page is requested only when the previous one has been consumed,
+        so callers that stop early (or keep only a top-k) never hold more
+        than one page in memory.
+        
+        Args:
+            folder_id: Only direct children of this folder ("root" for My Drive)
+            query: Extra Drive query clause
+            name_contains: Name substring to match
+            full_text_contains: Text to search inside file content (indexed types)
+            page_size: Files per API page (max 1000)
+            max_items: Stop after this many files (None for all)
+            raise_errors: Propagate API errors instead of logging and stopping
+            
+        Yields:
+            DriveFile objects in Drive's listing order
+        """
+        query_parts = ["trashed=false"]
+        if folder_id is not None:
+            parent = "root" if folder_id == "root" else folder_id
+            query_parts.append(f"'{parent}' in parents")
+        if name_contains:
+            safe = name_contains.replace("'", "''")
+            query_parts.append(f"name contains '{safe}'")
+        if full_text_contains:
+            safe = full_text_contains.replace("'", "''")
+            query_parts.append(f"fullText contains '{safe}'")
+        if query:
+            query_parts.append(query)
+        query_string = " and ".join(query_parts)
+        
+        yielded = 0
+        page_token = None
+        while True:
+            if max_items is not None:
+                # Don't fetch more of the last page than will be used
+                page_size = min(page_size, max_items - yielded)
+            try:
+                results = self._execute(self.service.files().list(
+                    q=query_string,
+                    pageSize=page_size,
+                    pageToken=page_token,
+                    fields=f"nextPageToken, files({FILE_FIELDS})"
+                ))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                print(f"Error listing files: {str(e)}")
+                return
+            for item in results.get('files', []):
+                yield self._to_drive_file(item)
+                yielded += 1
+                if max_items is not None and yielded >= max_items:
+                    return
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
     
     def list_files(
         self, 
@@ -23,124 +158,233 @@ class GoogleDriveService:
         query: Optional[str] = None,
         name_contains: Optional[str] = None,
         full_text_contains: Optional[str] = None,
-        page_size: int = 100
+        page_size: int = 100,
+        max_items: Optional[int] = None
     ) -> List[DriveFile]:
         """
-        List files from Google Drive.
+        List files from Google Drive, following every page (see iter_files).
         Use name_contains to find by name; full_text_contains to search inside file content (indexed types).
         """
-        try:
-            query_parts = ["trashed=false"]
-            if folder_id is not None:
-                parent = "root" if folder_id == "root" else folder_id
-                query_parts.append(f"'{parent}' in parents")
-            if name_contains:
-                safe = name_contains.replace("'", "''")
-                query_parts.append(f"name contains '{safe}'")
-            if full_text_contains:
-                safe = full_text_contains.replace("'", "''")
-                query_parts.append(f"fullText contains '{safe}'")
-            if query:
-                query_parts.append(query)
-            query_string = " and ".join(query_parts)
-            
-            # List files
-            results = self.service.files().list(
-                q=query_string,
-                pageSize=page_size,
-                fields="nextPageToken, files(id, name, mimeType, createdTime, modifiedTime, size, parents)"
-            ).execute()
-            
-            items = results.get('files', [])
-            
-            # Convert to DriveFile objects
-            drive_files = []
-            for item in items:
-                drive_file = DriveFile(
-                    id=item['id'],
-                    name=item['name'],
-                    mime_type=item['mimeType'],
-                    created_time=datetime.fromisoformat(item['createdTime'].replace('Z', '+00:00')) if 'createdTime' in item else None,
-                    modified_time=datetime.fromisoformat(item['modifiedTime'].replace('Z', '+00:00')) if 'modifiedTime' in item else None,
-                    size=int(item['size']) if 'size' in item else None
-                )
-                drive_files.append(drive_file)
-            
-            return drive_files
-        
-        except Exception as e:
-            print(f"Error listing files: {str(e)}")
-            return []
+        return list(self.iter_files(
+            folder_id=folder_id,
+            query=query,
+            name_contains=name_contains,
+            full_text_contains=full_text_contains,
+            page_size=page_size,
+            max_items=max_items
+        ))
 
     def list_files_by_name(self, name_substring: str, page_size: int = 20) -> List[DriveFile]:
-        """List files whose name contains the given substring (searches entire Drive)."""
-        return self.list_files(name_contains=name_substring, page_size=page_size)
+        """List up to page_size files whose name contains the given substring (searches entire Drive)."""
+        return self.list_files(name_contains=name_substring, page_size=page_size, max_items=page_size)
 
     def list_files_by_content(self, text: str, page_size: int = 20) -> List[DriveFile]:
-        """List files whose content contains the given text (fullText search; indexed types only)."""
+        """List up to page_size files whose content contains the given text (fullText search; indexed types only)."""
         if not text or len(text.strip()) < 2:
             return []
-        return self.list_files(full_text_contains=text.strip(), page_size=page_size)
+        return self.list_files(full_text_contains=text.strip(), page_size=page_size, max_items=page_size)
+
+    def iter_root_and_subfolder_files(self, page_size: int = 200) -> Iterator[DriveFile]:
+        """Stream files at root and in all immediate subfolders (one level), every page of each."""
+        seen = set()
+        folder_ids = []
+        for f in self.iter_files(folder_id="root", page_size=page_size):
+            seen.add(f.id)
+            if f.mime_type == "application/vnd.google-apps.folder":
+                folder_ids.append(f.id)
+            yield f
+        for folder_id in folder_ids:
+            for c in self.iter_files(folder_id=folder_id, page_size=page_size):
+                if c.id not in seen and c.mime_type != "application/vnd.google-apps.folder":
+                    seen.add(c.id)
+                    yield c
 
     def list_root_and_subfolder_files(self, page_size: int = 200) -> List[DriveFile]:
         """List files at root and in all immediate subfolders (one level)."""
-        root_files = self.list_files(folder_id="root", page_size=page_size)
-        seen = {f.id for f in root_files}
-        out = list(root_files)
-        for f in root_files:
-            if f.mime_type == "application/vnd.google-apps.folder":
-                children = self.list_files(folder_id=f.id, page_size=100)
-                for c in children:
-                    if c.id not in seen and c.mime_type != "application/vnd.google-apps.folder":
-                        seen.add(c.id)
-                        out.append(c)
-        return out
+        return list(self.iter_root_and_subfolder_files(page_size=page_size))
 
-    def get_file_content(self, file_id: str) -> Optional[str]:
+    def get_root_folder_id(self) -> str:
+        """Resolve the real ID of the 'root' alias (My Drive)"""
+        return self._execute(self.service.files().get(fileId='root', fields='id'))['id']
+    
+    def get_start_page_token(self) -> str:
+        """Get the Changes API token for 'now'"""
+        return self._execute(self.service.changes().getStartPageToken())['startPageToken']
+    
+    def list_changes(
+        self,
+        page_token: str,
+        page_size: int = 1000
+    ) -> Tuple[List[Tuple[str, Optional[DriveFile]]], Optional[str], Optional[str]]:
+        """
+        Fetch one page of the Changes API
+        
+        Args:
+            page_token: Token from get_start_page_token or a previous page
+            page_size: Changes per page (max 1000)
+            
+        Returns:
+            (changes, next_page_token, new_start_page_token). Each change is
+            (file_id, DriveFile), with None for removed or trashed files.
+            Exactly one of the tokens is set: keep paging with the first, or
+            store the second for the next sync. Errors propagate (HTTP 410
+            means the token expired and a full crawl is needed).
+        """
+        results = self._execute(self.service.changes().list(
+            pageToken=page_token,
+            pageSize=page_size,
+            includeRemoved=True,
+            spaces='drive',
+            fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}, trashed))"
+        ))
+        changes = []
+        for change in results.get('changes', []):
+            item = change.get('file')
+            if change.get('removed') or not item or item.get('trashed'):
+                changes.append((change['fileId'], None))
+            else:
+                changes.append((change['fileId'], self._to_drive_file(item)))
+        return changes, results.get('nextPageToken'), results.get('newStartPageToken')
+    
+    def can_read_text(self, mime_type: Optional[str], size: Optional[int] = None) -> bool:
+        """
+        Whether a file could yield text, judged from listing metadata alone
+        
+        Args:
+            mime_type: File MIME type
+            size: File size in bytes (None for Workspace files or if unknown)
+            
+        Returns:
+            False for types with no text (images, video, folders, ...) and
+            for files that must be parsed whole (PDF/DOCX/XLSX) but are over
+            the extraction size cap; nothing needs downloading for these
+        """
+        if mime_type in EXPORT_MIME_TYPES:
+            return True
+        if not text_extractor.supports(mime_type):
+            return False
+        return size is None or text_extractor.truncatable(mime_type) or size <= text_extractor.max_bytes
+    
+    def _download(self, request: HttpRequest, max_bytes: int) -> Tuple[bytes, bool]:
+        """
+        Download at most max_bytes of a media request
+        
+        Media downloads ask for one ranged chunk of max_bytes, so the server
+        sends no more than that and memory stays within the limit. Exports
+        ignore Range: httplib2 reads the whole exported body before it is
+        cut to max_bytes, so their peak memory is bounded only by Drive's
+        export size limit (10 MB), not by max_bytes.
+        
+        Returns:
+            (data, complete): complete is False if the file was longer
+        """
+        request.http = self._http()
+        file_buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(file_buffer, request, chunksize=max(1, max_bytes))
+        
+        # Each chunk is one round trip; a retried chunk resumes where it failed
+        method = self._method_name(request)
+        done = False
+        while not done:
+            if file_buffer.tell() >= max_bytes:
+                return file_buffer.getvalue()[:max_bytes], False
+            status, done = self.limiter.call(downloader.next_chunk, method=method)
+        data = file_buffer.getvalue()
+        return data[:max_bytes], len(data) <= max_bytes
+    
+    def get_file_content(
+        self,
+        file_id: str,
+        mime_type: Optional[str] = None,
+        modified_time: Optional[datetime] = None,
+        size: Optional[int] = None,
+        max_bytes: Optional[int] = None
+    ) -> Optional[str]:
         """
         Get text content of a file
         
+        Pass mime_type, modified_time and size from a listing to skip the
+        metadata lookup; a content cache hit then needs no API calls at all,
+        and files that can't produce text are rejected before downloading.
+        Text formats are read up to settings.drive_download_max_bytes (the
+        rest is dropped; Google Docs exports arrive whole and are cut after
+        download, see _download); PDF/DOCX/XLSX must be read whole and are skipped
+        beyond the extraction size cap. A smaller `max_bytes` reads just a
+        prefix of text formats; such prefixes aren't cached.
+        
         Args:
             file_id: Google Drive file ID
+            mime_type: Optional MIME type, if already known
+            modified_time: Optional modifiedTime, if already known
+            size: Optional size in bytes, if already known
+            max_bytes: Read at most this much of text formats (default and
+                upper bound: settings.drive_download_max_bytes)
             
         Returns:
             File content as string, or None if error
         """
         try:
-            # Get file metadata first
-            file_metadata = self.service.files().get(fileId=file_id, fields='mimeType').execute()
-            mime_type = file_metadata.get('mimeType')
-            
-            # Export Google Docs as plain text
-            if mime_type == 'application/vnd.google-apps.document':
-                request = self.service.files().export_media(
-                    fileId=file_id,
-                    mimeType='text/plain'
+            if mime_type is None or modified_time is None:
+                # Get file metadata first
+                file_metadata = self._execute(
+                    self.service.files().get(fileId=file_id, fields='mimeType, modifiedTime, size')
                 )
-            elif mime_type == 'application/vnd.google-apps.spreadsheet':
+                mime_type = file_metadata.get('mimeType')
+                if 'modifiedTime' in file_metadata:
+                    modified_time = datetime.fromisoformat(file_metadata['modifiedTime'].replace('Z', '+00:00'))
+                if 'size' in file_metadata:
+                    size = int(file_metadata['size'])
+            
+            # No text to be had (images, video, folders, oversized PDFs, ...)
+            if not self.can_read_text(mime_type, size):
+                return None
+            
+            limit = settings.drive_download_max_bytes
+            if max_bytes is not None:
+                limit = min(limit, max_bytes)
+            version = modified_time.isoformat() if modified_time else None
+            if version:
+                cached = content_cache.get(file_id, version)
+                if cached is not None:
+                    return cached
+            
+            if mime_type in EXPORT_MIME_TYPES:
+                # Export Google Docs/Sheets/Slides as text
                 request = self.service.files().export_media(
                     fileId=file_id,
-                    mimeType='text/csv'
+                    mimeType=EXPORT_MIME_TYPES[mime_type]
                 )
+                data, complete = self._download(request, limit)
+                content = data.decode('utf-8', errors='ignore')
             else:
-                # Download regular files
+                # Download regular files; PDF/DOCX/XLSX are parsed by the extractor
                 request = self.service.files().get_media(fileId=file_id)
-            
-            file_buffer = io.BytesIO()
-            downloader = MediaIoBaseDownload(file_buffer, request)
-            
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            
-            # Return content as string
-            content = file_buffer.getvalue().decode('utf-8', errors='ignore')
+                if text_extractor.truncatable(mime_type):
+                    data, complete = self._download(request, limit)
+                else:
+                    data, complete = self._download(request, text_extractor.max_bytes)
+                    if not complete:
+                        print(f"Skipping {file_id}: larger than {text_extractor.max_bytes} bytes")
+                        return None
+                content = text_extractor.extract(data, mime_type, name=file_id)
+                if content is None:
+                    return None
+            # Extracted text is cached, so each file version is parsed once
+            if version and (complete or limit == settings.drive_download_max_bytes):
+                content_cache.put(file_id, version, content)
             return content
         
         except Exception as e:
             print(f"Error getting file content for {file_id}: {str(e)}")
             return None
     
+    def get_file_text(self, file: DriveFile, max_bytes: Optional[int] = None) -> Optional[str]:
+        """Get text content for a listed file, using its listing metadata for the cache"""
+        return self.get_file_content(
+            file.id, mime_type=file.mime_type, modified_time=file.modified_time, size=file.size,
+            max_bytes=max_bytes
+        )
+    
     def create_folder(self, name: str, parent_id: Optional[str] = None) -> Optional[str]:
         """
         Create a folder in Google Drive
@@ -161,10 +405,10 @@ class GoogleDriveService:
             if parent_id:
                 file_metadata['parents'] = [parent_id]
             
-            folder = self.service.files().create(
+            folder = self._execute(self.service.files().create(
                 body=file_metadata,
                 fields='id'
-            ).execute()
+            ))
             
             return folder.get('id')
         
@@ -172,33 +416,163 @@ class GoogleDriveService:
             print(f"Error creating folder {name}: {str(e)}")
             return None
     
-    def move_file(self, file_id: str, dest_folder_id: str) -> bool:
+    def list_child_folders(self, parent_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        All folders directly under a parent, in one listing
+        
+        Args:
+            parent_id: Parent folder ID (None for My Drive's root)
+            
+        Returns:
+            Folder name -> ID (the first listed wins for duplicate names).
+            Errors propagate, so a failed listing is never mistaken for
+            missing folders.
+        """
+        folders: Dict[str, str] = {}
+        for folder in self.iter_files(
+            folder_id=parent_id or "root",
+            query="mimeType='application/vnd.google-apps.folder'",
+            page_size=1000,
+            raise_errors=True
+        ):
+            folders.setdefault(folder.name, folder.id)
+        return folders
+    
+    def create_folders(self, names: List[str], parent_id: Optional[str] = None) -> List[Optional[str]]:
+        """
+        Create several folders under one parent using batched requests
+        
+        Args:
+            names: Folder names
+            parent_id: Optional parent folder ID
+            
+        Returns:
+            Created folder IDs in order, None where a create failed
+        """
+        requests = []
+        for name in names:
+            file_metadata = {'name': name, 'mimeType': 'application/vnd.google-apps.folder'}
+            if parent_id:
+                file_metadata['parents'] = [parent_id]
+            requests.append(self.service.files().create(body=file_metadata, fields='id'))
+        folder_ids: List[Optional[str]] = []
+        for name, (response, error) in zip(names, self.batch_execute(requests)):
+            if error is not None:
+                print(f"Error creating folder {name}: {str(error)}")
+            folder_ids.append(response.get('id') if response is not None else None)
+        return folder_ids
+    
+    def find_missing(self, file_ids: List[str]) -> List[str]:
+        """
+        Which of the given files (or folders) were deleted or trashed
+        
+        Args:
+            file_ids: File IDs to check, in one batched pass
+            
+        Returns:
+            IDs that answered 404 or are in the trash
+        """
+        results = self.batch_execute([
+            self.service.files().get(fileId=file_id, fields='id, trashed') for file_id in file_ids
+        ])
+        missing = []
+        for file_id, (response, error) in zip(file_ids, results):
+            if error is not None:
+                if error_status(error) == 404:
+                    missing.append(file_id)
+            elif response.get('trashed'):
+                missing.append(file_id)
+        return missing
+    
+    def batch_execute(
+        self,
+        requests: List[HttpRequest],
+        batch_size: int = 100
+    ) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        Execute API requests in batches (one HTTP round trip per batch)
+        
+        Args:
+            requests: Unexecuted API requests
+            batch_size: Calls per batch (Drive allows at most 100)
+            
+        Returns:
+            One (response, error) pair per request, in request order; exactly
+            one of the two is None
+        """
+        results: List[Tuple[Optional[Dict], Optional[Exception]]] = [(None, None)] * len(requests)
+        
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+        
+        pending = list(range(len(requests)))
+        round_trip_failed = set()  # already retried by the limiter
+        attempt = 0
+        while pending:
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                batch = self.service.new_batch_http_request(callback=callback)
+                for i in chunk:
+                    batch.add(requests[i], request_id=str(i))
+                try:
+                    # Each call in the batch counts against the quota
+                    self.limiter.call(lambda: batch.execute(http=self._http()), method='batch', cost=len(chunk))
+                except Exception as e:
+                    # The whole round trip failed; every call in it failed with it
+                    for i in chunk:
+                        results[i] = (None, e)
+                        round_trip_failed.add(i)
+            # Calls rejected individually (e.g. userRateLimitExceeded) go again after a pause
+            pending = [
+                i for i in pending
+                if i not in round_trip_failed and results[i][1] is not None and is_retryable(results[i][1])
+            ]
+            if not pending or attempt >= self.limiter.max_retries:
+                break
+            if any(is_rate_limited(results[i][1]) for i in pending):
+                self.limiter.slow_down()
+            self.limiter.backoff(attempt)
+            attempt += 1
+        return results
+    
+    def _move_request(self, file_id: str, dest_folder_id: str, previous_parents: List[str]) -> HttpRequest:
+        """Build the files.update request that moves a file"""
+        return self.service.files().update(
+            fileId=file_id,
+            addParents=dest_folder_id,
+            removeParents=",".join(previous_parents),
+            fields='id, parents'
+        )
+    
+    def move_file(
+        self,
+        file_id: str,
+        dest_folder_id: str,
+        previous_parents: Optional[List[str]] = None
+    ) -> bool:
         """
         Move a file to a different folder
         
         Args:
             file_id: File ID to move
             dest_folder_id: Destination folder ID
+            previous_parents: Current parents if already known from a
+                listing; saves the files().get round trip
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            # Retrieve current parents
-            file = self.service.files().get(
-                fileId=file_id,
-                fields='parents'
-            ).execute()
-            
-            previous_parents = ",".join(file.get('parents', []))
+            if previous_parents is None:
+                # Retrieve current parents
+                file = self._execute(self.service.files().get(
+                    fileId=file_id,
+                    fields='parents'
+                ))
+                previous_parents = file.get('parents', [])
             
             # Move file
-            self.service.files().update(
-                fileId=file_id,
-                addParents=dest_folder_id,
-                removeParents=previous_parents,
-                fields='id, parents'
-            ).execute()
+            self._execute(self._move_request(file_id, dest_folder_id, previous_parents))
             
             return True
         
@@ -206,6 +580,50 @@ class GoogleDriveService:
             print(f"Error moving file {file_id}: {str(e)}")
             return False
     
+    def move_files(
+        self,
+        moves: List[Tuple[str, str, Optional[List[str]]]],
+        batch_size: int = 100
+    ) -> List[Optional[str]]:
+        """
+        Move many files using batched requests
+        
+        Parents missing from `moves` are looked up in one batched pass
+        first, so n moves cost about n/100 round trips (2n/100 without
+        known parents) instead of 2n.
+        
+        Args:
+            moves: (file_id, dest_folder_id, previous_parents or None) tuples
+            batch_size: Calls per batch (Drive allows at most 100)
+            
+        Returns:
+            One entry per move, in order: None on success, else the error message
+        """
+        errors: List[Optional[str]] = [None] * len(moves)
+        parents = [known for _, _, known in moves]
+        unknown = [i for i, known in enumerate(parents) if known is None]
+        if unknown:
+            lookups = self.batch_execute(
+                [self.service.files().get(fileId=moves[i][0], fields='parents') for i in unknown],
+                batch_size=batch_size
+            )
+            for i, (response, error) in zip(unknown, lookups):
+                if error is not None:
+                    errors[i] = str(error)
+                else:
+                    parents[i] = response.get('parents', [])
+        
+        pending = [i for i in range(len(moves)) if errors[i] is None]
+        updates = self.batch_execute(
+            [self._move_request(moves[i][0], moves[i][1], parents[i]) for i in pending],
+            batch_size=batch_size
+        )
+        for i, (_, error) in zip(pending, updates):
+            if error is not None:
+                errors[i] = str(error)
+                print(f"Error moving file {moves[i][0]}: {str(error)}")
+        return errors
+    
     def find_folder_by_name(self, name: str, parent_id: Optional[str] = None) -> Optional[str]:
         """
         Find a folder by name
@@ -222,11 +640,11 @@ class GoogleDriveService:
             if parent_id:
                 query += f" and '{parent_id}' in parents"
             
-            results = self.service.files().list(
+            results = self._execute(self.service.files().list(
                 q=query,
                 spaces='drive',
                 fields='files(id, name)'
-            ).execute()
+            ))
             
             items = results.get('files', [])
             if items:
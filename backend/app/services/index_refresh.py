@@ -0,0 +1,93 @@
+"""Shared pieces of the local Drive indexes (BM25 and vector): document metadata and refresh"""
+from app.config import settings
+from app.models.file_metadata import DriveFile
+from app.services.executor import propagate_context
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Optional
+import itertools
+
+
+def doc_metadata(file: DriveFile) -> Dict:
+    """Metadata an index stores per document (enough to rebuild the DriveFile)"""
+    return {
+        "name": file.name,
+        "mime_type": file.mime_type,
+        "modified_time": file.modified_time.isoformat() if file.modified_time else None,
+        "folder_path": file.folder_path,
+        "size": file.size,
+        "md5_checksum": file.md5_checksum,
+    }
+
+
+def file_from_doc(file_id: str, doc: Dict) -> DriveFile:
+    """Rebuild a DriveFile from stored document metadata (size and checksum keep duplicate detection working)"""
+    return DriveFile(
+        id=file_id,
+        name=doc["name"],
+        mime_type=doc["mime_type"],
+        modified_time=datetime.fromisoformat(doc["modified_time"]) if doc.get("modified_time") else None,
+        folder_path=doc.get("folder_path"),
+        size=doc.get("size"),
+        md5_checksum=doc.get("md5_checksum"),
+    )
+
+
+def refresh_index(
+    index,
+    drive_service,
+    files: List[DriveFile],
+    complete: bool = True,
+    max_in_flight: Optional[int] = None
+) -> Dict:
+    """
+    Download new or modified files and index them as they arrive
+
+    At most max_in_flight texts are held at once: each download is upserted
+    as soon as it finishes and the next file is only requested then, so a
+    first sync of thousands of large documents runs in flat memory.
+
+    Args:
+        index: DriveSearchIndex or VectorIndex (needs_update, upsert, remove,
+            file_ids, save)
+        drive_service: GoogleDriveService used to fetch text (through the
+            content cache)
+        files: Listed files
+        complete: Whether `files` is the whole indexed scope; if so, docs
+            not in it are removed
+        max_in_flight: Cap on concurrent downloads
+
+    Returns:
+        Dict with counts of indexed, removed and unchanged files
+    """
+    documents = [f for f in files if drive_service.can_read_text(f.mime_type, f.size)]
+    stale = [f for f in documents if index.needs_update(f)]
+    workers = max(1, min(max_in_flight or settings.drive_max_in_flight, len(stale) or 1))
+    fetch = propagate_context(drive_service.get_file_text)
+    queued = iter(stale)
+    indexed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = {pool.submit(fetch, file): file for file in itertools.islice(queued, workers)}
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file = in_flight.pop(future)
+                text = future.result()
+                if text:
+                    index.upsert(file, text)
+                    indexed += 1
+            for file in itertools.islice(queued, len(done)):
+                in_flight[pool.submit(fetch, file)] = file
+    removed = 0
+    if complete:
+        listed = {f.id for f in documents}
+        for file_id in [i for i in index.file_ids() if i not in listed]:
+            index.remove(file_id)
+            removed += 1
+    index.save()
+    return {
+        "indexed": indexed,
+        "removed": removed,
+        "unchanged": len(documents) - len(stale),
+        "documents": len(index),
+    }
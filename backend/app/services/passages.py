@@ -0,0 +1,167 @@
+"""Tokenization, passage chunking and query-focused passage selection"""
+from app.config import settings
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import re
+
+
+# Common words that carry no retrieval signal (shared by the index and ContextRetriever)
+STOP_WORDS = {
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'were', 'been',
+    'be', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would',
+    'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these',
+    'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'what', 'which',
+    'who', 'when', 'where', 'why', 'how', 'create', 'make', 'write', 'generate'
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms
+
+    Args:
+        text: Input text
+
+    Returns:
+        Lowercase alphanumeric tokens, without stop words and single characters
+    """
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOP_WORDS]
+
+
+Span = Tuple[int, int]
+
+
+def split_passages(text: str, size: Optional[int] = None, overlap: Optional[int] = None) -> List[Span]:
+    """
+    Split text into overlapping passages
+
+    Passages are about `size` characters, end on a paragraph, line or word
+    boundary where possible and overlap their neighbour by about `overlap`
+    characters so an answer straddling a boundary appears whole in one.
+
+    Args:
+        text: Extracted document text
+        size: Target passage length in characters
+        overlap: Characters shared between consecutive passages
+
+    Returns:
+        List of (start, end) character spans into text
+    """
+    size = size or settings.passage_chars
+    overlap = settings.passage_overlap if overlap is None else overlap
+    overlap = min(overlap, size // 2)
+    spans = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(length, start + size)
+        if end < length:
+            # Prefer to break at a paragraph, then a line, then a space
+            floor = start + size // 2
+            for sep in ("\n\n", "\n", " "):
+                cut = text.rfind(sep, floor, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= length:
+            break
+        next_start = max(end - overlap, start + 1)
+        # Start the next passage on a word boundary
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
+
+
+def rank_passages(query_terms: Sequence[str], text: str, spans: List[Span]) -> List[Tuple[Span, float]]:
+    """
+    Score a document's passages against query terms with BM25 over the document
+
+    Args:
+        query_terms: Tokenized query
+        text: Document text
+        spans: Passage spans from split_passages
+
+    Returns:
+        List of (span, score) for passages with a positive score, best first
+    """
+    terms = set(query_terms)
+    if not terms or not spans:
+        return []
+    k1, b = 1.2, 0.75
+    frequencies: List[Dict[str, int]] = []
+    lengths = []
+    for start, end in spans:
+        tokens = tokenize(text[start:end])
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            if token in terms:
+                counts[token] = counts.get(token, 0) + 1
+        frequencies.append(counts)
+        lengths.append(len(tokens))
+    n = len(spans)
+    avg_length = (sum(lengths) / n) or 1.0
+    df = {term: sum(1 for counts in frequencies if term in counts) for term in terms}
+    scored = []
+    for span, counts, length in zip(spans, frequencies, lengths):
+        score = 0.0
+        for term, tf in counts.items():
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        if score > 0:
+            scored.append((span, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored
+
+
+def select_passages(
+    query_terms: Sequence[str],
+    text: str,
+    max_passages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    spans: Optional[List[Span]] = None
+) -> List[str]:
+    """
+    Pick the passages of a document most relevant to a query
+
+    Falls back to the document's opening passages when nothing matches, so a
+    file chosen by name still contributes context.
+
+    Args:
+        query_terms: Tokenized query
+        text: Document text
+        max_passages: Maximum passages to return
+        max_chars: Character budget for the returned passages
+        spans: Candidate spans (best first) if already ranked, e.g. by the index
+
+    Returns:
+        Passage texts in document order
+    """
+    max_passages = max_passages or settings.passages_per_file
+    max_chars = settings.passage_chars * max_passages if max_chars is None else max_chars
+    if spans is None:
+        all_spans = split_passages(text)
+        ranked = [span for span, _ in rank_passages(query_terms, text, all_spans)]
+        spans = ranked or all_spans
+    chosen: List[Span] = []
+    used = 0
+    for start, end in spans:
+        if len(chosen) >= max_passages or used >= max_chars:
+            break
+        if start >= len(text):
+            continue
+        end = min(end, len(text), start + max_chars - used)
+        chosen.append((start, end))
+        used += end - start
+    # Merge overlapping neighbours so shared text isn't repeated
+    merged: List[Span] = []
+    for start, end in sorted(chosen):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return [text[start:end].strip() for start, end in merged]
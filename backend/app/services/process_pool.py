@@ -0,0 +1,140 @@
+"""Process pool for CPU-bound work whose stuck workers can be recycled"""
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Tuple
+import multiprocessing
+import threading
+
+
+class RecyclingProcessPool:
+    """
+    Spawned ProcessPoolExecutor with a timeout per task.
+
+    At most max_workers tasks are submitted at once; callers beyond that
+    wait for a free worker before their task is submitted, so a task's
+    timeout covers its own run and not its wait behind others. A running
+    task can't be cancelled, so a task that overruns its timeout takes its
+    pool down: the workers are terminated and the next task
+    starts a fresh pool. Other tasks that were on the recycled pool fail
+    with BrokenProcessPool (or are cancelled, if still queued); they are
+    resubmitted to the fresh pool once, with a full timeout, instead of
+    failing for a file that wasn't theirs.
+    """
+
+    def __init__(self, max_workers: int, initializer: Optional[Callable] = None, initargs: Tuple = ()):
+        """
+        Initialize the pool (worker processes start on first use)
+
+        Args:
+            max_workers: Worker processes
+            initializer: Called once in each worker process
+            initargs: Arguments for the initializer
+        """
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_workers))
+        self.recycles = 0
+        self.retries = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """The current pool, started on first use (spawned: forking a threaded server is unsafe)"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                    initargs=self.initargs
+                )
+            return self._pool
+
+    @staticmethod
+    def _terminate_workers(pool: ProcessPoolExecutor):
+        """Stop a pool's worker processes, including one stuck in a task"""
+        terminate = getattr(pool, "terminate_workers", None)  # public from Python 3.14
+        if terminate is not None:
+            terminate()
+            return
+        processes = getattr(pool, "_processes", None)  # CPython's worker table before 3.14
+        if processes is None:
+            print("Can't terminate stuck pool workers on this Python; they exit when their task ends")
+            return
+        for process in list(processes.values()):
+            process.terminate()
+
+    def _recycle(self, pool: ProcessPoolExecutor):
+        """Replace a stuck or broken pool; the next task starts a fresh one"""
+        with self._lock:
+            if self._pool is not pool:
+                return  # already replaced by another caller
+            self._pool = None
+            self.recycles += 1
+        self._terminate_workers(pool)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None, wait: Optional[float] = None):
+        """
+        Run fn(*args) in a worker process
+
+        Args:
+            fn: Picklable module-level function
+            timeout: Seconds the task may run once a worker is free for it
+            wait: Seconds to wait for a free worker (None waits as long as it takes)
+
+        Returns:
+            fn's return value
+
+        Raises:
+            TimeoutError: No worker was free within `wait` (nothing is
+                recycled), or the task overran the timeout (its pool was
+                recycled)
+            BrokenProcessPool: A worker died while running it (e.g. a parser
+                crash), on the retry as well
+        """
+        if not self._slots.acquire(timeout=None if wait is None else max(0.0, wait)):
+            raise TimeoutError(f"no free worker within {wait}s")
+        try:
+            return self._run(fn, args, timeout)
+        finally:
+            self._slots.release()
+
+    def _run(self, fn: Callable, args: Tuple, timeout: Optional[float]):
+        """Submit and wait for a task while holding a worker slot, retrying once on a broken pool"""
+        retried = False
+        while True:
+            pool = self._get_pool()
+            try:
+                future = pool.submit(fn, *args)
+            except (BrokenProcessPool, RuntimeError):
+                # Recycled between _get_pool and submit
+                self._recycle(pool)
+                if retried:
+                    raise
+                retried = True
+                continue
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeout:
+                self._recycle(pool)
+                raise TimeoutError(f"task overran {timeout}s")
+            except (BrokenProcessPool, CancelledError):
+                self._recycle(pool)
+                if retried:
+                    raise BrokenProcessPool("worker pool broke twice while running the task")
+                retried = True
+                with self._lock:
+                    self.retries += 1
+
+    def stats(self) -> Dict:
+        """Recycle and retry counters"""
+        return {"recycles": self.recycles, "retries": self.retries}
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -35,6 +35,7 @@ class PromptBuilder:
         
         Args:
             context_files: List of file dictionaries with 'name', 'folder', 'content'
+                and optionally 'passages' (excerpts shown instead of content)
             
         Returns:
             Formatted context string
@@ -48,6 +49,11 @@ class PromptBuilder:
             folder = file_data.get('folder', 'Unknown')
             content = file_data.get('content', '')
             relevance = file_data.get('relevance_score', 0)
+            passages = file_data.get('passages')
+            if passages:
+                content = "\n\n".join(
+                    f"[Excerpt {n}]\n{passage}" for n, passage in enumerate(passages, 1)
+                )
             
             formatted.append(f"""
 --- CONTEXT FILE {i} ---
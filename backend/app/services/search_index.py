@@ -0,0 +1,277 @@
+"""Local BM25 inverted index over extracted Drive document text"""
+from app.config import settings
+from app.models.file_metadata import DriveFile
+from app.services.index_refresh import doc_metadata, file_from_doc, refresh_index
+from app.services.passages import Span, split_passages, tokenize
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import threading
+
+
+class DriveSearchIndex:
+    """
+    Inverted index with BM25 ranking over passages of synced Drive files.
+
+    Each file is split into overlapping passages (see passages.py) and every
+    passage is indexed on its own, so a long document ranks by its best
+    section rather than by whole-document term counts, and search can say
+    which parts of a file matched. Documents are keyed by Drive file ID and
+    remember the modifiedTime they were indexed at, so a sync only re-reads
+    files that changed. The index is persisted as JSON and loaded lazily on
+    first use.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # Bump when the persisted layout changes; older indexes are rebuilt
+    FORMAT_VERSION = 2
+
+    def __init__(self, index_path: str):
+        """
+        Initialize the index
+
+        Args:
+            index_path: JSON file the index is persisted to
+        """
+        self.index_path = index_path
+        self._docs: Dict[str, Dict] = {}  # file_id -> metadata + passage spans
+        self._lengths: Dict[str, int] = {}  # passage id -> length in tokens
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> {passage id: term frequency}
+        self._doc_terms: Dict[str, List[str]] = {}  # file_id -> distinct terms, for removal
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    @staticmethod
+    def _passage_id(file_id: str, number: int) -> str:
+        """Posting key of a file's n-th passage"""
+        return f"{file_id}#{number}"
+
+    @staticmethod
+    def _split_passage_id(passage_id: str) -> Tuple[str, int]:
+        """Inverse of _passage_id"""
+        file_id, _, number = passage_id.rpartition("#")
+        return file_id, int(number)
+
+    def _ensure_loaded(self):
+        """Load the persisted index on first use"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.index_path):
+                try:
+                    with open(self.index_path, "r") as file:
+                        data = json.load(file)
+                    if data.get("version") != self.FORMAT_VERSION:
+                        print("Search index format changed; it will be rebuilt on the next sync")
+                    else:
+                        self._docs = data.get("docs", {})
+                        self._lengths = data.get("lengths", {})
+                        self._postings = data.get("postings", {})
+                        terms: Dict[str, set] = {}
+                        for term, postings in self._postings.items():
+                            for passage_id in postings:
+                                terms.setdefault(self._split_passage_id(passage_id)[0], set()).add(term)
+                        self._doc_terms = {file_id: list(t) for file_id, t in terms.items()}
+                        self._total_length = sum(self._lengths.values())
+                except Exception as e:
+                    print(f"Error loading search index: {str(e)}")
+            self._loaded = True
+
+    def __len__(self) -> int:
+        """Number of indexed documents"""
+        self._ensure_loaded()
+        return len(self._docs)
+
+    def needs_update(self, file: DriveFile) -> bool:
+        """Whether a file is missing from the index or changed since indexing"""
+        self._ensure_loaded()
+        doc = self._docs.get(file.id)
+        modified = file.modified_time.isoformat() if file.modified_time else None
+        return doc is None or modified is None or doc.get("modified_time") != modified
+
+    def _remove_locked(self, file_id: str):
+        """Remove a document's passages and postings (caller holds the lock)"""
+        doc = self._docs.pop(file_id, None)
+        if doc is None:
+            return
+        passage_ids = [self._passage_id(file_id, n) for n in range(len(doc["spans"]))]
+        for passage_id in passage_ids:
+            self._total_length -= self._lengths.pop(passage_id, 0)
+        for term in self._doc_terms.pop(file_id, []):
+            postings = self._postings.get(term)
+            if postings is not None:
+                for passage_id in passage_ids:
+                    postings.pop(passage_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def upsert(self, file: DriveFile, text: str):
+        """
+        Index (or re-index) a file's text passage by passage
+
+        Args:
+            file: Listed DriveFile
+            text: Extracted text content
+        """
+        self._ensure_loaded()
+        spans = split_passages(text) or [(0, len(text))]
+        # File names are short but highly relevant; index them with every passage
+        name_tokens = tokenize(file.name)
+        passages = []
+        for start, end in spans:
+            tokens = name_tokens + tokenize(text[start:end])
+            frequencies: Dict[str, int] = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+            passages.append((len(tokens), frequencies))
+        with self._lock:
+            self._remove_locked(file.id)
+            self._docs[file.id] = {**doc_metadata(file), "spans": [list(span) for span in spans]}
+            terms = set()
+            for number, (length, frequencies) in enumerate(passages):
+                passage_id = self._passage_id(file.id, number)
+                self._lengths[passage_id] = length
+                self._total_length += length
+                for term, tf in frequencies.items():
+                    self._postings.setdefault(term, {})[passage_id] = tf
+                terms.update(frequencies)
+            self._doc_terms[file.id] = list(terms)
+
+    def remove(self, file_id: str):
+        """Drop a file from the index"""
+        self._ensure_loaded()
+        with self._lock:
+            self._remove_locked(file_id)
+
+    def file_ids(self) -> List[str]:
+        """IDs of the indexed files"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._docs)
+
+    def _to_drive_file(self, file_id: str) -> DriveFile:
+        """Rebuild a DriveFile from stored document metadata"""
+        return file_from_doc(file_id, self._docs[file_id])
+
+    def search_passages(
+        self,
+        query_terms: Iterable[str],
+        limit: int = 10,
+        passages_per_file: Optional[int] = None
+    ) -> List[Tuple[DriveFile, float, List[Span]]]:
+        """
+        Rank indexed passages against query terms with BM25, grouped by file
+
+        A file scores as its best passage, so one relevant section of a long
+        document counts as much as a short document that matches throughout.
+
+        Args:
+            query_terms: Already-tokenized query terms
+            limit: Maximum files
+            passages_per_file: Maximum passage spans returned per file
+
+        Returns:
+            List of (DriveFile, best passage score, matching spans best first),
+            best file first
+        """
+        self._ensure_loaded()
+        passages_per_file = passages_per_file or settings.passages_per_file
+        with self._lock:
+            n_passages = len(self._lengths)
+            if not n_passages:
+                return []
+            avg_length = (self._total_length / n_passages) or 1.0
+            scores: Dict[str, float] = {}
+            for term in set(query_terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n_passages - df + 0.5) / (df + 0.5))
+                for passage_id, tf in postings.items():
+                    length = self._lengths[passage_id]
+                    norm = tf + self.K1 * (1 - self.B + self.B * length / avg_length)
+                    scores[passage_id] = scores.get(passage_id, 0.0) + idf * tf * (self.K1 + 1) / norm
+            by_file: Dict[str, List[Tuple[float, int]]] = {}
+            for passage_id, score in scores.items():
+                file_id, number = self._split_passage_id(passage_id)
+                by_file.setdefault(file_id, []).append((score, number))
+            ranked = sorted(by_file.items(), key=lambda item: max(item[1])[0], reverse=True)[:limit]
+            results = []
+            for file_id, hits in ranked:
+                hits.sort(reverse=True)
+                spans = self._docs[file_id]["spans"]
+                top = [tuple(spans[number]) for _, number in hits[:passages_per_file]]
+                results.append((self._to_drive_file(file_id), hits[0][0], top))
+            return results
+
+    def search(self, query_terms: Iterable[str], limit: int = 10) -> List[Tuple[DriveFile, float]]:
+        """
+        Rank indexed files against query terms with BM25
+
+        Args:
+            query_terms: Already-tokenized query terms
+            limit: Maximum results
+
+        Returns:
+            List of (DriveFile, BM25 score of its best passage), best first
+        """
+        return [(file, score) for file, score, _ in self.search_passages(query_terms, limit)]
+
+    def save(self):
+        """Persist the index atomically"""
+        self._ensure_loaded()
+        with self._lock:
+            data = json.dumps({
+                "version": self.FORMAT_VERSION,
+                "docs": self._docs,
+                "lengths": self._lengths,
+                "postings": self._postings,
+            })
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as file:
+            file.write(data)
+        os.replace(tmp_path, self.index_path)
+
+    def clear(self):
+        """Drop every document and persist the empty index (e.g. the account changed)"""
+        self._ensure_loaded()
+        with self._lock:
+            self._docs = {}
+            self._lengths = {}
+            self._postings = {}
+            self._doc_terms = {}
+            self._total_length = 0
+        self.save()
+
+    def refresh(
+        self,
+        drive_service,
+        files: List[DriveFile],
+        complete: bool = True,
+        max_in_flight: Optional[int] = None
+    ) -> Dict:
+        """
+        Bring the index up to date with a listing (see refresh_index)
+
+        Args:
+            drive_service: GoogleDriveService used to fetch text
+            files: Listed files
+            complete: Whether `files` is the whole indexed scope; if so, docs
+                not in it are removed
+            max_in_flight: Cap on concurrent downloads
+
+        Returns:
+            Dict with counts of indexed, removed and unchanged files
+        """
+        self._ensure_loaded()
+        return refresh_index(self, drive_service, files, complete=complete, max_in_flight=max_in_flight)
+
+
+# Global search index instance
+search_index = DriveSearchIndex(settings.search_index_path)
@@ -0,0 +1,125 @@
+"""Checkpoints that let repeated sorts process only new or renamed files"""
+from app.config import settings
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+import copy
+import json
+import os
+import threading
+
+
+class SortCheckpointStore:
+    """
+    Per-scope sort checkpoints, persisted as JSON.
+
+    A scope is one (source folder, organization parent) pair. Its checkpoint
+    holds a Changes API page token taken before the last run listed Drive,
+    the files that run placed (file_id -> name when placed) and the files it
+    couldn't place (pending, as DriveFile dicts). The next run only
+    classifies what changed since the token plus the pending files. A
+    recorded file whose name hasn't changed is left where it is, so moving a
+    sorted file by hand sticks; renaming it sorts it again.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the store
+
+        Args:
+            path: JSON file the checkpoints are persisted to
+        """
+        self.path = path
+        self._scopes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def scope_key(source_folder_id: Optional[str], parent_id: Optional[str]) -> str:
+        """Checkpoint key for a sort's source folder and organization parent"""
+        return f"{source_folder_id or '*'}|{parent_id or 'root'}"
+
+    def _ensure_loaded(self):
+        """Load persisted checkpoints on first use (call with the lock held)"""
+        if self._loaded:
+            return
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as file:
+                    self._scopes = json.load(file).get("scopes", {})
+            except Exception as e:
+                print(f"Error loading sort checkpoints: {str(e)}")
+        self._loaded = True
+
+    def _save(self):
+        """Persist checkpoints atomically (call with the lock held)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"scopes": self._scopes}, file)
+        os.replace(tmp_path, self.path)
+
+    def get(self, scope: str) -> Optional[Dict]:
+        """Copy of a scope's checkpoint (page_token, last_run, sorted, pending), or None"""
+        with self._lock:
+            self._ensure_loaded()
+            checkpoint = self._scopes.get(scope)
+            return copy.deepcopy(checkpoint) if checkpoint is not None else None
+
+    def update(
+        self,
+        scope: str,
+        page_token: str,
+        placed: Dict[str, str],
+        pending: Dict[str, Dict],
+        removed: Iterable[str] = ()
+    ):
+        """
+        Advance a scope's checkpoint after a run
+
+        Args:
+            scope: Key from scope_key
+            page_token: Changes API token taken before the run listed files
+            placed: file_id -> name for files now in their sorted folder
+            pending: file_id -> DriveFile dict for files to retry next run
+                (replaces the previous pending set)
+            removed: IDs of files deleted or trashed since the last run
+        """
+        with self._lock:
+            self._ensure_loaded()
+            checkpoint = self._scopes.setdefault(scope, {"sorted": {}, "pending": {}})
+            record = checkpoint["sorted"]
+            for file_id in removed:
+                record.pop(file_id, None)
+            for file_id in pending:
+                record.pop(file_id, None)
+            record.update(placed)
+            checkpoint["pending"] = pending
+            checkpoint["page_token"] = page_token
+            checkpoint["last_run"] = datetime.utcnow().isoformat()
+            self._save()
+
+    def reset(self, scope: Optional[str] = None):
+        """Forget one scope's checkpoint (or all), so the next sort is a full one"""
+        with self._lock:
+            self._ensure_loaded()
+            if scope is None:
+                self._scopes = {}
+            else:
+                self._scopes.pop(scope, None)
+            self._save()
+
+    def stats(self) -> Dict:
+        """Per-scope last run, recorded and pending file counts"""
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                scope: {
+                    "last_run": checkpoint.get("last_run"),
+                    "sorted": len(checkpoint["sorted"]),
+                    "pending": len(checkpoint["pending"]),
+                }
+                for scope, checkpoint in self._scopes.items()
+            }
+
+
+# Global checkpoint store
+sort_checkpoints = SortCheckpointStore(settings.sort_checkpoint_path)
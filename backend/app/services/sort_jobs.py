@@ -0,0 +1,390 @@
+"""Background, resumable Drive sort jobs with an on-disk journal"""
+from app.config import settings
+from app.services.drive_tree import drive_tree
+from app.services.executor import drive_executor
+from app.services.file_sorter import MOVE_BATCH_SIZE, FileSorter
+from app.services.sort_checkpoint import SortCheckpointStore
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+import threading
+import uuid
+
+
+# Jobs in these states can be resumed
+RESUMABLE_STATUSES = {"interrupted", "cancelled", "failed"}
+FINISHED_STATUSES = {"completed", "failed", "cancelled", "interrupted"}
+
+
+class SortJob:
+    """
+    One sort run: its plan, which planned moves are done, and its status.
+
+    Status goes planning -> running -> completed (or failed / cancelled).
+    Jobs found unfinished at startup are marked interrupted.
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        dry_run: bool = False,
+        source_folder_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        created_at: Optional[str] = None,
+        full: bool = False,
+        sniff_content: bool = False,
+        duplicates: str = "report"
+    ):
+        self.id = job_id
+        self.dry_run = dry_run
+        self.full = full
+        self.sniff_content = sniff_content
+        self.duplicates = duplicates
+        self.source_folder_id = source_folder_id
+        self.parent_id = parent_id
+        self.created_at = created_at or datetime.utcnow().isoformat()
+        self.updated_at = self.created_at
+        self.status = "planning"
+        self.error: Optional[str] = None
+        self.plan: Optional[Dict] = None
+        self.outcomes: Dict[str, Optional[str]] = {}  # file_id -> None (moved) or error
+        self.task: Optional[asyncio.Task] = None
+        self._changed: Optional[asyncio.Event] = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has stopped (successfully or not)"""
+        return self.status in FINISHED_STATUSES
+
+    def remaining_moves(self) -> List[Dict]:
+        """Planned moves not yet attempted"""
+        if self.plan is None:
+            return []
+        return [m for m in self.plan["moves"] if m["id"] not in self.outcomes]
+
+    def progress(self) -> Dict:
+        """Counts of planned, moved, failed and remaining moves"""
+        planned = len(self.plan["moves"]) if self.plan is not None else 0
+        failed = sum(1 for error in self.outcomes.values() if error is not None)
+        done = len(self.outcomes)
+        return {
+            "planned": planned,
+            "moved": done - failed,
+            "failed": failed,
+            "remaining": planned - done,
+            "percent": round(100.0 * done / planned, 1) if planned else (100.0 if self.finished else 0.0),
+        }
+
+    def summary(self) -> Dict:
+        """Job status for the API"""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "dry_run": self.dry_run,
+            "full": self.full,
+            "sniff_content": self.sniff_content,
+            "duplicates": self.duplicates,
+            "mode": self.plan.get("checkpoint", {}).get("mode", "full") if self.plan is not None else None,
+            "source_folder_id": self.source_folder_id,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "error": self.error,
+            "progress": self.progress(),
+        }
+
+    def result(self) -> Optional[Dict]:
+        """Sort result in FileSorter.sort_all_files' shape (moves so far), once planned"""
+        if self.plan is None:
+            return None
+        return FileSorter.sort_result(self.plan, self.outcomes)
+
+    def changed(self) -> asyncio.Event:
+        """Event set on the next progress or status change"""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def notify(self):
+        """Wake progress listeners (call on the event loop)"""
+        self.updated_at = datetime.utcnow().isoformat()
+        event, self._changed = self._changed, asyncio.Event()
+        if event is not None:
+            event.set()
+
+
+class SortJobManager:
+    """
+    Runs FileSorter as background jobs and journals them to disk.
+
+    Each job appends JSON lines to <journal_dir>/<job_id>.jsonl: the job
+    parameters, the full plan, one record per finished move and each status
+    change. Planned moves missing a result are what a resumed job still has
+    to do, so a crash or restart loses at most the moves of the batches in
+    flight (moves are idempotent, so redoing them is harmless). Moves go out
+    in batches of MOVE_BATCH_SIZE with up to `max_concurrent_batches`
+    batches in flight. Dry-run jobs stop after planning; other jobs advance
+    the sort checkpoint once every planned move has been attempted.
+    """
+
+    def __init__(self, journal_dir: str, max_concurrent_batches: int):
+        """
+        Initialize the manager
+
+        Args:
+            journal_dir: Directory for job journals
+            max_concurrent_batches: Move batches sent concurrently per job
+        """
+        self.journal_dir = journal_dir
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._jobs: Dict[str, SortJob] = {}
+        self._lock = threading.Lock()
+        self._recovered = False
+
+    def _journal_path(self, job_id: str) -> str:
+        """Path of a job's journal"""
+        return os.path.join(self.journal_dir, f"{job_id}.jsonl")
+
+    def _append(self, job: SortJob, records: List[Dict]):
+        """Append records to a job's journal as JSON lines"""
+        with open(self._journal_path(job.id), "a") as file:
+            file.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+            file.flush()
+
+    def _set_status(self, job: SortJob, status: str, error: Optional[str] = None):
+        """Change a job's status, journal it and notify listeners"""
+        job.status = status
+        job.error = error
+        self._append(job, [{"op": "status", "status": status, "error": error, "at": datetime.utcnow().isoformat()}])
+        job.notify()
+
+    @staticmethod
+    def _replay(lines: List[str]) -> Optional[SortJob]:
+        """Rebuild a job from its journal lines (a torn last line is skipped)"""
+        job = None
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            op = record.get("op")
+            if op == "job":
+                job = SortJob(
+                    record["job_id"],
+                    dry_run=record.get("dry_run", False),
+                    source_folder_id=record.get("source_folder_id"),
+                    parent_id=record.get("parent_id"),
+                    created_at=record.get("created_at"),
+                    full=record.get("full", False),
+                    sniff_content=record.get("sniff_content", False),
+                    duplicates=record.get("duplicates", "report")
+                )
+            elif job is None:
+                continue
+            elif op == "plan":
+                job.plan = record["plan"]
+            elif op == "move":
+                job.outcomes[record["id"]] = record.get("error")
+            elif op == "status":
+                job.status = record["status"]
+                job.error = record.get("error")
+                job.updated_at = record.get("at", job.updated_at)
+        return job
+
+    def recover(self):
+        """Load journals; jobs that were planning or running when the process stopped become interrupted"""
+        with self._lock:
+            if self._recovered:
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+            interrupted = []
+            for entry in os.listdir(self.journal_dir):
+                if not entry.endswith(".jsonl"):
+                    continue
+                try:
+                    with open(os.path.join(self.journal_dir, entry), "r") as file:
+                        job = self._replay(file.readlines())
+                except OSError as e:
+                    print(f"Error reading sort journal {entry}: {str(e)}")
+                    continue
+                if job is None:
+                    continue
+                self._jobs[job.id] = job
+                if not job.finished:
+                    interrupted.append(job)
+            self._recovered = True
+        for job in interrupted:
+            self._set_status(job, "interrupted", "process stopped before the job finished")
+        if interrupted:
+            print(f"Sort jobs: {len(interrupted)} interrupted job(s) can be resumed")
+
+    def get(self, job_id: str) -> Optional[SortJob]:
+        """Job by ID"""
+        self.recover()
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, limit: int = 20) -> List[Dict]:
+        """Job summaries, most recent first"""
+        self.recover()
+        jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [job.summary() for job in jobs[:limit]]
+
+    def _running_in_scope(self, job: SortJob) -> Optional[SortJob]:
+        """
+        Another running job that moves files in the same scope as `job`
+
+        Two such jobs would plan from the same checkpoint and commit it
+        twice. Dry runs only plan, so they never conflict.
+        """
+        if job.dry_run:
+            return None
+        scope = SortCheckpointStore.scope_key(job.source_folder_id, job.parent_id)
+        for other in self._jobs.values():
+            if (
+                other is not job
+                and not other.dry_run
+                and other.task is not None
+                and not other.task.done()
+                and SortCheckpointStore.scope_key(other.source_folder_id, other.parent_id) == scope
+            ):
+                return other
+        return None
+
+    def start(
+        self,
+        drive_service,
+        dry_run: bool = False,
+        source_folder_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        full: bool = False,
+        sniff_content: bool = False,
+        duplicates: str = "report"
+    ) -> SortJob:
+        """
+        Start a sort job in the background (call from the event loop)
+
+        Args:
+            drive_service: GoogleDriveService
+            dry_run: Only produce the plan
+            source_folder_id: Folder to sort (None for all files)
+            parent_id: Parent of the sorted folders
+            full: Classify every file instead of only those changed since
+                the scope's last sort
+            sniff_content: Classify would-be Unsorted files by their text
+            duplicates: What to do with copies of other files ("report",
+                "skip" or "quarantine")
+
+        Returns:
+            The new job
+
+        Raises:
+            ValueError: Another job is already sorting the same scope
+        """
+        self.recover()
+        job = SortJob(
+            uuid.uuid4().hex, dry_run=dry_run, source_folder_id=source_folder_id, parent_id=parent_id,
+            full=full, sniff_content=sniff_content, duplicates=duplicates
+        )
+        busy = self._running_in_scope(job)
+        if busy is not None:
+            raise ValueError(f"Sort job {busy.id} is already running on this folder")
+        self._append(job, [{
+            "op": "job",
+            "job_id": job.id,
+            "dry_run": dry_run,
+            "source_folder_id": source_folder_id,
+            "parent_id": parent_id,
+            "full": full,
+            "sniff_content": sniff_content,
+            "duplicates": duplicates,
+            "created_at": job.created_at,
+        }])
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, FileSorter(drive_service)))
+        return job
+
+    def resume(self, job_id: str, drive_service) -> SortJob:
+        """
+        Continue an interrupted, cancelled or failed job where it stopped
+
+        Raises:
+            KeyError: No such job
+            ValueError: The job is still running or already completed, or
+                another job is sorting the same scope
+        """
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.task is not None and not job.task.done():
+            raise ValueError(f"Job {job_id} is already running")
+        if job.status not in RESUMABLE_STATUSES:
+            raise ValueError(f"Job {job_id} is {job.status} and can't be resumed")
+        busy = self._running_in_scope(job)
+        if busy is not None:
+            raise ValueError(f"Sort job {busy.id} is already running on this folder")
+        # Leave the resumable state before the task is scheduled, so a second resume is refused
+        self._set_status(job, "planning" if job.plan is None else "running")
+        job.task = asyncio.create_task(self._run(job, FileSorter(drive_service)))
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop a running job after its in-flight batches; returns False if it isn't running"""
+        job = self.get(job_id)
+        if job is None or job.task is None or job.task.done():
+            return False
+        job.task.cancel()
+        return True
+
+    async def wait(self, job: SortJob) -> SortJob:
+        """Wait for a job to finish (the job keeps running if the waiter is cancelled)"""
+        if job.task is not None:
+            await asyncio.shield(job.task)
+        return job
+
+    async def _run(self, job: SortJob, sorter: FileSorter):
+        """Plan (unless already planned) and then execute the remaining moves"""
+        try:
+            if job.plan is None:
+                self._set_status(job, "planning")
+                job.plan = await drive_executor.run(
+                    sorter.plan_sort, job.source_folder_id, job.parent_id, job.dry_run, job.full,
+                    job.sniff_content, job.duplicates
+                )
+                self._append(job, [{"op": "plan", "plan": job.plan}])
+            if job.dry_run:
+                self._set_status(job, "completed")
+                return
+            self._set_status(job, "running")
+            remaining = job.remaining_moves()
+            batches = [remaining[i:i + MOVE_BATCH_SIZE] for i in range(0, len(remaining), MOVE_BATCH_SIZE)]
+            moved_any = False
+            for start in range(0, len(batches), self.max_concurrent_batches):
+                window = batches[start:start + self.max_concurrent_batches]
+                results = await asyncio.gather(*(drive_executor.run(sorter.apply_moves, b) for b in window))
+                records = []
+                for batch, errors in zip(window, results):
+                    for move, error in zip(batch, errors):
+                        job.outcomes[move["id"]] = error
+                        moved_any = moved_any or error is None
+                        records.append({"op": "move", "id": move["id"], "error": error})
+                self._append(job, records)
+                job.notify()
+            if moved_any:
+                # Cached folder paths are stale now
+                drive_tree.invalidate()
+            await drive_executor.run(sorter.commit_checkpoint, job.plan, job.outcomes)
+            self._set_status(job, "completed")
+        except asyncio.CancelledError:
+            self._set_status(job, "cancelled")
+            raise
+        except Exception as e:
+            print(f"Sort job {job.id} failed: {str(e)}")
+            self._set_status(job, "failed", str(e))
+
+
+# Global job manager
+sort_jobs = SortJobManager(settings.sort_journal_dir, settings.sort_move_concurrency)
@@ -0,0 +1,66 @@
+"""Sorting rules: which folder a Drive file is sorted into"""
+
+
+# Folder set: Blog Posts, Annual Reports, Documents, Summaries, Photos, Videos, Newsletters, Social Media, Spreadsheets, Unsorted
+# A file goes to the matching rule with the lowest priority (name rules outrank MIME type rules)
+SORTING_RULES = {
+    'blog_posts': {
+        'priority': 1,
+        'patterns': ['blog_', 'article_', 'post_', 'blog-', 'article-', 'post-'],
+        'folder': 'Blog Posts',
+        'keywords': ['blog', 'article', 'post']
+    },
+    'annual_reports': {
+        'priority': 2,
+        'patterns': ['annual_report', 'annual-report', 'annualreport', 'yearly_report'],
+        'folder': 'Annual Reports',
+        'keywords': ['annual report', 'year in review', 'yearly report']
+    },
+    'summaries': {
+        'priority': 3,
+        'patterns': ['summary_', 'summary-', 'summaries_', 'summaries-'],
+        'folder': 'Summaries',
+        'keywords': ['summary', 'summaries', 'executive summary', 'meeting summary']
+    },
+    'newsletters': {
+        'priority': 4,
+        'patterns': ['newsletter_', 'monthly_update', 'newsletter-', 'monthly-update'],
+        'folder': 'Newsletters',
+        'keywords': ['newsletter', 'monthly update', 'community update']
+    },
+    'social_media': {
+        'priority': 5,
+        'patterns': ['sm_', 'instagram_', 'twitter_', 'facebook_', 'linkedin_', 'social_', 'social-'],
+        'folder': 'Social Media',
+        'keywords': ['instagram', 'twitter', 'facebook', 'social media', 'tweet']
+    },
+    'photos': {
+        'priority': 6,
+        'mime_types': ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/svg+xml'],
+        'folder': 'Photos'
+    },
+    'videos': {
+        'priority': 7,
+        'mime_types': ['video/mp4', 'video/quicktime', 'video/x-msvideo', 'video/webm'],
+        'folder': 'Videos'
+    },
+    'documents': {
+        'priority': 8,
+        'mime_types': [
+            'application/vnd.google-apps.document',
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+            'application/msword',
+            'application/pdf'
+        ],
+        'folder': 'Documents'
+    },
+    'spreadsheets': {
+        'priority': 9,
+        'mime_types': [
+            'application/vnd.google-apps.spreadsheet',
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            'application/vnd.ms-excel'
+        ],
+        'folder': 'Spreadsheets'
+    }
+}
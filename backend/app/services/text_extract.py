@@ -0,0 +1,314 @@
+"""Text extraction for downloaded Drive files (PDF, DOCX, XLSX, CSV, plain text)"""
+from app.config import settings
+from app.services.process_pool import RecyclingProcessPool
+from typing import Callable, Dict, List, Optional
+from xml.etree import ElementTree
+import csv
+import io
+import re
+import zipfile
+import zlib
+
+
+PDF_MIME_TYPE = "application/pdf"
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+XLSX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIME_TYPES = ("text/csv", "text/tab-separated-values")
+TEXT_MIME_TYPES = ("application/json", "application/xml", "application/x-yaml", "application/rtf")
+
+# Largest XML part read from a DOCX/XLSX archive (guards against zip bombs)
+MAX_XML_PART_BYTES = 64 * 1024 * 1024
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def decode_text(data: bytes) -> str:
+    """Decode bytes as UTF-8 (BOM-aware), falling back to Latin-1"""
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def _read_part(archive: zipfile.ZipFile, name: str) -> Optional[bytes]:
+    """Read one archive member, refusing oversized ones"""
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        return None
+    if info.file_size > MAX_XML_PART_BYTES:
+        raise ValueError(f"{name} is too large to extract ({info.file_size} bytes)")
+    return archive.read(info)
+
+
+def extract_plain(data: bytes) -> str:
+    """Plain text, Markdown, JSON and similar"""
+    return decode_text(data)
+
+
+def extract_sniffed(data: bytes) -> str:
+    """Untyped uploads (application/octet-stream): text if it looks like text, else nothing"""
+    if b"\x00" in data[:8192]:
+        return ""
+    return decode_text(data)
+
+
+def extract_csv(data: bytes) -> str:
+    """CSV/TSV rendered as tab-separated lines (quoted cells unwrapped)"""
+    text = decode_text(data)
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",\t;")
+    except csv.Error:
+        dialect = csv.excel
+    return "\n".join("\t".join(cell.strip() for cell in row) for row in csv.reader(io.StringIO(text), dialect))
+
+
+def extract_docx(data: bytes) -> str:
+    """Paragraph text of a Word document's body"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        xml = _read_part(archive, "word/document.xml")
+    if xml is None:
+        return ""
+    paragraphs = []
+    for paragraph in ElementTree.fromstring(xml).iter(f"{WORD_NS}p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f"{WORD_NS}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag in (f"{WORD_NS}br", f"{WORD_NS}cr"):
+                parts.append("\n")
+        text = "".join(parts).strip()
+        if text:
+            paragraphs.append(text)
+    return "\n".join(paragraphs)
+
+
+def extract_xlsx(data: bytes) -> str:
+    """Cell values of every worksheet, one tab-separated line per row"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        shared: List[str] = []
+        strings_xml = _read_part(archive, "xl/sharedStrings.xml")
+        if strings_xml is not None:
+            for item in ElementTree.fromstring(strings_xml).iter(f"{SHEET_NS}si"):
+                shared.append("".join(t.text or "" for t in item.iter(f"{SHEET_NS}t")))
+        sheets = sorted(
+            (name for name in archive.namelist() if re.fullmatch(r"xl/worksheets/sheet\d+\.xml", name)),
+            key=lambda name: int(re.search(r"(\d+)\.xml$", name).group(1))
+        )
+        lines = []
+        for name in sheets:
+            root = ElementTree.fromstring(_read_part(archive, name))
+            for row in root.iter(f"{SHEET_NS}row"):
+                cells = []
+                for cell in row.iter(f"{SHEET_NS}c"):
+                    kind = cell.get("t")
+                    if kind == "inlineStr":
+                        cells.append("".join(t.text or "" for t in cell.iter(f"{SHEET_NS}t")))
+                        continue
+                    value = cell.find(f"{SHEET_NS}v")
+                    if value is None or value.text is None:
+                        continue
+                    if kind == "s":
+                        index = int(value.text)
+                        cells.append(shared[index] if index < len(shared) else "")
+                    else:
+                        cells.append(value.text)
+                if any(cells):
+                    lines.append("\t".join(cells))
+    return "\n".join(lines)
+
+
+_PDF_STREAM_RE = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+_PDF_TEXT_RE = re.compile(rb"\[(.*?)\]\s*TJ|\((.*?)(?<!\\)\)\s*(?:Tj|'|\")|(T\*|Td|TD|ET)", re.S)
+_PDF_STRING_RE = re.compile(rb"\((.*?)(?<!\\)\)", re.S)
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f", b"(": b"(", b")": b")", b"\\": b"\\"}
+
+
+def _pdf_string(raw: bytes) -> bytes:
+    """Unescape a PDF literal string"""
+    return re.sub(
+        rb"\\([0-7]{1,3}|.)",
+        lambda m: bytes([int(m.group(1), 8) & 0xFF]) if m.group(1)[:1].isdigit() else _PDF_ESCAPES.get(m.group(1), m.group(1)),
+        raw,
+        flags=re.S
+    )
+
+
+def _extract_pdf_streams(data: bytes) -> str:
+    """
+    Fallback PDF text extraction without pypdf: show-text operators in
+    (Flate-compressed or plain) content streams. Good for simple PDFs;
+    fonts with custom encodings come out garbled or empty.
+    """
+    lines: List[str] = []
+    current: List[bytes] = []
+    for match in _PDF_STREAM_RE.finditer(data):
+        stream = match.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        for op in _PDF_TEXT_RE.finditer(stream):
+            array, literal, newline = op.groups()
+            if array is not None:
+                current.extend(_pdf_string(s) for s in _PDF_STRING_RE.findall(array))
+            elif literal is not None:
+                current.append(_pdf_string(literal))
+            elif newline and current:
+                lines.append(decode_text(b"".join(current)))
+                current = []
+    if current:
+        lines.append(decode_text(b"".join(current)))
+    return "\n".join(line.strip() for line in lines if line.strip())
+
+
+def extract_pdf(data: bytes) -> str:
+    """Page text of a PDF (pypdf when installed, else a content stream scan)"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return _extract_pdf_streams(data)
+    reader = PdfReader(io.BytesIO(data))
+    return "\n\n".join((page.extract_text() or "").strip() for page in reader.pages).strip()
+
+
+# MIME type -> (extractor, runs in the process pool)
+EXTRACTORS: Dict[str, tuple] = {}
+
+
+def register_extractor(mime_types, fn: Callable[[bytes], str], cpu_bound: bool = True):
+    """
+    Register an extractor for one or more MIME types
+
+    Args:
+        mime_types: MIME type or list of them
+        fn: Module-level function bytes -> text (must be picklable for the pool)
+        cpu_bound: Run in the process pool with a timeout; cheap decoders run inline
+    """
+    for mime_type in ([mime_types] if isinstance(mime_types, str) else mime_types):
+        EXTRACTORS[mime_type] = (fn, cpu_bound)
+
+
+register_extractor(PDF_MIME_TYPE, extract_pdf)
+register_extractor(DOCX_MIME_TYPE, extract_docx)
+register_extractor(XLSX_MIME_TYPE, extract_xlsx)
+register_extractor(CSV_MIME_TYPES, extract_csv, cpu_bound=False)
+register_extractor(TEXT_MIME_TYPES, extract_plain, cpu_bound=False)
+register_extractor("application/octet-stream", extract_sniffed, cpu_bound=False)
+
+
+def find_extractor(mime_type: Optional[str]) -> Optional[tuple]:
+    """(extractor, cpu_bound) for a MIME type; any text/* falls back to plain text"""
+    if not mime_type:
+        return None
+    entry = EXTRACTORS.get(mime_type)
+    if entry is None and mime_type.startswith("text/"):
+        entry = (extract_plain, False)
+    return entry
+
+
+class TextExtractor:
+    """
+    Turns downloaded file bytes into prompt-ready text.
+
+    Parsers for binary formats (PDF, DOCX, XLSX) run in a process pool so
+    they neither hold the GIL against request threads nor take the server
+    down on a pathological file. Each extraction has a timeout; a worker
+    that overruns it is killed with the rest of the pool, and extractions
+    that were running beside it are retried on the fresh pool (see
+    RecyclingProcessPool). Inputs over `max_bytes` are skipped and output is
+    cut at `max_chars`.
+    """
+
+    def __init__(self, max_workers: int, timeout: float, max_bytes: int, max_chars: int):
+        """
+        Initialize the extractor
+
+        Args:
+            max_workers: Worker processes for CPU-bound parsers
+            timeout: Seconds allowed per file
+            max_bytes: Largest input accepted
+            max_chars: Longest text returned
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self._pool = RecyclingProcessPool(max_workers)
+        self.extracted = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.skipped = 0
+
+    def supports(self, mime_type: Optional[str]) -> bool:
+        """Whether text can be extracted from this MIME type"""
+        return find_extractor(mime_type) is not None
+
+    def truncatable(self, mime_type: Optional[str]) -> bool:
+        """Whether a prefix of the file still decodes (plain text, CSV) as opposed to needing the whole file"""
+        entry = find_extractor(mime_type)
+        return entry is not None and not entry[1]
+
+    def extract(self, data: bytes, mime_type: Optional[str], name: str = "") -> Optional[str]:
+        """
+        Extract text from file bytes
+
+        Args:
+            data: Downloaded file content
+            mime_type: File MIME type
+            name: File name for log messages
+
+        Returns:
+            Extracted text (at most max_chars), or None if the type isn't
+            supported, the file is too large, or parsing failed or timed out
+        """
+        entry = find_extractor(mime_type)
+        if entry is None:
+            return None
+        if len(data) > self.max_bytes:
+            self.skipped += 1
+            print(f"Skipping text extraction for {name or mime_type}: {len(data)} bytes over the limit")
+            return None
+        fn, cpu_bound = entry
+        try:
+            if cpu_bound and self.max_workers > 0:
+                try:
+                    text = self._pool.run(fn, data, timeout=self.timeout)
+                except TimeoutError:
+                    self.timeouts += 1
+                    print(f"Text extraction timed out for {name or mime_type} after {self.timeout}s")
+                    return None
+            else:
+                text = fn(data)
+        except Exception as e:
+            self.failed += 1
+            print(f"Error extracting text from {name or mime_type}: {str(e)}")
+            return None
+        self.extracted += 1
+        return text[:self.max_chars]
+
+    def stats(self) -> Dict:
+        """Extraction counters for /metrics"""
+        return {
+            "extracted": self.extracted,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            **self._pool.stats(),
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        self._pool.shutdown()
+
+
+# Global extractor instance
+text_extractor = TextExtractor(
+    max_workers=settings.extract_pool_size,
+    timeout=settings.extract_timeout,
+    max_bytes=settings.extract_max_bytes,
+    max_chars=settings.extract_max_chars
+)
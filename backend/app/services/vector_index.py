@@ -0,0 +1,322 @@
+"""Local vector index over Drive passages for semantic context retrieval"""
+from app.config import settings
+from app.models.file_metadata import DriveFile
+from app.services.index_refresh import doc_metadata, file_from_doc, refresh_index
+from app.services.passages import Span, split_passages, tokenize
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import numpy as np
+import os
+import threading
+import zlib
+
+
+class HashedEmbedder:
+    """
+    Offline text embedding: signed feature hashing of terms into `dim` buckets.
+
+    Features are the index terms plus their 5-character prefixes (so
+    "tournament" and "tournaments" share weight), counted with sublinear
+    term frequency and L2-normalized. No model or network is needed; swap in
+    a real embedding function through VectorIndex(embed_fn=...) for true
+    paraphrase matching.
+    """
+
+    def __init__(self, dim: int = 1024):
+        """
+        Initialize the embedder
+
+        Args:
+            dim: Vector dimensionality (hash buckets)
+        """
+        self.dim = dim
+        self.name = f"hashed-tf-{dim}"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        """Weighted features of one text"""
+        features: Dict[str, float] = {}
+        for token in tokenize(text):
+            features[token] = features.get(token, 0.0) + 1.0
+            if len(token) > 6:
+                prefix = f"{token[:5]}~"
+                features[prefix] = features.get(prefix, 0.0) + 0.5
+        return features
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dim), rows L2-normalized
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                # crc32 is stable across processes, unlike hash()
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                vectors[row, h % self.dim] += sign * (1.0 + np.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class VectorIndex:
+    """
+    Dense vector index over passages of synced Drive files.
+
+    One row per passage (see passages.py) in a contiguous float32 matrix
+    persisted as .npy and memory-mapped on load, so a large index costs page
+    cache rather than heap. Search is one matrix-vector product plus an
+    argpartition top-k. Buckets shared by most passages are down-weighted
+    in the query by an IDF computed over the matrix columns at save time.
+
+    Like DriveSearchIndex, files remember the modifiedTime they were indexed
+    at and only changed files are re-embedded. Upserts and removals are
+    staged in memory and become searchable after save().
+    """
+
+    def __init__(self, index_dir: str, embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None):
+        """
+        Initialize the index
+
+        Args:
+            index_dir: Directory holding vectors.npy, idf.npy and meta.json
+            embed_fn: Callable mapping a list of texts to an (n, dim) float32
+                array of L2-normalized rows; defaults to HashedEmbedder
+        """
+        self.index_dir = index_dir
+        self.embed_fn = embed_fn or HashedEmbedder(settings.vector_dim)
+        self.embedder_name = getattr(self.embed_fn, "name", getattr(self.embed_fn, "__name__", "custom"))
+        self._matrix: Optional[np.ndarray] = None  # (rows, dim), memory-mapped
+        self._idf: Optional[np.ndarray] = None
+        self._rows: List[Tuple[str, int, int]] = []  # row -> (file_id, start, end)
+        self._docs: Dict[str, Dict] = {}  # file_id -> metadata
+        self._pending: Dict[str, Tuple[Dict, List[Span], np.ndarray]] = {}
+        self._removed: set = set()
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _path(self, name: str) -> str:
+        """Path of an index file"""
+        return os.path.join(self.index_dir, name)
+
+    def _ensure_loaded(self):
+        """Load and memory-map the persisted index on first use"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            meta_path = self._path("meta.json")
+            if os.path.exists(meta_path):
+                try:
+                    with open(meta_path, "r") as file:
+                        meta = json.load(file)
+                    matrix = np.load(self._path("vectors.npy"), mmap_mode="r")
+                    rows = [tuple(row) for row in meta["rows"]]
+                    if meta.get("embedder") != self.embedder_name:
+                        print("Vector index embedder changed; it will be rebuilt on the next sync")
+                    elif matrix.shape[0] != len(rows):
+                        print("Vector index files disagree; it will be rebuilt on the next sync")
+                    else:
+                        self._matrix = matrix
+                        self._idf = np.load(self._path("idf.npy"))
+                        self._rows = rows
+                        self._docs = meta["docs"]
+                except Exception as e:
+                    print(f"Error loading vector index: {str(e)}")
+            self._loaded = True
+
+    def __len__(self) -> int:
+        """Number of indexed documents"""
+        self._ensure_loaded()
+        return len(self._docs)
+
+    def needs_update(self, file: DriveFile) -> bool:
+        """Whether a file is missing from the index or changed since indexing"""
+        self._ensure_loaded()
+        with self._lock:
+            pending = self._pending.get(file.id)
+            doc = pending[0] if pending else (None if file.id in self._removed else self._docs.get(file.id))
+        modified = file.modified_time.isoformat() if file.modified_time else None
+        return doc is None or modified is None or doc.get("modified_time") != modified
+
+    def upsert(self, file: DriveFile, text: str):
+        """
+        Embed a file's passages and stage them for the next save
+
+        Args:
+            file: Listed DriveFile
+            text: Extracted text content
+        """
+        self._ensure_loaded()
+        spans = split_passages(text) or [(0, len(text))]
+        # Prefix the name so a passage carries its document's title
+        vectors = np.asarray(
+            self.embed_fn([f"{file.name}\n{text[start:end]}" for start, end in spans]),
+            dtype=np.float32
+        )
+        doc = doc_metadata(file)
+        with self._lock:
+            self._removed.discard(file.id)
+            self._pending[file.id] = (doc, spans, vectors)
+
+    def remove(self, file_id: str):
+        """Stage a file's removal for the next save"""
+        self._ensure_loaded()
+        with self._lock:
+            self._pending.pop(file_id, None)
+            self._removed.add(file_id)
+
+    def file_ids(self) -> List[str]:
+        """IDs of the indexed files, including staged upserts and removals"""
+        self._ensure_loaded()
+        with self._lock:
+            return [i for i in {**self._docs, **self._pending} if i not in self._removed]
+
+    def save(self):
+        """Merge staged changes into a new matrix, persist it and re-map it"""
+        self._ensure_loaded()
+        with self._lock:
+            if not self._pending and not self._removed and self._matrix is not None:
+                return
+            replaced = self._removed | set(self._pending)
+            keep = [i for i, row in enumerate(self._rows) if row[0] not in replaced]
+            rows = [self._rows[i] for i in keep]
+            blocks = []
+            if self._matrix is not None and keep:
+                blocks.append(np.asarray(self._matrix[keep], dtype=np.float32))
+            docs = {file_id: doc for file_id, doc in self._docs.items() if file_id not in replaced}
+            for file_id, (doc, spans, vectors) in self._pending.items():
+                docs[file_id] = doc
+                rows.extend((file_id, start, end) for start, end in spans)
+                blocks.append(vectors)
+            if blocks:
+                matrix = np.ascontiguousarray(np.concatenate(blocks), dtype=np.float32)
+            else:
+                matrix = np.zeros((0, getattr(self.embed_fn, "dim", 1)), dtype=np.float32)
+            # Buckets most passages use carry little signal
+            df = np.count_nonzero(matrix, axis=0)
+            idf = np.log((matrix.shape[0] + 1) / (df + 1)).astype(np.float32) + 1.0
+
+            os.makedirs(self.index_dir, exist_ok=True)
+            np.save(self._path("vectors.tmp.npy"), matrix)
+            np.save(self._path("idf.tmp.npy"), idf)
+            with open(self._path("meta.json.tmp"), "w") as file:
+                json.dump({"embedder": self.embedder_name, "rows": rows, "docs": docs}, file)
+            os.replace(self._path("vectors.tmp.npy"), self._path("vectors.npy"))
+            os.replace(self._path("idf.tmp.npy"), self._path("idf.npy"))
+            os.replace(self._path("meta.json.tmp"), self._path("meta.json"))
+
+            self._matrix = np.load(self._path("vectors.npy"), mmap_mode="r")
+            self._idf = idf
+            self._rows = rows
+            self._docs = docs
+            self._pending = {}
+            self._removed = set()
+
+    def clear(self):
+        """Drop every vector and delete the index files (e.g. the account changed)"""
+        self._ensure_loaded()
+        with self._lock:
+            self._matrix = None
+            self._idf = None
+            self._rows = []
+            self._docs = {}
+            self._pending = {}
+            self._removed = set()
+            for name in ("vectors.npy", "idf.npy", "meta.json"):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+
+    def _to_drive_file(self, file_id: str) -> DriveFile:
+        """Rebuild a DriveFile from stored document metadata"""
+        return file_from_doc(file_id, self._docs[file_id])
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        passages_per_file: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> List[Tuple[DriveFile, float, List[Span]]]:
+        """
+        Find the files whose passages are most similar to a query
+
+        Args:
+            query: Raw query text
+            limit: Maximum files
+            passages_per_file: Maximum passage spans returned per file
+            min_score: Cosine similarity a passage needs to count
+
+        Returns:
+            List of (DriveFile, best passage similarity, spans best first),
+            best file first
+        """
+        self._ensure_loaded()
+        passages_per_file = passages_per_file or settings.passages_per_file
+        min_score = settings.vector_min_score if min_score is None else min_score
+        with self._lock:
+            matrix, idf, rows = self._matrix, self._idf, self._rows
+        if matrix is None or not rows:
+            return []
+        query_vector = np.asarray(self.embed_fn([query]), dtype=np.float32)[0] * idf
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return []
+        scores = matrix @ (query_vector / norm)
+        k = min(len(rows), limit * passages_per_file)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        by_file: Dict[str, List[Tuple[float, Span]]] = {}
+        for row in top:
+            score = float(scores[row])
+            if score < min_score:
+                break
+            file_id, start, end = rows[row]
+            hits = by_file.setdefault(file_id, [])
+            if len(hits) < passages_per_file:
+                hits.append((score, (start, end)))
+        ranked = sorted(by_file.items(), key=lambda item: item[1][0][0], reverse=True)[:limit]
+        with self._lock:
+            return [
+                (self._to_drive_file(file_id), hits[0][0], [span for _, span in hits])
+                for file_id, hits in ranked if file_id in self._docs
+            ]
+
+    def refresh(
+        self,
+        drive_service,
+        files: List[DriveFile],
+        complete: bool = True,
+        max_in_flight: Optional[int] = None
+    ) -> Dict:
+        """
+        Bring the index up to date with a listing (see refresh_index); only
+        new or modified files are embedded
+
+        Args:
+            drive_service: GoogleDriveService used to fetch text
+            files: Listed files
+            complete: Whether `files` is the whole indexed scope; if so, docs
+                not in it are removed
+            max_in_flight: Cap on concurrent downloads
+
+        Returns:
+            Dict with counts of indexed, removed and unchanged files
+        """
+        self._ensure_loaded()
+        result = refresh_index(self, drive_service, files, complete=complete, max_in_flight=max_in_flight)
+        result["passages"] = len(self._rows)
+        return result
+
+
+# Global vector index instance
+vector_index = VectorIndex(settings.vector_index_dir)
@@ -0,0 +1,95 @@
+"""
+Benchmark: compiled FileClassifier vs the rule loop FileSorter used before.
+
+Classifies --files synthetic file names (a mix of names matching the
+sorting rules, names matching several, and plain names, across MIME
+types) with the old per-file loop over SORTING_RULES and with
+FileClassifier.classify / classify_many, and checks the results are
+identical. Run from the backend directory:
+
+    python -m benchmarks.bench_classifier --files 100000
+"""
+from app.models.file_metadata import DriveFile
+from app.services.file_sorter import SORTING_RULES, file_classifier
+from typing import List
+import argparse
+import random
+import time
+
+
+RULE_WORDS = [
+    "blog_", "Article-", "post", "annual_report", "Year in Review", "summary_", "meeting summary",
+    "newsletter-", "monthly update", "sm_", "Instagram_", "tweet", "social media",
+]
+PLAIN_WORDS = ["IMG_", "DSC", "Budget", "Notes", "Draft", "Minutes", "Invoice", "Scan", "Board deck", "Program plan"]
+MIME_TYPES = [
+    "text/plain", "image/jpeg", "image/png", "video/mp4", "application/pdf", "application/zip",
+    "application/vnd.google-apps.document", "application/vnd.google-apps.spreadsheet",
+]
+
+
+def legacy_analyze(file: DriveFile) -> str:
+    """FileSorter.analyze_file before rules were compiled"""
+    file_name_lower = file.name.lower()
+    for rule_config in SORTING_RULES.values():
+        if 'mime_types' in rule_config:
+            if file.mime_type in rule_config['mime_types']:
+                return rule_config['folder']
+        if 'patterns' in rule_config:
+            for pattern in rule_config['patterns']:
+                if pattern.lower() in file_name_lower:
+                    return rule_config['folder']
+        if 'keywords' in rule_config:
+            for keyword in rule_config['keywords']:
+                if keyword.lower() in file_name_lower:
+                    return rule_config['folder']
+    return 'Unsorted'
+
+
+def synthetic_files(count: int, match_ratio: float) -> List[DriveFile]:
+    """Files whose names mix plain words with rule words about match_ratio of the time"""
+    rng = random.Random(42)
+    files = []
+    for i in range(count):
+        words = [rng.choice(PLAIN_WORDS) for _ in range(rng.randint(1, 3))]
+        while rng.random() < match_ratio:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(RULE_WORDS))
+        separator = rng.choice([" ", "_", "-", ""])
+        files.append(DriveFile(
+            id=f"f{i}", name=separator.join(words) + f"{rng.randint(0, 9999)}.txt", mime_type=rng.choice(MIME_TYPES)
+        ))
+    return files
+
+
+def timed(label: str, fn, files: List[DriveFile], baseline: float = 0.0):
+    """Run fn over files, print throughput and return (results, seconds)"""
+    started = time.perf_counter()
+    results = fn(files)
+    seconds = time.perf_counter() - started
+    speedup = f"  {baseline / seconds:4.1f}x" if baseline else ""
+    print(f"{label:<16} {seconds * 1000:8.1f} ms  {len(files) / seconds / 1000:8.0f}k files/s{speedup}")
+    return results, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--match-ratio", type=float, default=0.35, help="chance of adding each rule word")
+    args = parser.parse_args()
+
+    files = synthetic_files(args.files, args.match_ratio)
+    legacy, baseline = timed("legacy loop", lambda fs: [legacy_analyze(f) for f in fs], files)
+    single, _ = timed("classify", lambda fs: [file_classifier.classify(f.name, f.mime_type) for f in fs], files, baseline)
+    batch, _ = timed("classify_many", file_classifier.classify_many, files, baseline)
+
+    mismatches = sum(1 for a, b in zip(legacy, batch) if a != b)
+    assert single == batch, "classify and classify_many disagree"
+    assert mismatches == 0, f"{mismatches} files classified differently"
+    folders = {}
+    for folder in batch:
+        folders[folder] = folders.get(folder, 0) + 1
+    print(f"identical results for {len(files)} files: {dict(sorted(folders.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: the content pass for files no sorting rule places by name.
+
+Builds a fake Drive of --files text files with uninformative names whose
+contents read like newsletters, summaries, blog posts or nothing in
+particular (--kb kilobytes each), and sorts it:
+  * without the content pass (everything lands in Unsorted, as before)
+  * with the content pass scored inline (--workers 0)
+  * with the content pass scored in a --workers process pool
+Text downloads are served from the fake's contents after --latency
+seconds, on the sorter's download threads. Placements are checked against
+the label each file was generated with, the inline and pooled passes must
+agree, and a run with a tiny --budget must leave the rest pending. Run
+from the backend directory:
+
+    python -m benchmarks.bench_content_sort --files 400 --workers 2
+"""
+from app.config import settings
+from app.services.content_classifier import ContentClassifier
+from app.services.file_sorter import SORTING_RULES, FileSorter
+from app.services.google_drive import GoogleDriveService
+from benchmarks.bench_sort_batch import NO_LIMIT, fresh_stores, unsynced_snapshot
+from benchmarks.fake_drive import FakeDriveV3
+import argparse
+import random
+import time
+
+
+VOCABULARY = {
+    "Newsletters": ["newsletter", "monthly update", "community update", "upcoming events", "volunteers"],
+    "Summaries": ["summary", "executive summary", "meeting summary", "action items", "attendees"],
+    "Blog Posts": ["blog", "article", "post", "readers", "comments"],
+    "Unsorted": ["budget", "receipt", "inventory", "schedule", "contact"],
+}
+FILLER = "the of and program youth center school families staff week plan grant".split()
+
+
+def build_drive(files: int, kb: int) -> (FakeDriveV3, dict):
+    """Fake Drive of rule-less names with labelled contents; returns (fake, file_id -> label)"""
+    rng = random.Random(7)
+    fake = FakeDriveV3()
+    labels = {}
+    for i in range(files):
+        label = rng.choice(list(VOCABULARY))
+        words, length = [], 0
+        while length < kb * 1024:
+            words.append(rng.choice(VOCABULARY[label]) if rng.random() < 0.02 else rng.choice(FILLER))
+            length += len(words[-1]) + 1
+        file_id = fake.add_file(f"Document {i}.txt", content=" ".join(words))
+        labels[file_id] = label
+    return fake, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--kb", type=int, default=32, help="text per file")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds per text download")
+    parser.add_argument("--budget", type=float, default=0.05, help="seconds for the over-budget run")
+    args = parser.parse_args()
+
+    def sort(label: str, workers, sniff: bool, budget: float = 600.0) -> dict:
+        fake, labels = build_drive(args.files, args.kb)
+        drive_service = GoogleDriveService(None, service=fake, limiter=NO_LIMIT)
+
+        def get_file_text(file, max_bytes=None):
+            time.sleep(args.latency)
+            return fake.contents[file.id][:max_bytes]
+
+        drive_service.get_file_text = get_file_text
+        sorter = FileSorter(drive_service, snapshot=unsynced_snapshot(), **fresh_stores())
+        if workers is not None:
+            sorter.content_classifier = ContentClassifier(
+                SORTING_RULES, max_workers=workers, max_chars=settings.sort_sniff_max_bytes,
+                min_score=settings.sort_sniff_min_score, timeout=settings.sort_sniff_timeout
+            )
+            # The server keeps its pool; don't time worker start-up
+            sorter.content_classifier.classify("warm up")
+        settings.sort_sniff_budget = budget
+        started = time.perf_counter()
+        plan = sorter.plan_sort(sniff_content=sniff)
+        seconds = time.perf_counter() - started
+        if workers:
+            sorter.content_classifier.shutdown()
+        placed = {m["id"]: m["target_folder"] for m in plan["moves"]}
+        correct = sum(1 for file_id, folder in placed.items() if labels[file_id] == folder)
+        pending = len(plan["checkpoint"]["unplaced"])
+        print(
+            f"{label:<22} {seconds:6.2f} s  {correct:4d}/{len(labels)} placed as labelled  "
+            f"{sum(1 for f in placed.values() if f != 'Unsorted'):4d} out of Unsorted  {pending:4d} pending"
+        )
+        return placed
+
+    sort("names only", None, sniff=False)
+    inline = sort("content, inline", 0, sniff=True)
+    pooled = sort(f"content, {args.workers} processes", args.workers, sniff=True)
+    assert inline == pooled, "inline and pooled content passes disagree"
+    sort(f"content, {args.budget}s budget", args.workers, sniff=True, budget=args.budget)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: bytes transferred and peak memory when reading large Drive files.
+
+A real googleapiclient Drive resource is pointed at an in-process HTTP
+stub that serves ranged media requests from an in-memory blob of
+--size-mb megabytes. For a large text file, a large video and an
+oversized PDF, compares:
+  * downloading the whole file with MediaIoBaseDownload and decoding it,
+    as get_file_content used to
+  * get_file_content now (ranged download up to the byte ceiling, and no
+    download at all for types that can't produce text); the PDF is read
+    with its listed size (rejected up front) and without one (cut off at
+    the extraction cap)
+Peak memory is measured with tracemalloc. Run from the backend directory:
+
+    python -m benchmarks.bench_download_bounds --size-mb 64
+"""
+from app.services.content_cache import content_cache
+from app.services.drive_quota import DriveRateLimiter
+from app.services.google_drive import GoogleDriveService
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+from datetime import datetime, timezone
+import argparse
+import httplib2
+import io
+import re
+import tempfile
+import time
+import tracemalloc
+
+
+class RangeHttp:
+    """httplib2 stand-in serving Range requests from one blob"""
+
+    def __init__(self, blob: bytes):
+        self.blob = blob
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def request(self, uri, method="GET", body=None, headers=None, **_):
+        self.requests += 1
+        start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", headers["range"]).groups())
+        part = self.blob[start:end + 1]
+        self.bytes_sent += len(part)
+        return httplib2.Response({
+            "status": "206",
+            "content-range": f"bytes {start}-{start + len(part) - 1}/{len(self.blob)}",
+            "content-length": str(len(part)),
+        }), part
+
+
+def measure(label: str, fn, http: RangeHttp):
+    """Run fn, printing wall time, requests, bytes transferred and peak traced memory"""
+    http.requests = http.bytes_sent = 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    chars = len(result) if result is not None else None
+    print(
+        f"{label:<26} {seconds * 1000:8.1f} ms  {http.requests:3d} requests  "
+        f"{http.bytes_sent / 2**20:7.1f} MiB sent  {peak / 2**20:7.1f} MiB peak  {chars} chars"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    args = parser.parse_args()
+
+    blob = b"Black Creek youth program update, volunteers and events.\n" * (args.size_mb * 2**20 // 58)
+    http = RangeHttp(blob)
+    # The stub is the transport; no credentials or network are involved
+    resource = build("drive", "v3", http=httplib2.Http(), static_discovery=True)
+    drive_service = GoogleDriveService(
+        None, service=resource, limiter=DriveRateLimiter(rate=0, burst=1, max_retries=0, backoff_base=0, backoff_max=0)
+    )
+    drive_service._http = lambda: http
+    content_cache.cache_dir = tempfile.mkdtemp(prefix="bench_download_")
+    modified = datetime.now(timezone.utc)  # listing metadata, so no files.get is needed
+
+    def download_whole():
+        request = resource.files().get_media(fileId="big")
+        request.http = http
+        buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(buffer, request)
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+        return buffer.getvalue().decode("utf-8", errors="ignore")
+
+    size = len(blob)
+    measure("text, whole file", download_whole, http)
+    measure("text, bounded", lambda: drive_service.get_file_content("big", "text/plain", modified, size), http)
+    measure("video, whole file", download_whole, http)
+    measure("video, bounded", lambda: drive_service.get_file_content("big", "video/mp4", modified, size), http)
+    # A file ID of its own: "big" is in the content cache from the text row
+    measure(
+        "pdf over cap, listed size",
+        lambda: drive_service.get_file_content("big-pdf", "application/pdf", modified, size), http
+    )
+    measure(
+        "pdf over cap, size unknown",
+        lambda: drive_service.get_file_content("big-pdf", "application/pdf", modified, None), http
+    )
+
+
+if __name__ == "__main__":
+    main()
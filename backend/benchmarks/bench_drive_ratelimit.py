@@ -0,0 +1,66 @@
+"""
+Benchmark: a burst of fullText searches against a per-user quota.
+
+The fake Drive refuses requests beyond --quota per second with 403
+userRateLimitExceeded, as Drive does. The same burst of concurrent
+list_files_by_content calls runs:
+  * with no limiter and no retries (each rejected search came back empty)
+  * through DriveRateLimiter (token bucket, adaptive rate, jittered backoff)
+Per-burst API usage is counted with DriveRateLimiter.track. Run from the
+backend directory:
+
+    python -m benchmarks.bench_drive_ratelimit --searches 60 --quota 20
+"""
+from app.services.drive_quota import DriveRateLimiter, DriveUsage
+from app.services.executor import propagate_context
+from app.services.google_drive import GoogleDriveService
+from benchmarks.fake_drive import FakeDriveV3
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+
+
+WORDS = ["budget", "youth", "gala", "volunteer", "grant", "league", "camp", "donor", "tournament", "mentor"]
+
+
+def run_burst(fake: FakeDriveV3, limiter: DriveRateLimiter, searches: int, workers: int):
+    """Run `searches` concurrent fullText searches; return (empty results, seconds, usage)"""
+    drive_service = GoogleDriveService(None, service=fake, limiter=limiter)
+    fake.rejected = 0
+    usage = DriveUsage()
+    started = time.perf_counter()
+    with limiter.track(usage):
+        search = propagate_context(lambda i: drive_service.list_files_by_content(WORDS[i % len(WORDS)]))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(search, range(searches)))
+    seconds = time.perf_counter() - started
+    return sum(1 for files in results if not files), seconds, usage.as_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=12)
+    parser.add_argument("--quota", type=float, default=20, help="requests per second the fake Drive accepts")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per fake API request")
+    args = parser.parse_args()
+
+    fake = FakeDriveV3()
+    for i in range(200):
+        fake.add_file(f"doc_{i}.txt", content=f"{WORDS[i % len(WORDS)]} report {i}")
+    fake.latency = args.latency
+    fake.quota_per_second = args.quota
+
+    unlimited = DriveRateLimiter(rate=0, burst=1, max_retries=0, backoff_base=0, backoff_max=0)
+    empty, seconds, usage = run_burst(fake, unlimited, args.searches, args.workers)
+    print(f"no limiter:   {seconds:6.2f} s  {empty:3d}/{args.searches} empty  {fake.rejected:3d} rejected  {usage}")
+
+    # Configured above the quota, so the adaptive rate has to find it
+    limiter = DriveRateLimiter(rate=args.quota * 2, burst=int(args.quota), max_retries=5, backoff_base=0.25, backoff_max=4)
+    empty, seconds, usage = run_burst(fake, limiter, args.searches, args.workers)
+    print(f"rate limited: {seconds:6.2f} s  {empty:3d}/{args.searches} empty  {fake.rejected:3d} rejected  {usage}")
+    print(f"limiter: {limiter.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: per-request Drive client setup vs the shared service pool.
+
+Compares, per request:
+  * building a GoogleDriveService (static discovery document) every time,
+    as the routes used to, against DriveServicePool.get
+  * reading and parsing the OAuth token file every time against the
+    cached get_oauth_credentials
+No network is used: the credentials carry a fake, non-expired access token.
+Run from the backend directory:
+
+    python -m benchmarks.bench_drive_setup --requests 200
+"""
+from app.api.routes import drive as drive_routes
+from app.services.drive_pool import DriveServicePool
+from app.services.google_drive import GoogleDriveService
+from app.utils.auth import GoogleAuthHandler
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+TOKEN_DATA = {
+    "token": "fake-access-token",
+    "refresh_token": "fake-refresh-token",
+    "token_uri": "https://oauth2.googleapis.com/token",
+    "client_id": "bench-client",
+    "client_secret": "bench-secret",
+    "scopes": ["https://www.googleapis.com/auth/drive"],
+}
+
+
+def per_request(label: str, fn, requests: int):
+    """Call fn `requests` times and print the mean cost"""
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    seconds = time.perf_counter() - started
+    print(f"{label:<28} {seconds * 1000 / requests:8.3f} ms/request  ({seconds * 1000:8.1f} ms total)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    credentials_file = os.path.join(tempfile.mkdtemp(prefix="bench_setup_"), "drive_credentials.json")
+    with open(credentials_file, "w") as f:
+        json.dump({"token_data": TOKEN_DATA}, f)
+    drive_routes.CREDENTIALS_FILE = credentials_file
+
+    def load_uncached():
+        with open(credentials_file, "r") as f:
+            data = json.load(f)
+        return GoogleAuthHandler.create_credentials_from_token(data["token_data"])
+
+    credentials = load_uncached()
+    pool = DriveServicePool()
+
+    per_request("build service", lambda: GoogleDriveService(credentials), args.requests)
+    per_request("pooled service", lambda: pool.get(credentials), args.requests)
+    per_request("load credentials", load_uncached, args.requests)
+    per_request("cached credentials", drive_routes.get_oauth_credentials, args.requests)
+    per_request(
+        "credentials + service (new)",
+        lambda: drive_routes.get_drive_service(drive_routes.get_oauth_credentials()),
+        args.requests
+    )
+    print(f"pool: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
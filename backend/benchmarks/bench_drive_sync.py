@@ -0,0 +1,82 @@
+"""
+Benchmark: Drive metadata via the sync snapshot vs listing Drive per request.
+
+Builds a fake Drive (root files plus folders of files), then compares:
+  * listing root + subfolders from Drive, as every chat turn used to
+  * a concurrent breadth-first crawl of the same tree
+  * a full crawl, then incremental syncs after a few edits
+  * reading the same listing from the local snapshot
+Each fake API request sleeps --latency seconds. Run from the backend directory:
+
+    python -m benchmarks.bench_drive_sync --folders 20 --files-per-folder 50
+"""
+from app.services.drive_sync import DriveSyncEngine
+from app.services.drive_tree import DriveTreeCrawler
+from app.services.duplicates import DuplicateIndex
+from app.services.google_drive import GoogleDriveService
+from benchmarks.fake_drive import FOLDER_MIME_TYPE, FakeDriveV3
+import argparse
+import os
+import tempfile
+import time
+
+
+def timed(fn, *args):
+    """Run fn and return (result, seconds)"""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folders", type=int, default=20)
+    parser.add_argument("--files-per-folder", type=int, default=50)
+    parser.add_argument("--edits", type=int, default=10, help="files changed between syncs")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per fake API request")
+    args = parser.parse_args()
+
+    fake = FakeDriveV3()
+    for i in range(args.folders):
+        folder_id = fake.add_file(f"Folder {i}", FOLDER_MIME_TYPE)
+        for j in range(args.files_per_folder):
+            fake.add_file(f"report_{i}_{j}.txt", parent=folder_id, content=f"report {i} {j}")
+    root_files = [fake.add_file(f"note_{k}.txt", content="note") for k in range(args.edits)]
+    fake.latency = args.latency
+    drive_service = GoogleDriveService(None, service=fake)
+    workdir = tempfile.mkdtemp(prefix="bench_sync_")
+    engine = DriveSyncEngine(
+        os.path.join(workdir, "snapshot.json"), duplicates=DuplicateIndex(os.path.join(workdir, "duplicates.json"))
+    )
+
+    fake.calls.clear()
+    listed, seconds = timed(drive_service.list_root_and_subfolder_files)
+    print(f"list from Drive:     {seconds * 1000:8.1f} ms  {sum(fake.calls.values()):4d} requests  {len(listed)} files")
+
+    fake.calls.clear()
+    (crawled, _), seconds = timed(DriveTreeCrawler(max_depth=2, max_in_flight=6, ttl=0).crawl, drive_service)
+    print(f"tree crawl:          {seconds * 1000:8.1f} ms  {sum(fake.calls.values()):4d} requests  {len(crawled)} files")
+
+    fake.calls.clear()
+    stats, seconds = timed(engine.sync, drive_service)
+    print(f"full sync:           {seconds * 1000:8.1f} ms  {sum(fake.calls.values()):4d} requests  {stats}")
+
+    for file_id in root_files:
+        fake.modify_file(file_id, content="edited")
+    fake.trash_file(root_files[0])
+    fake.calls.clear()
+    stats, seconds = timed(engine.sync, drive_service)
+    print(f"incremental sync:    {seconds * 1000:8.1f} ms  {sum(fake.calls.values()):4d} requests  {stats}")
+
+    fake.calls.clear()
+    local, seconds = timed(engine.list_tree_files, 2)
+    print(f"list from snapshot:  {seconds * 1000:8.1f} ms  {sum(fake.calls.values()):4d} requests  {len(local)} files")
+
+    # Everything here sits at the root or one folder down, so the tree should
+    # be every (non-trashed) file in Drive
+    files = {f.id for f in drive_service.iter_files(page_size=1000) if f.mime_type != FOLDER_MIME_TYPE}
+    assert {f.id for f in local} == files, "snapshot disagrees with Drive"
+
+
+if __name__ == "__main__":
+    main()
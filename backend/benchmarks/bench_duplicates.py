@@ -0,0 +1,136 @@
+"""
+Benchmark: duplicate files (same md5Checksum and size) in sorting and retrieval.
+
+Builds a fake Drive of --originals newsletters, the first --duplicated of
+which also have --copies uploaded right after them (same content), and:
+  * sorts it with duplicates=report, skip and quarantine, printing moves,
+    copies skipped or moved to Duplicates, and the clusters reported
+  * adds one more copy and checks an incremental sort recognizes it from
+    the index alone
+  * retrieves context for a newsletter query deduplicating candidates by
+    file ID only (as before) and by content, printing downloads and
+    distinct documents returned
+Text downloads sleep --latency seconds. Run from the backend directory:
+
+    python -m benchmarks.bench_duplicates --originals 200 --duplicated 50
+"""
+from app.services.context_retriever import ContextRetriever
+from app.services.drive_tree import DriveTreeCrawler
+from app.services.duplicates import DUPLICATES_FOLDER, DuplicateIndex
+from app.services.file_sorter import FileSorter
+from app.services.google_drive import GoogleDriveService
+from app.services.search_index import DriveSearchIndex
+from app.services.vector_index import VectorIndex
+from benchmarks.bench_sort_batch import NO_LIMIT, fresh_stores, unsynced_snapshot
+from benchmarks.fake_drive import FakeDriveV3
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+
+def build_drive(originals: int, duplicated: int, copies: int) -> (FakeDriveV3, dict):
+    """Fake Drive with copies uploaded right after their originals; returns (fake, copy ID -> original ID)"""
+    fake = FakeDriveV3()
+    copy_of = {}
+    for i in range(originals):
+        content = f"Newsletter {i}: monthly update for the community, issue {i}."
+        original = fake.add_file(f"newsletter_{i}.txt", content=content)
+        for n in range(copies if i < duplicated else 0):
+            copy_of[fake.add_file(f"newsletter_{i} ({n + 1}).txt", content=content)] = original
+    return fake, copy_of
+
+
+class FileIdsOnly(DuplicateIndex):
+    """Retrieval before the duplicate index: candidates deduplicated by file ID only"""
+
+    def cluster_key(self, file):
+        return None
+
+    def canonical_file(self, file):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--originals", type=int, default=200)
+    parser.add_argument("--duplicated", type=int, default=50, help="originals that have copies")
+    parser.add_argument("--copies", type=int, default=2, help="copies of each duplicated original")
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per text download")
+    args = parser.parse_args()
+
+    for mode in ("report", "skip", "quarantine"):
+        fake, copy_of = build_drive(args.originals, args.duplicated, args.copies)
+        stores = fresh_stores()
+        sorter = FileSorter(
+            GoogleDriveService(None, service=fake, limiter=NO_LIMIT), snapshot=unsynced_snapshot(), **stores
+        )
+        result = sorter.sort_all_files(duplicates=mode)
+        skipped = sum(1 for s in result["skipped"] if s["reason"].startswith("duplicate of"))
+        quarantined = sum(1 for s in result["sorted"] if s["target_folder"] == DUPLICATES_FOLDER)
+        print(
+            f"{mode:<11} {len(result['sorted']):5d} moved  {skipped:5d} copies skipped  "
+            f"{quarantined:5d} copies to {DUPLICATES_FOLDER}  {len(result['duplicates']):4d} clusters"
+        )
+        assert len(result["duplicates"]) == args.duplicated
+        assert all(
+            copy_of[copy["id"]] == cluster["canonical"]["id"]
+            for cluster in result["duplicates"] for copy in cluster["copies"]
+        ), "canonical copy is not the original upload"
+        if mode == "skip":
+            assert skipped == len(copy_of) and len(result["sorted"]) == args.originals
+            # A copy uploaded later is recognized by an incremental sort that only sees it
+            original = next(iter(copy_of.values()))
+            late = fake.add_file("newsletter_0 (final).txt", content=fake.contents[original])
+            again = FileSorter(
+                GoogleDriveService(None, service=fake, limiter=NO_LIMIT), snapshot=unsynced_snapshot(), **stores
+            ).sort_all_files(duplicates=mode)
+            # (the first sort's own moves come back as changes and are skipped as previously sorted)
+            copies_skipped = [s["id"] for s in again["skipped"] if s["reason"].startswith("duplicate of")]
+            assert again["mode"] == "incremental" and copies_skipped == [late] and not again["sorted"]
+            print("            incremental sort skipped a new copy from the index alone")
+        elif mode == "quarantine":
+            assert quarantined == len(copy_of) and len(result["sorted"]) == args.originals + len(copy_of)
+
+    # Retrieval: every copy ranks like its original, so without the index they crowd out other files
+    fake, copy_of = build_drive(args.originals, args.duplicated, args.copies)
+    drive_service = GoogleDriveService(None, service=fake, limiter=NO_LIMIT)
+    downloads = []
+    lock = threading.Lock()
+
+    def get_file_text(file, max_bytes=None):
+        time.sleep(args.latency)
+        with lock:
+            downloads.append(file.id)
+        return fake.contents[file.id][:max_bytes]
+
+    drive_service.get_file_text = get_file_text
+    workdir = tempfile.mkdtemp(prefix="bench_duplicates_")
+    indexed = DuplicateIndex(os.path.join(workdir, "duplicates.json"))
+    indexed.observe(drive_service.iter_files())
+    for label, duplicates in (
+        ("by file ID", FileIdsOnly(os.path.join(workdir, "unused.json"))),
+        ("by content", indexed),
+    ):
+        retriever = ContextRetriever(
+            drive_service,
+            index=DriveSearchIndex(os.path.join(workdir, f"{label}.index.json")),
+            vectors=VectorIndex(os.path.join(workdir, f"{label}.vectors")),
+            snapshot=unsynced_snapshot(),
+            tree=DriveTreeCrawler(max_depth=1, max_in_flight=4, ttl=0),
+            duplicates=duplicates
+        )
+        downloads.clear()
+        started = time.perf_counter()
+        context = retriever.get_relevant_files("newsletter", "the latest newsletter", max_files=10)
+        seconds = time.perf_counter() - started
+        distinct = len({entry["content"] for entry in context})
+        print(
+            f"{label:<14} {seconds * 1000:7.1f} ms  {len(downloads):3d} downloads  "
+            f"{len(context):3d} files  {distinct:3d} distinct documents"
+        )
+
+
+if __name__ == "__main__":
+    main()
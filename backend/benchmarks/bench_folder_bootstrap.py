@@ -0,0 +1,86 @@
+"""
+Benchmark: resolving the sorted-folder layout before a sort.
+
+On a fake Drive where no sorted folders exist yet (cold) and where they
+all exist (existing), compares:
+  * a get_or_create_folder call per folder, as create_folder_structure
+    used to (a name query, plus a create when missing)
+  * create_folder_structure now: one folder listing under the parent and
+    one batch of creates, or nothing once the folder map is persisted
+Then deletes a sorted folder, sorts, and checks the failed move drops the
+persisted map so the next sort recreates the folder. Each fake round trip
+sleeps --latency seconds. Run from the backend directory:
+
+    python -m benchmarks.bench_folder_bootstrap --latency 0.05
+"""
+from app.services.duplicates import DuplicateIndex
+from app.services.file_sorter import SORTING_RULES, FileSorter
+from app.services.folder_map import FolderMapStore
+from app.services.google_drive import GoogleDriveService
+from app.services.sort_checkpoint import SortCheckpointStore
+from benchmarks.bench_sort_batch import NO_LIMIT, unsynced_snapshot
+from benchmarks.fake_drive import FakeDriveV3
+import argparse
+import os
+import tempfile
+import time
+
+
+def measure(label: str, fake: FakeDriveV3, fn) -> dict:
+    """Run fn against the fake and print wall time and Drive calls"""
+    fake.calls.clear()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    print(f"{label:<28} {seconds * 1000:8.1f} ms  {sum(fake.calls.values()):3d} calls  {fake.calls}")
+    return result
+
+
+def legacy_structure(drive_service: GoogleDriveService) -> dict:
+    """create_folder_structure before the single-listing bootstrap"""
+    folders = sorted({rule["folder"] for rule in SORTING_RULES.values()} | {"Unsorted"})
+    return {name: drive_service.get_or_create_folder(name) for name in folders}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake round trip")
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix="bench_folders_")
+
+    def sorter_for(fake: FakeDriveV3, name: str) -> FileSorter:
+        return FileSorter(
+            GoogleDriveService(None, service=fake, limiter=NO_LIMIT),
+            snapshot=unsynced_snapshot(),
+            checkpoints=SortCheckpointStore(os.path.join(workdir, f"{name}.checkpoint.json")),
+            folder_maps=FolderMapStore(os.path.join(workdir, f"{name}.folders.json")),
+            duplicates=DuplicateIndex(os.path.join(workdir, f"{name}.duplicates.json"))
+        )
+
+    fake = FakeDriveV3(latency=args.latency)
+    drive_service = GoogleDriveService(None, service=fake, limiter=NO_LIMIT)
+    legacy = measure("per folder, cold", fake, lambda: legacy_structure(drive_service))
+    measure("per folder, existing", fake, lambda: legacy_structure(drive_service))
+
+    fake = FakeDriveV3(latency=args.latency)
+    sorter = sorter_for(fake, "new")
+    created = measure("listing + batch, cold", fake, sorter.create_folder_structure)
+    measure("listing, existing", fake, lambda: sorter_for(fake, "other").create_folder_structure())
+    warm = measure("folder map, other process", fake, lambda: sorter_for(fake, "new").create_folder_structure())
+    assert created.keys() == legacy.keys() and warm == created, "folder layouts differ"
+
+    # A deleted sorted folder: the failed move invalidates the map, the next sort recreates it
+    fake.latency = 0
+    blog = fake.add_file("blog_welcome.txt")
+    fake.delete_file(created["Blog Posts"])
+    failed = sorter_for(fake, "new").sort_all_files()
+    assert [f["id"] for f in failed["failed"]] == [blog], failed["failed"]
+    retried = sorter_for(fake, "new").sort_all_files()
+    assert [s["id"] for s in retried["sorted"]] == [blog], retried
+    new_folder = sorter_for(fake, "new").create_folder_structure()["Blog Posts"]
+    assert new_folder != created["Blog Posts"] and fake.files_by_id[blog]["parents"] == [new_folder]
+    print("deleted folder: move failed, map invalidated, folder recreated and file moved on the next sort")
+
+
+if __name__ == "__main__":
+    main()
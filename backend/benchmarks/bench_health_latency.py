@@ -0,0 +1,96 @@
+"""
+Benchmark: /health latency while N chats are generating.
+
+Gemini and Drive are replaced by fakes that block their thread for a fixed
+time, which is what the real googleapiclient / genai calls do. Run from the
+backend directory:
+
+    python -m benchmarks.bench_health_latency --chats 8 --generation-seconds 2
+    python -m benchmarks.bench_health_latency --inline   # old behaviour: blocking calls on the event loop
+"""
+from app.main import app
+from app.api.routes import chat
+from app.services import executor
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+
+class FakeGemini:
+    """Stands in for GeminiClient; blocks like a real generation"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def generate_with_retry(self, prompt: str) -> str:
+        time.sleep(self.seconds)
+        return "generated"
+
+    async def generate_with_retry_async(self, prompt: str) -> str:
+        return await executor.gemini_executor.run(self.generate_with_retry, prompt)
+
+
+async def run_inline(fn, *args, **kwargs):
+    """Pre-executor behaviour: call the blocking function on the event loop"""
+    return fn(*args, **kwargs)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=8, help="concurrent generating chats")
+    parser.add_argument("--generation-seconds", type=float, default=2.0)
+    parser.add_argument("--probes", type=int, default=40, help="number of /health requests")
+    parser.add_argument("--inline", action="store_true", help="run blocking calls on the event loop")
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.generation_seconds)
+    if args.inline:
+        executor.drive_executor.run = run_inline
+        executor.gemini_executor.run = run_inline
+    app.dependency_overrides[chat.get_gemini_client] = lambda: fake
+    os.chdir(tempfile.mkdtemp(prefix="bench_health_"))
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            chat_ids = [
+                (await client.post("/api/chat/create", json={"content_type": "general"})).json()["chat_id"]
+                for _ in range(args.chats)
+            ]
+
+            async def probe_health():
+                # Probes run on a fixed schedule; latency counts from the scheduled
+                # time, so time spent waiting for a blocked event loop is included
+                interval = args.generation_seconds / args.probes
+                first = time.perf_counter() + 0.05
+                latencies = []
+                for i in range(args.probes):
+                    scheduled = first + i * interval
+                    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                    await client.get("/health")
+                    latencies.append((time.perf_counter() - scheduled) * 1000)
+                return latencies
+
+            sends = [
+                client.post(f"/api/chat/{chat_id}/message", json={"message": "benchmark"}, timeout=None)
+                for chat_id in chat_ids
+            ]
+            results = await asyncio.gather(probe_health(), *sends)
+            latencies = sorted(results[0])
+            metrics = (await client.get("/metrics")).json()
+
+    mode = "inline (event loop)" if args.inline else "thread pool"
+    print(f"mode: {mode}, chats generating: {args.chats}, generation: {args.generation_seconds}s")
+    print(f"/health p50={statistics.median(latencies):.1f}ms "
+          f"p95={latencies[int(0.95 * (len(latencies) - 1))]:.1f}ms max={latencies[-1]:.1f}ms")
+    if not args.inline:
+        print(f"gemini pool: {metrics['executors']['gemini']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark: sorting with one move per request vs batched moves.
+
+Sorts the same fake Drive twice: once moving files one at a time (a
+files().get for parents plus a files().update each, as before) and once
+through FileSorter's batched path. Each fake round trip, including a whole
+batch, sleeps --latency seconds. Run from the backend directory:
+
+    python -m benchmarks.bench_sort_batch --files 1000
+"""
+from app.services.drive_quota import DriveRateLimiter
+from app.services.drive_sync import DriveSyncEngine
+from app.services.duplicates import DuplicateIndex
+from app.services.file_sorter import FileSorter
+from app.services.google_drive import GoogleDriveService
+from app.services.folder_map import FolderMapStore
+from app.services.sort_checkpoint import SortCheckpointStore
+from benchmarks.fake_drive import FakeDriveV3
+import argparse
+import os
+import tempfile
+import time
+
+
+# Round trips are what's compared here, so the client-side quota limiter is off
+NO_LIMIT = DriveRateLimiter(rate=0, burst=1, max_retries=0, backoff_base=0, backoff_max=0)
+
+PREFIXES = ["blog_", "newsletter_", "summary_", "sm_", "annual_report_", "misc_"]
+
+
+def build_drive(files: int, latency: float) -> FakeDriveV3:
+    """Fake Drive with `files` unsorted files at the root"""
+    fake = FakeDriveV3()
+    for i in range(files):
+        fake.add_file(f"{PREFIXES[i % len(PREFIXES)]}{i}.txt", content=str(i))
+    fake.latency = latency
+    return fake
+
+
+def unsynced_snapshot() -> DriveSyncEngine:
+    """Empty snapshot, so the sorter lists from the fake Drive"""
+    return DriveSyncEngine(os.path.join(tempfile.mkdtemp(prefix="bench_sort_"), "snapshot.json"))
+
+
+def fresh_stores() -> dict:
+    """Empty checkpoint, folder map and duplicate stores, so every run starts cold"""
+    workdir = tempfile.mkdtemp(prefix="bench_sort_")
+    return {
+        "checkpoints": SortCheckpointStore(os.path.join(workdir, "checkpoint.json")),
+        "folder_maps": FolderMapStore(os.path.join(workdir, "folders.json")),
+        "duplicates": DuplicateIndex(os.path.join(workdir, "duplicates.json")),
+    }
+
+
+def sort_one_by_one(drive_service: GoogleDriveService) -> int:
+    """Pre-batching behaviour: list, then get parents and update per file"""
+    sorter = FileSorter(drive_service, snapshot=unsynced_snapshot(), **fresh_stores())
+    folder_map = sorter.create_folder_structure()
+    moved = 0
+    for file in drive_service.list_files(page_size=1000):
+        if file.mime_type == "application/vnd.google-apps.folder":
+            continue
+        target = sorter.analyze_file(file)
+        if target in folder_map and drive_service.move_file(file.id, folder_map[target]):
+            moved += 1
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per fake round trip")
+    args = parser.parse_args()
+
+    fake = build_drive(args.files, args.latency)
+    started = time.perf_counter()
+    moved = sort_one_by_one(GoogleDriveService(None, service=fake, limiter=NO_LIMIT))
+    print(f"one by one: {time.perf_counter() - started:7.2f} s  {sum(fake.calls.values()):5d} round trips  {moved} moved")
+
+    fake = build_drive(args.files, args.latency)
+    sorter = FileSorter(
+        GoogleDriveService(None, service=fake, limiter=NO_LIMIT),
+        snapshot=unsynced_snapshot(),
+        **fresh_stores()
+    )
+    started = time.perf_counter()
+    result = sorter.sort_all_files()
+    trips = sum(n for method, n in fake.calls.items() if method in ("batch", "files.list", "files.create"))
+    print(f"batched:    {time.perf_counter() - started:7.2f} s  {trips:5d} round trips  {len(result['sorted'])} moved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+In-process fake of the Drive v3 endpoints the backend uses.
+
+FakeDriveV3 mimics the googleapiclient resource shape
+(service.files().list(...).execute()), so it can be passed straight to
+GoogleDriveService(None, service=FakeDriveV3(...)). It supports files
+list/get/create/update, changes getStartPageToken/list, pagination and
+batch requests, records every call and can add a fixed latency per round
+trip to imitate the network. Setting quota_per_second makes requests over
+that rate fail with 403 userRateLimitExceeded, like Drive's per-user quota. Mutation helpers (add_file, modify_file, trash_file, move_file)
+append to the change log the Changes API replays.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+import hashlib
+import itertools
+import threading
+import time
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+class FakeHttpError(Exception):
+    """Stands in for googleapiclient.errors.HttpError (exposes resp.status)"""
+
+    def __init__(self, status: int, message: str = "", reason: Optional[str] = None):
+        super().__init__(f"{status} {message}")
+        self.resp = type("Resp", (), {"status": status})()
+        self.status_code = status
+        self.reason = reason
+
+
+class FakeRequest:
+    """A lazily executed API call, like googleapiclient.http.HttpRequest"""
+
+    def __init__(self, drive: "FakeDriveV3", method: str, fn: Callable[[], Dict]):
+        self.drive = drive
+        self.method = method
+        self.fn = fn
+        self.http = None
+
+    def execute(self, http=None, num_retries: int = 0) -> Dict:
+        return self.drive._call(self.method, self.fn)
+
+
+class FakeBatch:
+    """Like googleapiclient.http.BatchHttpRequest: many calls, one round trip"""
+
+    MAX_CALLS = 100
+
+    def __init__(self, drive: "FakeDriveV3", callback: Optional[Callable] = None):
+        self.drive = drive
+        self.callback = callback
+        self.requests: List = []
+
+    def add(self, request: FakeRequest, callback: Optional[Callable] = None, request_id: Optional[str] = None):
+        if len(self.requests) >= self.MAX_CALLS:
+            raise ValueError("Exceeded maximum number of calls in a batch")
+        self.requests.append((request, callback or self.callback, request_id or str(len(self.requests))))
+
+    def execute(self, http=None):
+        def run():
+            outcomes = []
+            for request, callback, request_id in self.requests:
+                self.drive.calls[request.method] = self.drive.calls.get(request.method, 0) + 1
+                try:
+                    outcomes.append((callback, request_id, request.fn(), None))
+                except FakeHttpError as e:
+                    outcomes.append((callback, request_id, None, e))
+            return outcomes
+
+        for callback, request_id, response, error in self.drive._call("batch", run):
+            if callback:
+                callback(request_id, response, error)
+
+
+class _Files:
+    def __init__(self, drive: "FakeDriveV3"):
+        self.drive = drive
+
+    def list(self, q: str = "", pageSize: int = 100, pageToken: Optional[str] = None, fields: str = "", **_):
+        return FakeRequest(self.drive, "files.list", lambda: self.drive._list(q, pageSize, pageToken))
+
+    def get(self, fileId: str, fields: str = "", **_):
+        return FakeRequest(self.drive, "files.get", lambda: self.drive._get(fileId))
+
+    def create(self, body: Dict, fields: str = "", **_):
+        return FakeRequest(self.drive, "files.create", lambda: self.drive._create(body))
+
+    def update(self, fileId: str, addParents: str = "", removeParents: str = "", fields: str = "", **_):
+        return FakeRequest(
+            self.drive, "files.update", lambda: self.drive._update(fileId, addParents, removeParents)
+        )
+
+
+class _Changes:
+    def __init__(self, drive: "FakeDriveV3"):
+        self.drive = drive
+
+    def getStartPageToken(self, **_):
+        return FakeRequest(
+            self.drive, "changes.getStartPageToken",
+            lambda: {"startPageToken": str(len(self.drive.change_log))}
+        )
+
+    def list(self, pageToken: str, pageSize: int = 100, **_):
+        return FakeRequest(self.drive, "changes.list", lambda: self.drive._changes(pageToken, pageSize))
+
+
+class FakeDriveV3:
+    """In-memory Drive with a root folder, a change log and call accounting"""
+
+    ROOT_ID = "root-folder-id"
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Args:
+            latency: Seconds each request sleeps, to imitate a network round trip
+        """
+        self.latency = latency
+        self.files_by_id: Dict[str, Dict] = {}
+        self.contents: Dict[str, str] = {}
+        self.change_log: List[str] = []  # file IDs in change order
+        self.calls: Dict[str, int] = {}
+        self.min_change_token = 0  # tokens below this answer 410
+        self.quota_per_second: Optional[float] = None
+        self.rejected = 0  # requests refused by the simulated quota
+        self._recent: List[float] = []  # start times of requests in the last second
+        self._ids = itertools.count(1)
+        self._clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self._lock = threading.Lock()
+
+    # --- googleapiclient resource shape ---
+
+    def files(self) -> _Files:
+        return _Files(self)
+
+    def changes(self) -> _Changes:
+        return _Changes(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> FakeBatch:
+        return FakeBatch(self, callback)
+
+    def _call(self, method: str, fn: Callable):
+        """Count a round trip, sleep the simulated latency and run fn"""
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if self.quota_per_second:
+                now = time.monotonic()
+                self._recent = [t for t in self._recent if now - t < 1.0]
+                if len(self._recent) >= self.quota_per_second:
+                    self.rejected += 1
+                    raise FakeHttpError(403, "User Rate Limit Exceeded", reason="userRateLimitExceeded")
+                self._recent.append(now)
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            return fn()
+
+    # --- test helpers ---
+
+    def _tick(self) -> str:
+        self._clock += timedelta(seconds=1)
+        return self._clock.isoformat().replace("+00:00", "Z")
+
+    def add_file(
+        self,
+        name: str,
+        mime_type: str = "text/plain",
+        parent: Optional[str] = None,
+        content: str = ""
+    ) -> str:
+        """Create a file (or folder) and log the change; returns its ID"""
+        with self._lock:
+            file_id = f"f{next(self._ids)}"
+            now = self._tick()
+            self.files_by_id[file_id] = {
+                "id": file_id,
+                "name": name,
+                "mimeType": mime_type,
+                "createdTime": now,
+                "modifiedTime": now,
+                "parents": [parent or self.ROOT_ID],
+                "trashed": False,
+            }
+            if mime_type != FOLDER_MIME_TYPE:
+                self.files_by_id[file_id]["md5Checksum"] = hashlib.md5(content.encode()).hexdigest()
+                self.files_by_id[file_id]["size"] = str(len(content))
+                self.contents[file_id] = content
+            self.change_log.append(file_id)
+            return file_id
+
+    def modify_file(self, file_id: str, name: Optional[str] = None, content: Optional[str] = None):
+        """Rename and/or rewrite a file and log the change"""
+        with self._lock:
+            item = self.files_by_id[file_id]
+            if name is not None:
+                item["name"] = name
+            if content is not None:
+                self.contents[file_id] = content
+                item["md5Checksum"] = hashlib.md5(content.encode()).hexdigest()
+                item["size"] = str(len(content))
+            item["modifiedTime"] = self._tick()
+            self.change_log.append(file_id)
+
+    def trash_file(self, file_id: str):
+        """Trash a file and log the change"""
+        with self._lock:
+            self.files_by_id[file_id]["trashed"] = True
+            self.change_log.append(file_id)
+
+    def delete_file(self, file_id: str):
+        """Permanently delete a file (or folder) and log the change"""
+        with self._lock:
+            del self.files_by_id[file_id]
+            self.contents.pop(file_id, None)
+            self.change_log.append(file_id)
+
+    def move_file(self, file_id: str, parent: str):
+        """Reparent a file and log the change"""
+        with self._lock:
+            self.files_by_id[file_id]["parents"] = [parent]
+            self.change_log.append(file_id)
+
+    # --- endpoint implementations (called with the lock held) ---
+
+    def _matches(self, item: Dict, q: str) -> bool:
+        for clause in filter(None, (c.strip() for c in q.split(" and "))):
+            value = clause.split("'", 1)[1].rsplit("'", 1)[0].replace("''", "'") if "'" in clause else None
+            if clause == "trashed=false":
+                ok = not item["trashed"]
+            elif clause.endswith("in parents"):
+                ok = (self.ROOT_ID if value == "root" else value) in item["parents"]
+            elif clause.startswith("name contains"):
+                ok = value.lower() in item["name"].lower()
+            elif clause.startswith("fullText contains"):
+                ok = value.lower() in self.contents.get(item["id"], "").lower()
+            elif clause.startswith("name="):
+                ok = item["name"] == value
+            elif clause.startswith("mimeType!="):
+                ok = item["mimeType"] != value
+            elif clause.startswith("mimeType="):
+                ok = item["mimeType"] == value
+            else:
+                raise FakeHttpError(400, f"unsupported query clause: {clause}")
+            if not ok:
+                return False
+        return True
+
+    def _list(self, q: str, page_size: int, page_token: Optional[str]) -> Dict:
+        matches = [item for item in self.files_by_id.values() if self._matches(item, q)]
+        start = int(page_token or 0)
+        page = matches[start:start + page_size]
+        result = {"files": [dict(item) for item in page]}
+        if start + page_size < len(matches):
+            result["nextPageToken"] = str(start + page_size)
+        return result
+
+    def _get(self, file_id: str) -> Dict:
+        if file_id == "root":
+            return {"id": self.ROOT_ID}
+        if file_id not in self.files_by_id:
+            raise FakeHttpError(404, f"File not found: {file_id}")
+        return dict(self.files_by_id[file_id])
+
+    def _create(self, body: Dict) -> Dict:
+        file_id = f"f{next(self._ids)}"
+        now = self._tick()
+        self.files_by_id[file_id] = {
+            "id": file_id,
+            "name": body["name"],
+            "mimeType": body.get("mimeType", "application/octet-stream"),
+            "createdTime": now,
+            "modifiedTime": now,
+            "parents": body.get("parents") or [self.ROOT_ID],
+            "trashed": False,
+        }
+        self.change_log.append(file_id)
+        return {"id": file_id}
+
+    def _update(self, file_id: str, add_parents: str, remove_parents: str) -> Dict:
+        if file_id not in self.files_by_id:
+            raise FakeHttpError(404, f"File not found: {file_id}")
+        for parent in filter(None, add_parents.split(",")):
+            if parent != self.ROOT_ID and parent not in self.files_by_id:
+                raise FakeHttpError(404, f"File not found: {parent}")
+        item = self.files_by_id[file_id]
+        removed = set(filter(None, remove_parents.split(",")))
+        parents = [p for p in item["parents"] if p not in removed]
+        parents.extend(p for p in add_parents.split(",") if p and p not in parents)
+        item["parents"] = parents
+        self.change_log.append(file_id)
+        return {"id": file_id, "parents": parents}
+
+    def _changes(self, page_token: str, page_size: int) -> Dict:
+        start = int(page_token)
+        if start < self.min_change_token:
+            raise FakeHttpError(410, "Page token expired")
+        end = min(len(self.change_log), start + page_size)
+        changes = []
+        for file_id in self.change_log[start:end]:
+            item = self.files_by_id.get(file_id)
+            if item is None:
+                changes.append({"fileId": file_id, "removed": True})
+            else:
+                changes.append({"fileId": file_id, "removed": False, "file": dict(item)})
+        result = {"changes": changes}
+        if end < len(self.change_log):
+            result["nextPageToken"] = str(end)
+        else:
+            result["newStartPageToken"] = str(end)
+        return result